@@ -15,11 +15,13 @@ import os
 from pathlib import Path
 from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from werkzeug.utils import secure_filename
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
+from src.core.mjpeg_broadcaster import MJPEGBroadcaster
+from src.core.frame_metadata import frame_metadata
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -39,11 +41,28 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 camera = None
 fall_detector = None
 face_recognizer = None
+alert_dispatcher = None  # Background sender for fall/lying alerts
+clip_recorder = None  # Pre/post-event clips of fall/lying alerts
+motion_gate = None  # Skips pose / face models on static scenes
+inference_scheduler = None  # Lowers the pose rate while everyone is calm
+camera_location = 'Camera 1'
 is_running = False
-current_frame = None
+current_frame = None  # Processed frame; AI overlay drawn only while the 'ai' stream is watched
+current_overlay = None  # (fall_result, face_result) not yet drawn on current_frame, None if drawn
 raw_frame = None  # Frame gốc không có AI overlay
 frame_lock = threading.Lock()
 
+# MJPEG streams: each variant is encoded once per frame, shared by all viewers
+broadcaster = MJPEGBroadcaster()
+broadcaster.add_stream('ai', quality=65)   # AI overlay
+broadcaster.add_stream('raw', quality=60)  # No overlay, for registration
+broadcaster.add_stream('hq', quality=95)   # No overlay, full resolution
+
+# Client-side overlay: Socket.IO clients in this room get per-frame detection metadata
+# ('frame_meta', stamped with the raw stream sequence number) and draw it themselves
+OVERLAY_ROOM = 'overlay'
+overlay_clients = set()  # Socket.IO session ids
+
 # AI settings
 ai_settings = {
     "ai_enabled": True,
@@ -72,11 +91,15 @@ def load_config():
 
 def initialize_camera():
     """Initialize camera and AI modules"""
-    global camera, fall_detector, face_recognizer
+    global camera, fall_detector, face_recognizer, alert_dispatcher, clip_recorder, motion_gate, inference_scheduler, camera_location
     
     from src.core import HikvisionCamera, MultiCameraManager
     from src.core.camera_manager import load_camera_configs
     from src.core import YOLOFallDetector
+    from src.services.alert_dispatcher import AlertDispatcher
+    from src.core.clip_recorder import ClipRecorder
+    from src.core.motion_gate import MotionGate
+    from src.core.inference_scheduler import InferenceScheduler
     
     # Import face recognition
     try:
@@ -92,6 +115,25 @@ def initialize_camera():
     
     config = load_config()
     
+    # Alert dispatcher: config is read once here, never inside the frame loop
+    camera_location = config.get('camera', {}).get('location', 'Camera 1')
+    backend_url = config.get('backend', {}).get('url', 'http://localhost:5000')
+    alert_dispatcher = AlertDispatcher(backend_url, config.get('alerts', {}))
+    alert_dispatcher.start()
+    
+    clip_config = config.get('clip_recording', {})
+    if clip_config.get('enabled', True):
+        clip_recorder = ClipRecorder.from_config(clip_config, name=config.get('camera', {}).get('id', 'camera_01'))
+        clip_recorder.start()
+    
+    gate_config = config.get('motion_gate', {})
+    if gate_config.get('enabled', True):
+        motion_gate = MotionGate.from_config(gate_config)
+    
+    scheduler_config = config.get('inference_scheduler', {})
+    if scheduler_config.get('enabled', True):
+        inference_scheduler = InferenceScheduler.from_config(scheduler_config)
+    
     # Initialize camera
     camera_configs = load_camera_configs(str(Path(__file__).parent / "config" / "config.yaml"))
     if camera_configs:
@@ -133,6 +175,7 @@ def initialize_camera():
     
     if USE_EMBEDDING:
         face_recognizer = FaceEmbedding(face_config)
+        face_recognizer.start_background_sync()  # Delta sync with SQL Server (sync_interval)
     else:
         face_recognizer = FastFaceRecognition(face_config)
     
@@ -143,10 +186,59 @@ def initialize_camera():
     return True
 
 
+def queue_alert(event, confidence: float, alert_type: str = None):
+    """Queue a fall/lying alert for the Backend API - never blocks the frame loop"""
+    if alert_dispatcher is None:
+        return
+    alert_data = {
+        'patientId': None,  # Unknown patient
+        'location': camera_location,
+        'confidence': confidence,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'frameData': None  # Base64 JPEG, filled in by the dispatcher
+    }
+    if alert_type:
+        alert_data['alertType'] = alert_type  # Distinguish from fall
+    # JPEG still being encoded in the background: the dispatcher waits for it, not the frame loop
+    alert_dispatcher.enqueue(alert_data, event.evidence if event else None)
+
+
+def draw_overlay(frame, fall_result, face_result):
+    """Draw fall / face results and status text onto the frame (in place)"""
+    if fall_result is not None and fall_detector:
+        fall_detector.draw(frame, fall_result)
+    if face_result is not None and face_recognizer and ai_settings.get("show_bounding_box", True):
+        face_recognizer.draw(frame, face_result.get('detections', []))
+    
+    overlay_y = 30
+    cv2.putText(frame, f"FPS: {stats['fps']:.1f}", (10, overlay_y),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    
+    if ai_settings["fall_detection_enabled"]:
+        overlay_y += 25
+        cv2.putText(frame, f"State: {stats['state']}", (10, overlay_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+    
+    if ai_settings["face_recognition_enabled"]:
+        overlay_y += 25
+        cv2.putText(frame, f"Faces: {stats['faces_recognized']}", (10, overlay_y),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+
+def held_fall_result(result):
+    """Last fall result re-used on a frame the motion gate or inference scheduler skipped (same poses, no new alerts)"""
+    if result is None:
+        return None
+    return {**result, 'fall_detected': False, 'fall_event': None, 'fall_events': [],
+            'lying_detected': False, 'lying_event': None, 'lying_events': []}
+
+
 def process_frames():
     """Background thread for processing frames"""
-    global current_frame, raw_frame, is_running, stats
+    global current_frame, current_overlay, raw_frame, is_running, stats
     
+    last_fall_result = None
+    last_face_result = None
     frame_count = 0
     fps_start = time.time()
     error_count = 0
@@ -178,23 +270,47 @@ def process_frames():
             error_count = 0  # Reset on success
             frame_count += 1
             
-            # Keep ORIGINAL frame at full resolution (1920x1080) for high quality stream
-            original_frame = frame.copy()
-            
             # Resize for processing (960x540 = balance quality & speed)
             process_frame = cv2.resize(frame, (960, 540))
-            display_frame = process_frame.copy()
             
-            # Lưu raw frame GỐC KHÔNG RESIZE (cho trang camera HQ)
+            # Lưu raw frame GỐC KHÔNG RESIZE (cho trang camera HQ) - không bị vẽ lên nên không cần copy
             with frame_lock:
-                raw_frame = original_frame.copy()  # Full resolution 1920x1080
+                raw_frame = frame  # Full resolution 1920x1080
+            raw_seq = broadcaster.publish('raw', raw_frame)
+            broadcaster.publish('hq', raw_frame)
+            if clip_recorder:
+                clip_recorder.push(raw_frame)  # Encoded into the pre-event ring off-thread
             
-            # Run AI if enabled
+            fall_result = None
+            face_result = None
+            
+            # Motion gate: heavy models only on moving scenes (plus a minimum rate), always while someone falls
+            run_models = True
+            if motion_gate and ai_settings["ai_enabled"]:
+                falling = fall_detector is not None and fall_detector.current_state.value == 'falling'
+                run_models = motion_gate.update(process_frame, force=falling)
+            
+            # Adaptive pose rate: a few Hz while everyone stands / sits calmly, full rate on any risk
+            run_pose = run_models
+            if run_models and inference_scheduler and ai_settings["ai_enabled"]:
+                falling = fall_detector is not None and fall_detector.current_state.value == 'falling'
+                run_pose = inference_scheduler.update(
+                    process_frame, motion=motion_gate.motion if motion_gate else None, force=falling)
+            
+            # Run AI if enabled (structured results only - rendering happens below, if anyone watches)
             if ai_settings["ai_enabled"]:
-                # Fall Detection
-                if ai_settings["fall_detection_enabled"] and fall_detector:
-                    result = fall_detector.process_frame(process_frame)
-                    display_frame = result.get('annotated_frame', display_frame)
+                # Fall Detection (motion fallback history sampled on every frame, also the skipped ones)
+                motion = motion_gate.magnitude if motion_gate else None
+                if motion is None and inference_scheduler:
+                    motion = inference_scheduler.magnitude  # Measured on every frame (no gate: run_models always True)
+                if ai_settings["fall_detection_enabled"] and fall_detector and not run_pose:
+                    fall_detector.observe_motion(process_frame, motion=motion)
+                    fall_result = held_fall_result(last_fall_result)
+                elif ai_settings["fall_detection_enabled"] and fall_detector:
+                    result = fall_result = last_fall_result = fall_detector.process_frame(
+                        process_frame, annotate=False, motion=motion)
+                    if inference_scheduler:
+                        inference_scheduler.observe(result)
                     
                     # Update stats
                     stats["state"] = result.get('state', 'unknown')
@@ -209,35 +325,11 @@ def process_frames():
                             'confidence': result.get('confidence', 0.9)
                         })
                         
-                        # Send fall alert to Backend API
-                        try:
-                            import requests
-                            fall_event = result.get('fall_event')
-                            frame_data = None
-                            if fall_event and fall_event.frame_data:
-                                frame_data = base64.b64encode(fall_event.frame_data).decode('utf-8')
-                            
-                            backend_url = load_config().get('backend', {}).get('url', 'http://localhost:5000')
-                            alert_data = {
-                                'patientId': None,  # Unknown patient
-                                'location': load_config().get('camera', {}).get('location', 'Camera 1'),
-                                'confidence': result.get('confidence', 0.9),
-                                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
-                                'frameData': frame_data
-                            }
-                            
-                            response = requests.post(
-                                f"{backend_url}/api/fall-alert",
-                                json=alert_data,
-                                timeout=5
-                            )
-                            
-                            if response.status_code in [200, 201]:
-                                logger.info(f"✅ Fall alert sent to backend: {response.json()}")
-                            else:
-                                logger.warning(f"⚠️ Backend returned {response.status_code}: {response.text}")
-                        except Exception as e:
-                            logger.error(f"❌ Failed to send fall alert to backend: {e}")
+                        # Send fall alert to Backend API (queued, sent in background), one per person
+                        for event in result.get('fall_events') or [result.get('fall_event')]:
+                            queue_alert(event, result.get('confidence', 0.9))
+                        if clip_recorder:
+                            clip_recorder.trigger('fall')
                     
                     # LYING Alert - người nằm quá lâu
                     if result.get('lying_detected'):
@@ -248,44 +340,20 @@ def process_frames():
                             'state': 'lying'
                         })
                         
-                        # Send lying alert to Backend API
-                        try:
-                            import requests
-                            lying_event = result.get('lying_event')
-                            frame_data = None
-                            if lying_event and lying_event.frame_data:
-                                frame_data = base64.b64encode(lying_event.frame_data).decode('utf-8')
-                            
-                            backend_url = load_config().get('backend', {}).get('url', 'http://localhost:5000')
-                            alert_data = {
-                                'patientId': None,
-                                'location': load_config().get('camera', {}).get('location', 'Camera 1'),
-                                'confidence': result.get('confidence', 0.85),
-                                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
-                                'frameData': frame_data,
-                                'alertType': 'lying'  # Distinguish from fall
-                            }
-                            
-                            response = requests.post(
-                                f"{backend_url}/api/fall-alert",
-                                json=alert_data,
-                                timeout=5
-                            )
-                            
-                            if response.status_code in [200, 201]:
-                                logger.info(f"✅ Lying alert sent to backend: {response.json()}")
-                            else:
-                                logger.warning(f"⚠️ Backend returned {response.status_code}: {response.text}")
-                        except Exception as e:
-                            logger.error(f"❌ Failed to send lying alert to backend: {e}")
+                        # Send lying alert to Backend API (queued, sent in background), one per person
+                        for event in result.get('lying_events') or [result.get('lying_event')]:
+                            queue_alert(event, result.get('confidence', 0.85), 'lying')
+                        if clip_recorder:
+                            clip_recorder.trigger('lying')
                 
                 # Face Recognition
-                if ai_settings["face_recognition_enabled"] and face_recognizer:
+                if ai_settings["face_recognition_enabled"] and face_recognizer and not run_models:
+                    face_result = last_face_result  # Static scene: same faces as last time
+                elif ai_settings["face_recognition_enabled"] and face_recognizer:
                     # Enable auto_record for automatic detection logging
                     auto_record = ai_settings.get("auto_detection_enabled", True)
-                    show_box = ai_settings.get("show_bounding_box", True)
-                    face_result = face_recognizer.process_frame(display_frame, auto_record=auto_record, show_bounding_box=show_box)
-                    display_frame = face_result.get('annotated_frame', display_frame)
+                    face_result = last_face_result = face_recognizer.process_frame(
+                        process_frame, auto_record=auto_record, annotate=False)
                     
                     # Update stats
                     stats["faces_recognized"] = face_result.get('recognized_count', 0)
@@ -311,24 +379,25 @@ def process_frames():
             if elapsed > 0:
                 stats["fps"] = frame_count / elapsed
             
-            # Add overlay
-            overlay_y = 30
-            cv2.putText(display_frame, f"FPS: {stats['fps']:.1f}", (10, overlay_y),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+            # Detection metadata for clients drawing their own overlay on the raw stream
+            if overlay_clients and (fall_result is not None or face_result is not None):
+                socketio.emit('frame_meta', frame_metadata(raw_seq, time.time(), (960, 540), fall_result,
+                                                           face_result), to=OVERLAY_ROOM)
             
-            if ai_settings["fall_detection_enabled"]:
-                overlay_y += 25
-                cv2.putText(display_frame, f"State: {stats['state']}", (10, overlay_y),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+            # Render AI overlay once, in place, only when a client watches the AI stream
+            # (otherwise /api/snapshot draws it on demand from current_overlay)
+            overlay = (fall_result, face_result)
+            if broadcaster.watched('ai'):
+                if fall_result and (fall_result.get('fall_events') or fall_result.get('lying_events')):
+                    process_frame = process_frame.copy()  # Alert evidence of this frame is still being encoded
+                draw_overlay(process_frame, fall_result, face_result)
+                overlay = None
             
-            if ai_settings["face_recognition_enabled"]:
-                overlay_y += 25
-                cv2.putText(display_frame, f"Faces: {stats['faces_recognized']}", (10, overlay_y),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            # Update current frame
+            # Update current frame (a new array every loop, never modified after publishing)
             with frame_lock:
-                current_frame = display_frame.copy()
+                current_frame = process_frame
+                current_overlay = overlay
+            broadcaster.publish('ai', current_frame)
             
             # Small sleep to prevent CPU overload
             time.sleep(0.01)
@@ -339,60 +408,18 @@ def process_frames():
 
 
 def generate_mjpeg():
-    """Generate MJPEG stream with minimal latency"""
-    while True:
-        with frame_lock:
-            if current_frame is None:
-                time.sleep(0.005)
-                continue
-            frame = current_frame.copy()
-        
-        # Better quality for clearer face recognition (65%)
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 65])
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.033)  # ~30 FPS (enough for monitoring, saves bandwidth)
+    """Generate MJPEG stream with minimal latency (better quality 65% for clearer face recognition)"""
+    return broadcaster.generate('ai')
 
 
 def generate_raw_mjpeg():
     """Generate RAW MJPEG stream without AI overlay (for registration page)"""
-    while True:
-        with frame_lock:
-            if raw_frame is None:
-                time.sleep(0.005)
-                continue
-            frame = raw_frame.copy()
-        
-        # Lower quality for faster transmission
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 60])
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.033)  # ~30 FPS (enough for registration)
+    return broadcaster.generate('raw')
 
 
 def generate_hq_mjpeg():
     """Generate HIGH QUALITY MJPEG stream without AI overlay (for camera monitoring page)"""
-    while True:
-        with frame_lock:
-            if raw_frame is None:
-                time.sleep(0.005)
-                continue
-            frame = raw_frame.copy()
-        
-        # High quality for best viewing experience (95%)
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.016)  # ~60 FPS for smooth playback
+    return broadcaster.generate('hq')
 
 
 # ============== API Routes ==============
@@ -420,11 +447,15 @@ def video_stream_hq():
 
 @app.route('/api/snapshot')
 def snapshot():
-    """Get current frame as JPEG"""
+    """Get current frame as JPEG (always with AI overlay)"""
     with frame_lock:
         if current_frame is None:
             return jsonify({"error": "No frame available"}), 503
         frame = current_frame.copy()
+        overlay = current_overlay
+    
+    if overlay is not None:
+        draw_overlay(frame, *overlay)  # Nobody watches /api/stream: not drawn by the frame loop
     
     _, buffer = cv2.imencode('.jpg', frame)
     return Response(buffer.tobytes(), mimetype='image/jpeg')
@@ -460,7 +491,10 @@ def update_settings():
 @app.route('/api/stats')
 def get_stats():
     """Get current stats"""
-    return jsonify(stats)
+    return jsonify({**stats, "streams": broadcaster.stats(), "overlay_clients": len(overlay_clients),
+                    "clips": clip_recorder.get_stats() if clip_recorder else None,
+                    "motion_gate": motion_gate.get_stats() if motion_gate else None,
+                    "inference_scheduler": inference_scheduler.get_stats() if inference_scheduler else None})
 
 
 @app.route('/api/camera/status')
@@ -476,15 +510,15 @@ def camera_status():
 
 @app.route('/api/faces/sync', methods=['POST'])
 def sync_faces():
-    """Sync face database with Backend API"""
+    """Sync face database with Backend API (runs in the background, returns immediately)"""
     if face_recognizer is None:
         return jsonify({"error": "Face recognition not initialized"}), 503
     
     try:
-        face_recognizer.sync_with_backend()
+        face_recognizer.request_sync()
         return jsonify({
             "success": True,
-            "message": "Synced with backend",
+            "message": "Sync started",
             "registered_count": len(face_recognizer.registered_faces),
             "detected_today": len(face_recognizer.detected_today)
         })
@@ -857,9 +891,25 @@ def handle_connect():
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    overlay_clients.discard(request.sid)
     logger.info(f"Client disconnected: {request.sid}")
 
 
+@socketio.on('subscribe_overlay')
+def handle_subscribe_overlay(data=None):
+    """Receive 'frame_meta' for every processed frame (draw overlays client-side on /api/stream/raw)"""
+    join_room(OVERLAY_ROOM)
+    overlay_clients.add(request.sid)
+    logger.info(f"Overlay metadata subscribed: {request.sid} ({len(overlay_clients)} clients)")
+    emit('overlay_subscribed', {'stream': 'raw', 'size': [960, 540]})
+
+
+@socketio.on('unsubscribe_overlay')
+def handle_unsubscribe_overlay(data=None):
+    leave_room(OVERLAY_ROOM)
+    overlay_clients.discard(request.sid)
+
+
 @socketio.on('toggle_ai')
 def handle_toggle_ai(data):
     global ai_settings
@@ -919,7 +969,11 @@ def main():
     print("\n" + "=" * 60)
     
     # Run Flask with SocketIO
-    socketio.run(app, host='0.0.0.0', port=8080, debug=False, allow_unsafe_werkzeug=True)
+    try:
+        socketio.run(app, host='0.0.0.0', port=8080, debug=False, allow_unsafe_werkzeug=True)
+    finally:
+        if hasattr(face_recognizer, 'close'):
+            face_recognizer.close()  # Persist pending face index changes
 
 
 if __name__ == "__main__":
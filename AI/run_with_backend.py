@@ -95,6 +95,7 @@ def main():
     from src.core import HikvisionCamera, MultiCameraManager
     from src.core.yolo_fall_detector import YOLOFallDetector, PoseState
     from src.core.camera_manager import load_camera_configs
+    from src.core.clip_recorder import ClipRecorder
     
     # Tạo thư mục lưu ảnh té ngã
     fall_images_dir = Path("outputs/fall_detections")
@@ -119,6 +120,13 @@ def main():
     fall_config['model_path'] = f'models/{model_name}'
     fall_detector = YOLOFallDetector(fall_config)
     
+    # Clip 10s trước + 10s sau mỗi lần té ngã
+    clip_recorder = None
+    clip_config = config.get('clip_recording', {})
+    if clip_config.get('enabled', True):
+        clip_recorder = ClipRecorder.from_config(clip_config, name=config.get('camera', {}).get('id', 'camera_01'))
+        clip_recorder.start()
+    
     # Connect to camera
     print("\n🔌 Connecting to camera...")
     if not camera.connect():
@@ -149,6 +157,8 @@ def main():
             continue
         
         frame_count += 1
+        if clip_recorder:
+            clip_recorder.push(frame)
         
         # Resize for processing
         process_frame = cv2.resize(frame, (1280, 720))
@@ -172,6 +182,8 @@ def main():
             image_path = fall_images_dir / image_filename
             cv2.imwrite(str(image_path), process_frame)
             logger.info(f"💾 Đã lưu ảnh: {image_filename}")
+            if clip_recorder:
+                clip_recorder.trigger('fall')
             
             # Send to backend
             if send_fall_alert(process_frame, confidence, "Main Entrance"):
@@ -216,6 +228,8 @@ def main():
     # Cleanup
     cv2.destroyAllWindows()
     camera.disconnect()
+    if clip_recorder:
+        clip_recorder.stop()
     
     print("\n" + "=" * 60)
     print("📊 SESSION SUMMARY")
@@ -0,0 +1,240 @@
+"""
+Clip Recorder
+Pre/post-event video clips from a byte-bounded ring of JPEG frames
+
+The capture loop only hands frame references to push() (non-blocking, a full
+queue drops the frame). A worker thread downscales and JPEG-encodes them into
+a ring that holds the last pre_seconds of video and never more than
+max_buffer_bytes. trigger() opens a clip from event time - pre_seconds to
+event time + post_seconds: the worker fills it from the ring plus the frames
+that follow, then a writer thread decodes and muxes it to MP4. Neither step
+blocks capture or inference.
+
+Events that arrive while a clip is still collecting extend that clip
+instead of starting a new one.
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class _Clip:
+    """A clip being collected by the worker"""
+
+    def __init__(self, label: str, start: float, end: float):
+        self.labels = [label]
+        self.start = start
+        self.end = end
+        self.frames: Optional[List[Tuple[float, bytes]]] = None  # None until filled from the ring
+        self.future: Future = Future()  # Path of the written clip
+
+
+class ClipRecorder:
+    """Per-camera event clip recorder (see module docstring)"""
+
+    def __init__(self, output_dir: str, pre_seconds: float = 10.0, post_seconds: float = 10.0,
+                 max_buffer_bytes: int = 64 << 20, jpeg_quality: int = 70, width: int = 960,
+                 queue_size: int = 30, name: str = 'camera'):
+        self.output_dir = Path(output_dir)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.max_buffer_bytes = max_buffer_bytes
+        self.jpeg_quality = jpeg_quality
+        self.width = width
+        self.name = name
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._ring: deque = deque()  # (timestamp, JPEG bytes), oldest first - worker thread only
+        self._ring_bytes = 0
+        self._clips: List[_Clip] = []
+        self._clips_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clip-writer')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {'frames': 0, 'dropped': 0, 'clips': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict, name: str = 'camera') -> 'ClipRecorder':
+        """Build from the clip_recording section of config.yaml"""
+        return cls(
+            output_dir=config.get('output_dir', 'outputs/fall_clips'),
+            pre_seconds=config.get('pre_seconds', 10),
+            post_seconds=config.get('post_seconds', 10),
+            max_buffer_bytes=int(config.get('max_buffer_mb', 64) * (1 << 20)),
+            jpeg_quality=config.get('jpeg_quality', 70),
+            width=config.get('width', 960),
+            name=name,
+        )
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='clip-recorder')
+        self._thread.start()
+        logger.info(f"🎬 Clip recorder started ({self.pre_seconds:.0f}s before / {self.post_seconds:.0f}s after "
+                    f"events, buffer {self.max_buffer_bytes >> 20} MB)")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the worker; clips still collecting are written with the frames they have"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._clips_lock:
+            clips, self._clips = self._clips, []
+        for clip in clips:
+            self._fill(clip)
+            self._finish(clip)
+        self._writer.shutdown(wait=True)
+
+    # ============== Capture thread ==============
+
+    def push(self, frame: np.ndarray, timestamp: Optional[float] = None) -> bool:
+        """Hand a frame to the recorder (no copy - the caller must not modify it afterwards); never blocks"""
+        try:
+            self._queue.put_nowait((time.time() if timestamp is None else timestamp, frame))
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+
+    def trigger(self, label: str, timestamp: Optional[float] = None) -> Future:
+        """Record a clip around an event; returns a Future of the clip path (None if no frames)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._clips_lock:
+            for clip in self._clips:
+                if clip.start <= timestamp <= clip.end:
+                    clip.end = max(clip.end, timestamp + self.post_seconds)
+                    clip.labels.append(label)
+                    return clip.future
+            clip = _Clip(label, timestamp - self.pre_seconds, timestamp + self.post_seconds)
+            self._clips.append(clip)
+        logger.info(f"🎬 Recording {label} clip ({self.pre_seconds:.0f}s before, {self.post_seconds:.0f}s after)")
+        return clip.future
+
+    @property
+    def buffered_seconds(self) -> float:
+        ring = self._ring
+        return ring[-1][0] - ring[0][0] if len(ring) > 1 else 0.0
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'buffer_bytes': self._ring_bytes, 'buffer_seconds': round(self.buffered_seconds, 1),
+                'recording': len(self._clips)}
+
+    # ============== Worker thread ==============
+
+    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
+        h, w = frame.shape[:2]
+        if self.width and w > self.width:
+            frame = cv2.resize(frame, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buffer.tobytes() if ok else None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                timestamp, frame = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._close_idle_clips()
+                continue
+            jpeg = self._encode(frame)
+            if jpeg is None:
+                continue
+            self.stats['frames'] += 1
+
+            with self._clips_lock:
+                clips = list(self._clips)
+            for clip in clips:
+                self._fill(clip)
+
+            self._append(timestamp, jpeg)
+
+            for clip in clips:
+                if timestamp > clip.end:
+                    self._close(clip)
+                elif timestamp >= clip.start:
+                    clip.frames.append((timestamp, jpeg))
+
+    def _fill(self, clip: _Clip):
+        """New clips start with the frames already in the ring (pre-event part)"""
+        if clip.frames is None:
+            clip.frames = [(t, data) for t, data in self._ring if t >= clip.start]
+
+    def _append(self, timestamp: float, jpeg: bytes):
+        """Add to the ring, evicting frames beyond pre_seconds or max_buffer_bytes"""
+        ring = self._ring
+        ring.append((timestamp, jpeg))
+        self._ring_bytes += len(jpeg)
+        while len(ring) > 1 and (self._ring_bytes > self.max_buffer_bytes
+                                 or ring[0][0] < timestamp - self.pre_seconds):
+            self._ring_bytes -= len(ring.popleft()[1])
+
+    def _close_idle_clips(self):
+        """No frames coming in (camera down): finish clips whose end has passed on the wall clock"""
+        now = time.time()
+        with self._clips_lock:
+            clips = list(self._clips)
+        for clip in clips:
+            if now > clip.end + 1.0:
+                self._fill(clip)
+                self._close(clip)
+
+    def _close(self, clip: _Clip):
+        with self._clips_lock:
+            if clip in self._clips:
+                self._clips.remove(clip)
+        self._finish(clip)
+
+    def _finish(self, clip: _Clip):
+        self._writer.submit(self._write, clip)
+
+    # ============== Writer thread ==============
+
+    def _write(self, clip: _Clip):
+        try:
+            clip.future.set_result(self._write_clip(clip))
+        except Exception as e:
+            logger.error(f"❌ Clip write failed: {e}")
+            clip.future.set_exception(e)
+
+    def _write_clip(self, clip: _Clip) -> Optional[str]:
+        frames = clip.frames or []
+        if not frames:
+            logger.warning(f"⚠️ No frames buffered for {'+'.join(clip.labels)} clip")
+            return None
+
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else 10.0
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.fromtimestamp(clip.start + self.pre_seconds).strftime('%Y%m%d_%H%M%S')
+        path = self.output_dir / f"{self.name}_{'+'.join(dict.fromkeys(clip.labels))}_{stamp}.mp4"
+        writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not writer.isOpened():
+            raise IOError(f"Cannot open video writer: {path}")
+        try:
+            writer.write(first)
+            for _, data in frames[1:]:
+                frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None and frame.shape[:2] == (height, width):
+                    writer.write(frame)
+        finally:
+            writer.release()
+
+        self.stats['clips'] += 1
+        logger.info(f"🎬 Clip saved: {path.name} ({len(frames)} frames, {duration:.1f}s @ {fps:.1f}fps)")
+        return str(path)
@@ -0,0 +1,77 @@
+"""
+Frame Metadata
+Compact per-frame detection results for client-side overlay rendering
+
+Instead of burning boxes, skeletons and labels into a separately encoded AI
+stream, camera_server can push this metadata over Socket.IO and let the
+browser draw it on top of the raw stream. Every message carries the sequence
+number of the raw stream frame it belongs to (sent by the MJPEG stream as the
+X-Frame-Seq part header), so the client can pair them up.
+
+Message layout (coordinates in processing-frame pixels, see 'size'):
+    {
+      "seq": 1234, "t": 1718000000.123, "size": [960, 540],
+      "state": "standing",
+      "persons":   [{"id": 3, "state": "lying", "box": [x1, y1, x2, y2]}],
+      "skeletons": [[x0, y0, c0, x1, y1, c1, ...]],   # 17 keypoints, c = confidence in %
+      "faces":     [{"box": [x, y, w, h], "id": "SV001", "name": "...", "sim": 87}]
+    }
+"""
+
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+
+def _skeletons(keypoints: np.ndarray) -> list:
+    """(N, 17, 3) keypoints -> flat integer lists [x, y, conf%, ...] per person"""
+    if keypoints is None or len(keypoints) == 0:
+        return []
+    packed = np.empty(keypoints.shape, dtype=np.int32)
+    packed[..., :2] = np.rint(keypoints[..., :2])
+    packed[..., 2] = np.rint(keypoints[..., 2] * 100)
+    return packed.reshape(len(packed), -1).tolist()
+
+
+def frame_metadata(seq: int, timestamp: float, frame_size: Tuple[int, int],
+                   fall_result: Optional[Dict] = None, face_result: Optional[Dict] = None) -> Dict:
+    """
+    Build the overlay message for one processed frame
+
+    Args:
+        seq: Sequence number of the matching raw stream frame
+        timestamp: Capture time (s)
+        frame_size: (width, height) the coordinates refer to
+        fall_result: YOLOFallDetector.process_frame result (or None)
+        face_result: FaceEmbedding.process_frame result (or None)
+    """
+    meta = {
+        'seq': seq,
+        't': round(timestamp, 3),
+        'size': list(frame_size),
+        'state': None,
+        'persons': [],
+        'skeletons': [],
+        'faces': [],
+    }
+
+    if fall_result is not None:
+        state = fall_result.get('state')
+        meta['state'] = getattr(state, 'value', state)
+        meta['persons'] = [
+            {'id': track['track_id'], 'state': track['state'].value, 'box': list(track['box'])}
+            for track in fall_result.get('tracks') or []
+        ]
+        meta['skeletons'] = _skeletons(fall_result.get('keypoints'))
+
+    if face_result is not None:
+        names = {f['person_id']: f['person_name'] for f in face_result.get('faces', [])}
+        for face in face_result.get('detections', []):
+            person_id = face.get('person_id')
+            meta['faces'].append({
+                'box': [int(v) for v in face['bbox']],
+                'id': person_id,
+                'name': names.get(person_id, person_id),
+                'sim': int(round(face.get('similarity', 0) * 100)),
+            })
+
+    return meta
@@ -0,0 +1,184 @@
+"""
+Inference Scheduler
+Adaptive YOLOv8-pose rate driven by the fall detector's own risk signals
+
+Two rates. FULL: pose inference on every frame the camera delivers. CALM:
+calm_fps, used only while every tracked person is standing or sitting with
+fall confidence below risk_threshold and stability at or above
+stability_threshold, and motion stays below motion_threshold. The scheduler
+switches to FULL on the first frame where any of these stops holding, or
+where the number of tracked persons changes. It only returns to CALM after
+calm_seconds of unbroken calm, measured on frame timestamps.
+
+Every switch is logged with the reason that caused it and kept in
+decisions (the last max_decisions switches), so a missed fall can be checked
+against the rate the detector was running at.
+
+In CALM the fall detector only sees a few frames per second, so its motion
+fallback must not diff those frames against each other: feed it the
+per-frame magnitude (MotionGate.magnitude, or magnitude here when the
+scheduler measures motion itself) through process_frame(motion=...) and
+observe_motion() on the skipped frames.
+"""
+
+import time
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+from .motion_engine import MotionEngine
+
+logger = logging.getLogger(__name__)
+
+FULL = 'full'
+CALM = 'calm'
+
+
+class InferenceScheduler:
+    """Per-camera pose inference rate controller (see module docstring)"""
+
+    def __init__(self, calm_fps: float = 3.0, risk_threshold: float = 0.35,
+                 stability_threshold: float = 0.5, motion_threshold: float = 0.02,
+                 calm_seconds: float = 3.0, calm_states: Sequence[str] = ('standing', 'sitting'),
+                 max_decisions: int = 200):
+        self.calm_interval = 1.0 / calm_fps if calm_fps > 0 else 0.0
+        self.risk_threshold = risk_threshold
+        self.stability_threshold = stability_threshold
+        self.motion_threshold = motion_threshold  # Changed-pixel ratio that forces FULL
+        self.calm_seconds = calm_seconds
+        self.calm_states = frozenset(calm_states)
+
+        self.engine: Optional[MotionEngine] = None  # Only when no motion is passed to update()
+        self.magnitude: Optional[float] = None  # Fall detector motion magnitude of the last frame (own engine only)
+        self.mode = FULL  # Start at full rate until the scene has been seen calm
+        self.calm_since: Optional[float] = None
+        self.last_inference = float('-inf')
+        self.persons = 0
+        self.reason = 'start'
+        self.decisions: deque = deque(maxlen=max_decisions)  # (timestamp, mode, reason)
+
+        self.stats = {'frames': 0, 'inferred': 0, 'skipped': 0, 'full_frames': 0,
+                      'to_full': 0, 'to_calm': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'InferenceScheduler':
+        """Build from the inference_scheduler section of config.yaml"""
+        return cls(
+            calm_fps=config.get('calm_fps', 3.0),
+            risk_threshold=config.get('risk_threshold', 0.35),
+            stability_threshold=config.get('stability_threshold', 0.5),
+            motion_threshold=config.get('motion_threshold', 0.02),
+            calm_seconds=config.get('calm_seconds', 3.0),
+            calm_states=config.get('calm_states', ('standing', 'sitting')),
+        )
+
+    def update(self, frame: Optional[np.ndarray] = None, timestamp: Optional[float] = None,
+               motion: Optional[float] = None, force: bool = False) -> bool:
+        """
+        Decide for one frame; True if pose inference should run on it
+
+        Args:
+            frame: BGR frame, only used to measure motion when motion is None
+            timestamp: Frame time in seconds (default: now)
+            motion: Changed-pixel ratio already measured for this frame (e.g. MotionGate.motion)
+            force: Run and switch to FULL (e.g. a fall is being confirmed)
+        """
+        now = time.time() if timestamp is None else timestamp
+        self.stats['frames'] += 1
+
+        if motion is None and frame is not None:
+            if self.engine is None:
+                self.engine = MotionEngine()
+            self.magnitude = self.engine.update(frame)
+            motion = self.engine.ratio
+
+        if force:
+            self._escalate(now, 'forced')
+        elif motion is not None and motion >= self.motion_threshold:
+            self._escalate(now, f"motion {motion:.3f}")
+
+        run = self.mode == FULL or now - self.last_inference >= self.calm_interval
+        if run:
+            self.last_inference = now
+            self.stats['inferred'] += 1
+            if self.mode == FULL:
+                self.stats['full_frames'] += 1
+        else:
+            self.stats['skipped'] += 1
+        return run
+
+    def observe(self, result: Optional[Dict], timestamp: Optional[float] = None):
+        """Feed the fall detector result of a frame update() let through"""
+        now = time.time() if timestamp is None else timestamp
+        reason = self._risk_reason(result)
+        if reason is not None:
+            self._escalate(now, reason)
+            return
+
+        if self.calm_since is None:
+            self.calm_since = now
+        if self.mode == FULL and now - self.calm_since >= self.calm_seconds:
+            self._switch(now, CALM, f"calm for {now - self.calm_since:.1f}s ({self.persons} person(s))")
+
+    def _risk_reason(self, result: Optional[Dict]) -> Optional[str]:
+        """Why this result needs FULL rate, or None when it is calm"""
+        if result is None:
+            return None
+        poses = result.get('poses') or []
+        persons, self.persons = self.persons, len(poses)
+        if len(poses) != persons:
+            return f"persons {persons}->{len(poses)}"
+
+        state = result.get('state')
+        state = getattr(state, 'value', state)
+        if not poses and state not in (None, 'unknown'):
+            return f"lost track {state}"  # Person dropped out of view mid-fall / while lying
+
+        for pose in poses:
+            track = f"#{pose.get('track_id')}"
+            if pose.get('state') not in self.calm_states:
+                return f"{track} {pose.get('state')}"
+            risk = pose.get('fall_confidence') or 0.0
+            if risk >= self.risk_threshold:
+                return f"{track} risk {risk:.2f}"
+            stability = pose.get('stability')
+            if stability is not None and stability < self.stability_threshold:
+                return f"{track} stability {stability:.2f}"
+        return None
+
+    def _escalate(self, now: float, reason: str):
+        self.calm_since = None
+        if self.mode != FULL:
+            self._switch(now, FULL, reason)
+
+    def _switch(self, now: float, mode: str, reason: str):
+        self.mode = mode
+        self.reason = reason
+        self.decisions.append((now, mode, reason))
+        if mode == FULL:
+            self.stats['to_full'] += 1
+            logger.info(f"⏩ Pose inference full rate: {reason}")
+        else:
+            self.stats['to_calm'] += 1
+            logger.info(f"⏸️ Pose inference {1.0 / self.calm_interval if self.calm_interval else 0:.0f} fps: {reason}")
+
+    def recent_decisions(self, limit: int = 20) -> List[Dict]:
+        """Last rate switches, newest last (for the stats endpoint / audits)"""
+        return [{'t': round(t, 3), 'mode': mode, 'reason': reason}
+                for t, mode, reason in list(self.decisions)[-limit:]]
+
+    def reset(self):
+        if self.engine is not None:
+            self.engine.reset()
+        self.magnitude = None
+        self.mode = FULL
+        self.calm_since = None
+        self.last_inference = float('-inf')
+        self.persons = 0
+        self.reason = 'reset'
+
+    def get_stats(self) -> Dict:
+        frames = self.stats['frames']
+        return {**self.stats, 'mode': self.mode, 'reason': self.reason,
+                'inference_ratio': round(self.stats['inferred'] / frames, 3) if frames else 0.0}
@@ -0,0 +1,146 @@
+"""
+MJPEG Broadcaster
+Encode-once, fan-out MJPEG streaming for camera_server
+
+Each stream variant (AI overlay, raw, HQ) is JPEG-encoded at most once per
+published frame, lazily, by the first subscriber that asks for it. Every
+other subscriber gets the same cached bytes, so encoder CPU cost does not
+depend on the number of viewers, and a variant nobody watches is never encoded.
+
+Subscribers are woken by a FrameBus (sequence number + condition variable)
+when a new frame is published, instead of polling on a fixed sleep: the
+stream rate follows the processing loop and no frame is sent twice.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBus:
+    """
+    Latest-frame slot with a monotonically increasing sequence number.
+
+    Consumers block in wait() until a frame newer than the one they already
+    have is published, so they wake exactly once per new frame and never
+    see the same frame twice (frames published in between are skipped).
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self.seq = 0  # 0 = nothing published yet
+
+    def publish(self, frame: np.ndarray) -> int:
+        """Set the latest frame (no copy - the caller must not modify it afterwards) and wake waiters"""
+        with self._cond:
+            self._frame = frame
+            self.seq += 1
+            self._cond.notify_all()
+            return self.seq
+
+    def latest(self) -> Tuple[int, Optional[np.ndarray]]:
+        with self._cond:
+            return self.seq, self._frame
+
+    def wait(self, after_seq: int, timeout: Optional[float] = None) -> Tuple[int, Optional[np.ndarray]]:
+        """(seq, frame) of the first frame newer than after_seq, or (after_seq, None) on timeout"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.seq > after_seq, timeout):
+                return after_seq, None
+            return self.seq, self._frame
+
+
+class MJPEGStream:
+    """One stream variant: frame bus + cached JPEG of its latest frame"""
+
+    WAIT_TIMEOUT = 1.0  # Re-check periodically so an idle stream never blocks forever
+
+    def __init__(self, name: str, quality: int):
+        self.name = name
+        self.quality = quality
+        self.bus = FrameBus()
+
+        self._lock = threading.Lock()  # Subscriber counter
+        self._encode_lock = threading.Lock()  # One encode per frame, shared by all subscribers
+        self._jpeg: Optional[bytes] = None
+        self._jpeg_seq = 0
+
+        self.subscribers = 0
+        self.encodes = 0
+
+    def publish(self, frame: np.ndarray) -> int:
+        return self.bus.publish(frame)
+
+    def jpeg_for(self, seq: int, frame: np.ndarray) -> Tuple[int, Optional[bytes]]:
+        """(seq, JPEG bytes) for frame `seq`, encoded by the first subscriber that asks for it"""
+        with self._encode_lock:
+            if seq > self._jpeg_seq:
+                ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    return seq, None
+                self._jpeg = buffer.tobytes()
+                self._jpeg_seq = seq
+                self.encodes += 1
+            # A newer frame may already be cached by a faster subscriber - send that one
+            return self._jpeg_seq, self._jpeg
+
+    def latest_jpeg(self) -> Optional[bytes]:
+        seq, frame = self.bus.latest()
+        return self.jpeg_for(seq, frame)[1] if frame is not None else None
+
+    def generate(self) -> Iterator[bytes]:
+        """multipart/x-mixed-replace parts for one client, one part per new frame"""
+        with self._lock:
+            self.subscribers += 1
+        logger.info(f"📺 Stream '{self.name}': client connected ({self.subscribers} watching)")
+        try:
+            last_seq = 0
+            while True:
+                seq, frame = self.bus.wait(last_seq, self.WAIT_TIMEOUT)
+                if frame is None:
+                    continue
+                last_seq, frame_bytes = self.jpeg_for(seq, frame)
+                if frame_bytes is None:
+                    continue
+
+                # X-Frame-Seq lets clients pair the frame with its overlay metadata
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n'
+                       b'X-Frame-Seq: %d\r\n\r\n' % last_seq + frame_bytes + b'\r\n')
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+            logger.info(f"📺 Stream '{self.name}': client disconnected ({self.subscribers} watching)")
+
+
+class MJPEGBroadcaster:
+    """Named stream variants fed by the frame processing loop"""
+
+    def __init__(self):
+        self.streams: Dict[str, MJPEGStream] = {}
+
+    def add_stream(self, name: str, quality: int) -> MJPEGStream:
+        self.streams[name] = MJPEGStream(name, quality)
+        return self.streams[name]
+
+    def publish(self, name: str, frame: np.ndarray) -> int:
+        """Publish a frame to a stream; returns its sequence number"""
+        return self.streams[name].publish(frame)
+
+    def generate(self, name: str) -> Iterator[bytes]:
+        return self.streams[name].generate()
+
+    def watched(self, name: str) -> bool:
+        """True while at least one client is subscribed to the stream"""
+        return self.streams[name].subscribers > 0
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            name: {'subscribers': s.subscribers, 'frames': s.bus.seq, 'encodes': s.encodes}
+            for name, s in self.streams.items()
+        }
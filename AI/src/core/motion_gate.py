@@ -0,0 +1,90 @@
+"""
+Motion Gate
+Decide per frame whether the heavy models (YOLOv8-pose, face detector) need to run
+
+Uses the same MotionEngine as YOLOFallDetector._detect_motion_magnitude
+(frame differencing on a 160 px thumbnail, ~0.15 ms per frame). Models
+run while there is motion, keep running hold_seconds after it stops (a
+person slowing down or lying still after a fall), and run at least min_fps
+on a static scene so slow changes and lying durations are still observed.
+"""
+
+import time
+import logging
+from typing import Dict, Optional
+import numpy as np
+
+from .motion_engine import MotionEngine
+
+logger = logging.getLogger(__name__)
+
+
+class MotionGate:
+    """Per-camera motion gate (see module docstring)"""
+
+    def __init__(self, threshold: float = 0.003, width: int = 160, hold_seconds: float = 2.0,
+                 min_fps: float = 2.0, pixel_threshold: int = 15):
+        self.threshold = threshold  # Fraction of changed thumbnail pixels that counts as motion
+        self.hold_seconds = hold_seconds
+        self.min_interval = 1.0 / min_fps if min_fps > 0 else float('inf')
+        self.engine = MotionEngine(width=width, pixel_threshold=pixel_threshold)
+
+        self.motion = 0.0  # Changed-pixel ratio of the last frame
+        self.magnitude = 0.0  # Fall detector motion magnitude of the last frame (MotionEngine.update)
+        self.active_until = float('-inf')  # Models run until this time (motion + hold)
+        self.last_inference = float('-inf')
+
+        self.stats = {'frames': 0, 'inferred': 0, 'motion': 0, 'forced': 0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'MotionGate':
+        """Build from the motion_gate section of config.yaml"""
+        return cls(
+            threshold=config.get('threshold', 0.003),
+            width=config.get('width', 160),
+            hold_seconds=config.get('hold_seconds', 2.0),
+            min_fps=config.get('min_fps', 2.0),
+        )
+
+    def measure(self, frame: np.ndarray) -> float:
+        """Changed-pixel ratio against the previous frame (0 for the first frame)"""
+        self.magnitude = self.engine.update(frame)
+        return self.engine.ratio
+
+    def update(self, frame: np.ndarray, timestamp: Optional[float] = None, force: bool = False) -> bool:
+        """
+        Feed a frame; True if the models should run on it
+
+        Args:
+            frame: BGR frame (any resolution)
+            timestamp: Frame time in seconds (default: now)
+            force: Run regardless of motion (e.g. a fall is being confirmed)
+        """
+        now = time.time() if timestamp is None else timestamp
+        self.stats['frames'] += 1
+        self.motion = self.measure(frame)
+
+        if self.motion >= self.threshold:
+            self.active_until = now + self.hold_seconds
+            self.stats['motion'] += 1
+
+        run = force or now < self.active_until
+        if not run and now - self.last_inference >= self.min_interval:
+            run = True  # Guaranteed minimum inference rate on a static scene
+            self.stats['forced'] += 1
+
+        if run:
+            self.last_inference = now
+            self.stats['inferred'] += 1
+        return run
+
+    def reset(self):
+        self.engine.reset()
+        self.motion = self.magnitude = 0.0
+        self.active_until = float('-inf')
+        self.last_inference = float('-inf')
+
+    def get_stats(self) -> Dict:
+        frames = self.stats['frames']
+        return {**self.stats, 'inference_ratio': round(self.stats['inferred'] / frames, 3) if frames else 0.0,
+                'last_motion': round(self.motion, 4)}
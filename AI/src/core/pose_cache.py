@@ -0,0 +1,170 @@
+"""
+Pose Cache
+Persist YOLOv8-pose outputs per video so the fall logic can be re-run without the model
+
+Running the pose model is by far the expensive step when tuning fall
+thresholds, cooldowns or state scoring. The cache stores, per frame, the
+timestamp, motion magnitude and every detection (box + 17 keypoints with
+confidence) in one compressed columnar .npz file, keyed by video content hash
+and inference settings. replay_poses() feeds a recording straight into
+YOLOFallDetector.update() - no model, no video decoding.
+
+File layout:
+    timestamps (F,)        float64  frame PTS (s)
+    motion     (F,)        float32  frame-difference motion magnitude
+    offsets    (F + 1,)    int64    detections of frame i = rows offsets[i]:offsets[i + 1]
+    boxes      (D, 4)      float32  xyxy
+    keypoints  (D, 17, 3)  float32  x, y, confidence
+    meta       JSON: video hash, inference settings, frame size, fps
+"""
+
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+
+from .video_replay import VideoReplay
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 2  # 2: motion measured by MotionEngine (downscaled)
+
+
+def video_fingerprint(video_path: str, samples: int = 16, sample_size: int = 1 << 20) -> str:
+    """Content hash of a video: file size + evenly spaced 1 MiB samples (fast on multi-GB files)"""
+    path = Path(video_path)
+    size = path.stat().st_size
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        for i in range(samples):
+            f.seek(max(0, (size - sample_size) * i // max(1, samples - 1)))
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class PoseRecording:
+    """Cached pose detections of one video"""
+
+    def __init__(self, timestamps: np.ndarray, motion: np.ndarray, offsets: np.ndarray,
+                 boxes: np.ndarray, keypoints: np.ndarray, meta: Dict):
+        self.timestamps = timestamps
+        self.motion = motion
+        self.offsets = offsets
+        self.boxes = boxes
+        self.keypoints = keypoints
+        self.meta = meta
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def frame_size(self) -> Tuple[int, int]:
+        """(height, width)"""
+        return tuple(self.meta['frame_size'])
+
+    @property
+    def detections(self) -> int:
+        return len(self.boxes)
+
+    def frame(self, index: int) -> Tuple[float, np.ndarray, np.ndarray, float]:
+        """(timestamp, boxes, keypoints, motion) of one frame"""
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return (float(self.timestamps[index]), self.boxes[start:end],
+                self.keypoints[start:end], float(self.motion[index]))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.frame(index)
+
+    def save(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(str(path) + '.tmp.npz')
+        np.savez_compressed(tmp, timestamps=self.timestamps, motion=self.motion, offsets=self.offsets,
+                            boxes=self.boxes, keypoints=self.keypoints, meta=json.dumps(self.meta))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: str) -> 'PoseRecording':
+        with np.load(path) as data:
+            return cls(data['timestamps'], data['motion'], data['offsets'],
+                       data['boxes'], data['keypoints'], json.loads(str(data['meta'])))
+
+
+class PoseCache:
+    """Directory of PoseRecordings, one per (video content, inference settings)"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+
+    def path_for(self, video_path: str, settings: Dict) -> Path:
+        settings_key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:8]
+        name = f"{Path(video_path).stem}_{video_fingerprint(video_path)[:16]}_{settings['model']}_{settings_key}.npz"
+        return self.cache_dir / name
+
+    def load(self, video_path: str, settings: Dict) -> Optional[PoseRecording]:
+        path = self.path_for(video_path, settings)
+        if not path.exists():
+            return None
+        recording = PoseRecording.load(str(path))
+        if recording.meta.get('version') != CACHE_VERSION:
+            return None
+        return recording
+
+    def build(self, video_path: str, detector) -> PoseRecording:
+        """Run the pose model (and motion measurement) over every frame and save the result"""
+        settings = detector.inference_settings()
+        replay = VideoReplay(video_path)
+        detector.reset()
+
+        timestamps, motion, counts, boxes, keypoints = [], [], [], [], []
+        start = time.perf_counter()
+        for index, frame, timestamp in replay:
+            _, frame_boxes, frame_keypoints = detector.detect_poses(frame)
+            timestamps.append(timestamp)
+            motion.append(detector._detect_motion_magnitude(frame))
+            counts.append(len(frame_boxes))
+            boxes.append(frame_boxes)
+            keypoints.append(frame_keypoints)
+            if index and index % 1000 == 0:
+                logger.info(f"📦 Pose cache {Path(video_path).name}: {index}/{replay.frame_count} frames")
+
+        recording = PoseRecording(
+            timestamps=np.asarray(timestamps, dtype=np.float64),
+            motion=np.asarray(motion, dtype=np.float32),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            boxes=np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32),
+            keypoints=np.concatenate(keypoints) if keypoints else np.zeros((0, 17, 3), dtype=np.float32),
+            meta={
+                'version': CACHE_VERSION,
+                'video': Path(video_path).name,
+                'video_hash': video_fingerprint(video_path),
+                'settings': settings,
+                'frame_size': [replay.height, replay.width],
+                'fps': replay.fps,
+            },
+        )
+        path = self.path_for(video_path, settings)
+        recording.save(str(path))
+        logger.info(f"💾 Pose cache saved: {path.name} ({len(recording)} frames, {recording.detections} "
+                    f"detections, {time.perf_counter() - start:.0f}s)")
+        return recording
+
+    def get_or_build(self, video_path: str, detector) -> PoseRecording:
+        recording = self.load(video_path, detector.inference_settings())
+        return recording if recording is not None else self.build(video_path, detector)
+
+
+def replay_poses(detector, recording: PoseRecording) -> Iterator[Tuple[int, float, dict]]:
+    """
+    Run the fall logic of a detector over cached poses (the detector's model is not used).
+
+    Yields:
+        (frame_index, timestamp, update() result) for every frame
+    """
+    detector.reset()
+    frame_size = recording.frame_size
+    for index, (timestamp, boxes, keypoints, motion) in enumerate(recording):
+        yield index, timestamp, detector.update(boxes, keypoints, timestamp, frame_size, motion)
@@ -0,0 +1,101 @@
+"""
+Pose Features
+Vectorized geometric features for every person in a YOLOv8-pose result
+
+compute_pose_features() takes the (N, 17, 3) keypoint tensor (x, y, conf per
+COCO keypoint, as in result.keypoints.data) and computes the features used by
+YOLOFallDetector for all N people at once. Missing features (keypoints not
+confident enough) are NaN. Thresholds match the original per-person methods.
+"""
+
+import numpy as np
+
+# COCO keypoint indices
+NOSE = 0
+LEFT_EYE, RIGHT_EYE = 1, 2
+LEFT_SHOULDER, RIGHT_SHOULDER = 5, 6
+LEFT_HIP, RIGHT_HIP = 11, 12
+LEFT_ANKLE, RIGHT_ANKLE = 15, 16
+
+POSE_FEATURE_DTYPE = np.dtype([
+    ('center_x', np.float32),       # Hip centre (px)
+    ('center_y', np.float32),
+    ('angle', np.float32),          # Torso angle from vertical (deg, 0 = upright, 90 = horizontal)
+    ('bbox_ratio', np.float32),     # Width / height of visible keypoints (> 1 = horizontal body)
+    ('head_hip_diff', np.float32),  # hip_y - head_y (px, small / negative = lying)
+    ('leg_angle', np.float32),      # Mean hip -> ankle angle from vertical (deg)
+    ('support', np.float32),        # Base-of-support factor of the stability score (0.3-1.0)
+])
+
+
+def stack_keypoints(xy: np.ndarray, conf: np.ndarray) -> np.ndarray:
+    """(N, 17, 2) positions + (N, 17) confidences -> (N, 17, 3)"""
+    return np.concatenate([np.asarray(xy, dtype=np.float32),
+                           np.asarray(conf, dtype=np.float32)[..., None]], axis=-1)
+
+
+def compute_pose_features(keypoints: np.ndarray, bbox_min_conf: float = 0.3) -> np.ndarray:
+    """
+    Geometric features of N people.
+
+    Args:
+        keypoints: (N, 17, 3) array of x, y, confidence (a single (17, 3) person is accepted)
+        bbox_min_conf: keypoint confidence needed to count in the bbox ratio
+
+    Returns:
+        Structured array of shape (N,) with POSE_FEATURE_DTYPE fields
+    """
+    kp = np.asarray(keypoints, dtype=np.float32).reshape(-1, 17, 3)
+    xy, conf = kp[..., :2], kp[..., 2]
+    features = np.full(len(kp), np.nan, dtype=POSE_FEATURE_DTYPE)
+    if len(kp) == 0:
+        return features
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Body centre: both hips visible
+        hips_ok = (conf[:, LEFT_HIP] > 0.5) & (conf[:, RIGHT_HIP] > 0.5)
+        hip_center = (xy[:, LEFT_HIP] + xy[:, RIGHT_HIP]) / 2
+        features['center_x'] = np.where(hips_ok, hip_center[:, 0], np.nan)
+        features['center_y'] = np.where(hips_ok, hip_center[:, 1], np.nan)
+
+        # Torso angle: shoulder centre - hip centre vs. up (0, -1)
+        shoulder_center = (xy[:, LEFT_SHOULDER] + xy[:, RIGHT_SHOULDER]) / 2
+        body = shoulder_center - hip_center
+        body_len = np.linalg.norm(body, axis=1)
+        torso_ok = hips_ok & (conf[:, LEFT_SHOULDER] > 0.5) & (conf[:, RIGHT_SHOULDER] > 0.5) & (body_len > 0)
+        angle = np.degrees(np.arccos(np.clip(-body[:, 1] / body_len, -1, 1)))
+        features['angle'] = np.where(torso_ok, angle, np.nan)
+
+        # Bbox ratio of visible keypoints (at least 4, height >= 10px)
+        visible = conf > bbox_min_conf
+        lo = np.where(visible[..., None], xy, np.inf).min(axis=1)
+        hi = np.where(visible[..., None], xy, -np.inf).max(axis=1)
+        width, height = hi[:, 0] - lo[:, 0], hi[:, 1] - lo[:, 1]
+        bbox_ok = (visible.sum(axis=1) >= 4) & (height >= 10)
+        features['bbox_ratio'] = np.where(bbox_ok, width / height, np.nan)
+
+        # Head - hip vertical difference (nose, else both eyes)
+        nose_ok = conf[:, NOSE] > 0.5
+        eyes_ok = (conf[:, LEFT_EYE] > 0.5) & (conf[:, RIGHT_EYE] > 0.5)
+        eyes_y = (xy[:, LEFT_EYE, 1] + xy[:, RIGHT_EYE, 1]) / 2
+        head_y = np.where(nose_ok, xy[:, NOSE, 1], np.where(eyes_ok, eyes_y, np.nan))
+        features['head_hip_diff'] = np.where(hips_ok, hip_center[:, 1] - head_y, np.nan)
+
+        # Leg angle: hip -> ankle vs. down (0, 1), averaged over visible legs
+        hips = xy[:, [LEFT_HIP, RIGHT_HIP]]
+        ankles = xy[:, [LEFT_ANKLE, RIGHT_ANKLE]]
+        leg = ankles - hips
+        leg_len = np.linalg.norm(leg, axis=-1)
+        leg_ok = ((conf[:, [LEFT_HIP, RIGHT_HIP]] > 0.4) &
+                  (conf[:, [LEFT_ANKLE, RIGHT_ANKLE]] > 0.4) & (leg_len > 10))
+        leg_angles = np.degrees(np.arccos(np.clip(leg[..., 1] / leg_len, -1, 1)))
+        legs = leg_ok.sum(axis=1)
+        features['leg_angle'] = np.where(
+            legs > 0, np.where(leg_ok, leg_angles, 0).sum(axis=1) / np.maximum(legs, 1), np.nan)
+
+        # Base of support: wider stance = more stable (200px = max normal width)
+        feet_ok = (conf[:, LEFT_ANKLE] > 0.5) & (conf[:, RIGHT_ANKLE] > 0.5)
+        feet_distance = np.linalg.norm(xy[:, LEFT_ANKLE] - xy[:, RIGHT_ANKLE], axis=1)
+        features['support'] = np.where(feet_ok, 0.3 + 0.7 * np.minimum(feet_distance / 200, 1.0), 0.5)
+
+    return features
@@ -0,0 +1,176 @@
+"""
+Pose Tracker
+Associate YOLOv8-pose detections to persistent track IDs across frames
+
+Each person in view gets a slot in fixed-size arrays: association data
+(box, last seen, missed frames) and the fall / lying state machine of
+YOLOFallDetector live side by side, indexed by slot. A second patient or a
+nurse walking through gets their own slot, so their motion never leaks
+into the speed / acceleration history of the person being watched.
+"""
+
+import logging
+from typing import List, Tuple
+import numpy as np
+
+from ..utils.ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class TrackHistory(RingBuffer):
+    """Per-track time series, one row per frame the person was detected (NaN = missing)"""
+
+    T, CX, CY, ANGLE, SPEED, ACCEL, STABILITY = range(7)
+
+    def __init__(self, size: int):
+        super().__init__(size, width=7)
+
+
+class PoseTracker:
+    """
+    Greedy box association of pose detections to track slots.
+
+    - affinity = max(IoU, centre proximity): a falling person's box changes
+      shape quickly (tall -> wide), IoU alone would start a new track mid-fall
+    - unmatched detections open a free slot (or replace the stalest track)
+    - tracks missed for more than max_missing frames are evicted
+    """
+
+    def __init__(self, capacity: int = 10, history_size: int = 30,
+                 max_missing: int = 10, min_affinity: float = 0.3):
+        self.capacity = capacity
+        self.max_missing = max_missing
+        self.min_affinity = min_affinity
+        self._next_id = 1
+
+        # Association
+        self.active = np.zeros(capacity, dtype=bool)
+        self.ids = np.full(capacity, -1, dtype=np.int64)
+        self.boxes = np.zeros((capacity, 4), dtype=np.float32)  # x1, y1, x2, y2
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.missing = np.zeros(capacity, dtype=np.int32)
+
+        # Fall / lying state (owned by YOLOFallDetector, NaN = not started, -inf = never alerted)
+        self.state = np.zeros(capacity, dtype=np.int8)  # 0 = unknown
+        self.fall_start = np.full(capacity, np.nan)
+        self.fall_confirmed = np.zeros(capacity, dtype=bool)
+        self.last_fall_time = np.full(capacity, -np.inf)
+        self.lying_start = np.full(capacity, np.nan)
+        self.last_lying_alert = np.full(capacity, -np.inf)
+        self.falling_frames = np.zeros(capacity, dtype=np.int32)
+        self.was_falling = np.zeros(capacity, dtype=bool)
+
+        # Last valid measurements (used while the track is missing)
+        self.last_center = np.full((capacity, 2), np.nan, dtype=np.float32)
+        self.last_angle = np.full(capacity, np.nan, dtype=np.float32)
+        self.last_speed = np.zeros(capacity, dtype=np.float32)
+        self.last_accel = np.zeros(capacity, dtype=np.float32)
+
+        self.history: List[TrackHistory] = [TrackHistory(history_size) for _ in range(capacity)]
+
+    @property
+    def active_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.active)
+
+    @staticmethod
+    def affinity(track_boxes: np.ndarray, det_boxes: np.ndarray) -> np.ndarray:
+        """(T, N) association score in [0, 1]"""
+        tb = track_boxes[:, None, :]
+        db = det_boxes[None, :, :]
+        iw = np.clip(np.minimum(tb[..., 2], db[..., 2]) - np.maximum(tb[..., 0], db[..., 0]), 0, None)
+        ih = np.clip(np.minimum(tb[..., 3], db[..., 3]) - np.maximum(tb[..., 1], db[..., 1]), 0, None)
+        inter = iw * ih
+        area_t = (tb[..., 2] - tb[..., 0]) * (tb[..., 3] - tb[..., 1])
+        area_d = (db[..., 2] - db[..., 0]) * (db[..., 3] - db[..., 1])
+        iou = inter / (area_t + area_d - inter + 1e-6)
+
+        # Centre distance relative to the track box diagonal
+        centre_t = (tb[..., :2] + tb[..., 2:]) / 2
+        centre_d = (db[..., :2] + db[..., 2:]) / 2
+        diag = np.hypot(tb[..., 2] - tb[..., 0], tb[..., 3] - tb[..., 1]) + 1e-6
+        proximity = np.clip(1.0 - np.linalg.norm(centre_t - centre_d, axis=-1) / diag, 0.0, 1.0)
+        return np.maximum(iou, 0.6 * proximity)
+
+    def update(self, boxes: np.ndarray, timestamp: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Associate this frame's detections.
+
+        Returns:
+            slots: (N,) track slot per detection, -1 if no slot was available
+            missing: slots of active tracks not seen in this frame
+        """
+        n = len(boxes)
+        slots = np.full(n, -1, dtype=np.int64)
+        active = self.active_slots
+
+        if n and len(active):
+            scores = self.affinity(self.boxes[active], boxes)
+            taken = np.zeros(len(active), dtype=bool)
+            for flat in np.argsort(scores, axis=None)[::-1]:
+                t, d = divmod(int(flat), n)
+                if scores[t, d] < self.min_affinity:
+                    break
+                if taken[t] or slots[d] >= 0:
+                    continue
+                taken[t] = True
+                slots[d] = active[t]
+
+        for d in np.flatnonzero(slots < 0):
+            slots[d] = self._open_track(exclude=slots)
+
+        seen = slots[slots >= 0]
+        self.boxes[seen] = boxes[slots >= 0]
+        self.last_seen[seen] = timestamp
+        self.missing[seen] = 0
+
+        missing = np.setdiff1d(self.active_slots, seen)
+        self.missing[missing] += 1
+        return slots, missing
+
+    def _open_track(self, exclude: np.ndarray) -> int:
+        free = np.flatnonzero(~self.active)
+        if len(free):
+            slot = int(free[0])
+        else:
+            # Full: replace the stalest track not matched in this frame
+            candidates = np.setdiff1d(self.active_slots, exclude)
+            if not len(candidates):
+                return -1
+            slot = int(candidates[np.argmax(self.missing[candidates])])
+            logger.info(f"👥 Track #{self.ids[slot]} replaced (tracker full)")
+        self.reset_slot(slot)
+        self.active[slot] = True
+        self.ids[slot] = self._next_id
+        self._next_id += 1
+        return slot
+
+    def evict_stale(self) -> np.ndarray:
+        """Drop tracks missed for more than max_missing frames, returns their slots"""
+        stale = np.flatnonzero(self.active & (self.missing > self.max_missing))
+        for slot in stale:
+            logger.info(f"👋 Track #{self.ids[slot]} lost for {self.missing[slot]} frames, removed")
+            self.reset_slot(slot)
+        return stale
+
+    def reset_slot(self, slot: int):
+        self.active[slot] = False
+        self.ids[slot] = -1
+        self.missing[slot] = 0
+        self.state[slot] = 0
+        self.fall_start[slot] = np.nan
+        self.fall_confirmed[slot] = False
+        self.last_fall_time[slot] = -np.inf
+        self.lying_start[slot] = np.nan
+        self.last_lying_alert[slot] = -np.inf
+        self.falling_frames[slot] = 0
+        self.was_falling[slot] = False
+        self.last_center[slot] = np.nan
+        self.last_angle[slot] = np.nan
+        self.last_speed[slot] = 0.0
+        self.last_accel[slot] = 0.0
+        self.history[slot].clear()
+
+    def reset(self):
+        for slot in range(self.capacity):
+            self.reset_slot(slot)
@@ -0,0 +1,134 @@
+"""
+ROI Selector
+Choose where YOLOv8-pose looks: padded crops around tracked persons, or the whole frame
+
+Once every tracked person has been found, pose inference can run on padded
+crops around their last boxes instead of the whole frame. A small crop is
+letterboxed to the model's imgsz rather than shrunk into it, so keypoints
+get more pixels and inference is cheaper. Overlapping crops are merged, so
+each person is seen once. plan() falls back to a full-frame scan:
+- every rescan_interval seconds, to pick up people entering the scene,
+- when there are no tracks, or a track was missed in the last frame,
+- when the crops would cover most of the frame anyway.
+
+Detections cut by an inner crop edge (a neighbour half inside the crop,
+or a person who moved further than the padding) are dropped. The
+affected track is then missing for one frame, which forces a full scan on
+the next.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+Crop = Tuple[int, int, int, int]  # x1, y1, x2, y2 in frame pixels
+
+
+def _overlap(a: np.ndarray, b: np.ndarray) -> bool:
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class ROISelector:
+    """Per-camera crop planner for pose inference (see module docstring)"""
+
+    def __init__(self, padding: float = 0.5, rescan_interval: float = 1.0, min_size: int = 160,
+                 max_crops: int = 2, max_area_ratio: float = 0.6, imgsz: Optional[int] = None):
+        self.padding = padding  # Added on each side, as a fraction of the box width / height
+        self.rescan_interval = rescan_interval
+        self.min_size = min_size  # Smallest crop side (px)
+        self.max_crops = max_crops  # More crops than this are merged into one
+        self.max_area_ratio = max_area_ratio  # Crops covering more of the frame run a full scan instead
+        self.imgsz = imgsz  # Model input size for crops (None = same as full frame)
+
+        self.last_full_scan = float('-inf')
+        self.stats = {'frames': 0, 'full_scans': 0, 'roi_frames': 0, 'crops': 0,
+                      'dropped': 0, 'area_ratio_sum': 0.0}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'ROISelector':
+        """Build from the fall_detection.roi section of config.yaml"""
+        return cls(
+            padding=config.get('padding', 0.5),
+            rescan_interval=config.get('rescan_interval', 1.0),
+            min_size=config.get('min_size', 160),
+            max_crops=config.get('max_crops', 2),
+            max_area_ratio=config.get('max_area_ratio', 0.6),
+            imgsz=config.get('imgsz'),
+        )
+
+    def plan(self, boxes: np.ndarray, frame_size: Tuple[int, int], timestamp: float,
+             complete: bool = True) -> Optional[List[Crop]]:
+        """
+        Crops for this frame, or None for a full-frame scan
+
+        Args:
+            boxes: (N, 4) last boxes of the tracked persons, xyxy
+            frame_size: (height, width) of the frame
+            timestamp: Frame time in seconds
+            complete: False when a track was missed in the last frame
+        """
+        self.stats['frames'] += 1
+        crops = None
+        if complete and len(boxes) and timestamp - self.last_full_scan < self.rescan_interval:
+            crops = self._crops(boxes, frame_size)
+            height, width = frame_size
+            area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in crops) / float(height * width)
+            if area > self.max_area_ratio:
+                crops = None
+            else:
+                self.stats['area_ratio_sum'] += area
+
+        if crops is None:
+            self.last_full_scan = timestamp
+            self.stats['full_scans'] += 1
+        else:
+            self.stats['roi_frames'] += 1
+            self.stats['crops'] += len(crops)
+        return crops
+
+    def _crops(self, boxes: np.ndarray, frame_size: Tuple[int, int]) -> List[Crop]:
+        height, width = frame_size
+        size = boxes[:, 2:] - boxes[:, :2]
+        center = (boxes[:, :2] + boxes[:, 2:]) / 2.0
+        half = np.maximum(size * (0.5 + self.padding), self.min_size / 2.0)
+        limit = np.array([width, height], dtype=np.float32)
+        rects = np.concatenate([np.clip(center - half, 0, limit), np.clip(center + half, 0, limit)], axis=1)
+
+        # Merge overlapping crops until none overlap (each person inferred once)
+        rects = list(rects)
+        while True:
+            pair = next(((i, j) for i in range(len(rects)) for j in range(i + 1, len(rects))
+                         if _overlap(rects[i], rects[j])), None)
+            if pair is None:
+                break
+            i, j = pair
+            rects[i] = np.concatenate([np.minimum(rects[i][:2], rects[j][:2]), np.maximum(rects[i][2:], rects[j][2:])])
+            del rects[j]
+        if len(rects) > self.max_crops:
+            stacked = np.stack(rects)
+            rects = [np.concatenate([stacked[:, :2].min(axis=0), stacked[:, 2:].max(axis=0)])]
+        return [tuple(int(v) for v in np.round(r)) for r in rects]
+
+    def keep(self, box: np.ndarray, crop: Crop, frame_size: Tuple[int, int], margin: float = 2.0) -> bool:
+        """False for a detection (crop coordinates) cut by an edge of the crop that is not a frame edge"""
+        x1, y1, x2, y2 = crop
+        height, width = frame_size
+        cut = ((x1 > 0 and box[0] <= margin) or (y1 > 0 and box[1] <= margin)
+               or (x2 < width and box[2] >= x2 - x1 - margin) or (y2 < height and box[3] >= y2 - y1 - margin))
+        if cut:
+            self.stats['dropped'] += 1
+        return not cut
+
+    def reset(self):
+        self.last_full_scan = float('-inf')
+
+    def reset_stats(self):
+        self.stats = dict.fromkeys(self.stats, 0)
+        self.stats['area_ratio_sum'] = 0.0
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        area_ratio_sum = stats.pop('area_ratio_sum')
+        roi_frames, frames = stats['roi_frames'], stats['frames']
+        stats['mean_area_ratio'] = round(area_ratio_sum / roi_frames, 3) if roi_frames else None
+        stats['roi_ratio'] = round(roi_frames / frames, 3) if frames else 0.0
+        return stats
@@ -5,13 +5,21 @@ Detect falls using YOLOv8 pose estimation (compatible with Python 3.13)
 
 import time
 import logging
-from typing import Dict, List, Optional, Tuple
-from collections import deque
-from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from enum import Enum
 import numpy as np
 import cv2
 
+from .pose_features import compute_pose_features, stack_keypoints
+from .pose_tracker import PoseTracker, TrackHistory
+from .motion_engine import MotionEngine
+from .roi_selector import ROISelector
+from ..utils.ring_buffer import RingBuffer
+from ..utils.jpeg_encoder import JPEGEncoderPool
+
 try:
     from ultralytics import YOLO
     YOLO_AVAILABLE = True
@@ -31,6 +39,11 @@ class PoseState(Enum):
     UNKNOWN = "unknown"
 
 
+# PoseState <-> code stored in PoseTracker.state, ordered by severity (0 = unknown)
+STATE_CODES = (PoseState.UNKNOWN, PoseState.STANDING, PoseState.SITTING, PoseState.LYING, PoseState.FALLING)
+_STATE_INDEX = {state: code for code, state in enumerate(STATE_CODES)}
+
+
 @dataclass
 class FallEvent:
     """Represents a fall detection event"""
@@ -39,7 +52,13 @@ class FallEvent:
     location: Tuple[int, int]  # x, y in frame
     previous_state: PoseState
     duration: float  # Time from start of fall
-    frame_data: Optional[bytes] = None
+    evidence: Optional[Future] = field(default=None, repr=False)  # JPEG of the alert frame, encoded off-thread
+    track_id: Optional[int] = None  # Person the event belongs to (None = frame-level motion)
+    
+    @property
+    def frame_data(self) -> Optional[bytes]:
+        """JPEG bytes of the alert frame (blocks until the background encode finishes)"""
+        return self.evidence.result() if self.evidence is not None else None
 
 
 class YOLOFallDetector:
@@ -48,6 +67,7 @@ class YOLOFallDetector:
     
     Features:
     - Detect human skeleton/keypoints using YOLOv8-pose
+    - Track every person in view (persistent track IDs, per-track state)
     - Track posture, speed, and orientation
     - Detect sudden changes indicating a fall
     - Configurable thresholds to reduce false positives
@@ -72,15 +92,35 @@ class YOLOFallDetector:
     LEFT_ANKLE = 15
     RIGHT_ANKLE = 16
     
-    def __init__(self, config: dict = None):
+    # COCO keypoint pairs drawn as limbs
+    SKELETON = (
+        (LEFT_ANKLE, LEFT_KNEE), (LEFT_KNEE, LEFT_HIP), (RIGHT_ANKLE, RIGHT_KNEE), (RIGHT_KNEE, RIGHT_HIP),
+        (LEFT_HIP, RIGHT_HIP), (LEFT_SHOULDER, LEFT_HIP), (RIGHT_SHOULDER, RIGHT_HIP),
+        (LEFT_SHOULDER, RIGHT_SHOULDER), (LEFT_SHOULDER, LEFT_ELBOW), (RIGHT_SHOULDER, RIGHT_ELBOW),
+        (LEFT_ELBOW, LEFT_WRIST), (RIGHT_ELBOW, RIGHT_WRIST), (NOSE, LEFT_EYE), (NOSE, RIGHT_EYE),
+        (LEFT_EYE, LEFT_EAR), (RIGHT_EYE, RIGHT_EAR), (LEFT_EAR, LEFT_SHOULDER), (RIGHT_EAR, RIGHT_SHOULDER),
+    )
+    
+    DEFAULT_FALL_WEIGHTS = {
+        'angle': 0.30,
+        'speed': 0.25,
+        'acceleration': 0.20,
+        'instability': 0.15,
+        'position': 0.10,
+    }
+    
+    def __init__(self, config: dict = None, clock: Callable[[], float] = time.time, load_model: bool = True):
         """
         Initialize Fall Detection Module
         
         Args:
             config: Configuration dictionary with fall detection settings
+            clock: Time source for frames processed without a timestamp (seconds)
+            load_model: False to only run the fall logic on given poses (update(), cached replay)
         """
         config = config or {}
         self.config = config
+        self.clock = clock
         
         # GPU settings
         self.use_gpu = config.get('use_gpu', True)
@@ -89,7 +129,12 @@ class YOLOFallDetector:
         
         # Load YOLOv8-pose model
         model_path = config.get('model_path', 'yolov8n-pose.pt')
-        if YOLO_AVAILABLE:
+        self.model_path = model_path
+        if not load_model:
+            self.model = None
+            self.device = 'cpu'
+            self.half_precision = False
+        elif YOLO_AVAILABLE:
             self.model = YOLO(model_path)
             
             # Check GPU availability
@@ -114,49 +159,46 @@ class YOLOFallDetector:
         self.confidence_threshold = config.get('conf_threshold', config.get('confidence_threshold', 0.5))
         self.iou_threshold = config.get('iou_threshold', 0.45)
         
+        # ROI mode: infer on padded crops around tracked persons, periodic full-frame rescan
+        roi_config = config.get('roi', {})
+        self.roi = ROISelector.from_config(roi_config) if roi_config.get('enabled', False) else None
+        
         # Fall detection thresholds
         threshold_config = config.get('fall_threshold', {})
         self.vertical_speed_threshold = threshold_config.get('vertical_speed', 0.3)
-        self.angle_threshold = threshold_config.get('angle_threshold', 50)  # degrees from vertical
+        self.angle_threshold = threshold_config.get('angle_threshold', 70)  # degrees from vertical (lying body angle)
         self.duration_threshold = threshold_config.get('duration_threshold', 0.3)  # seconds
+        # Fall confidence factor weights (see _calculate_fall_confidence)
+        self.fall_weights = {**self.DEFAULT_FALL_WEIGHTS, **threshold_config.get('weights', {})}
         self.cooldown_seconds = config.get('cooldown_seconds', 5)
         
-        # Tracking state
+        # Alert evidence frames are JPEG-encoded off the detection thread
+        self.evidence_encoder = JPEGEncoderPool(config.get('evidence_workers', 1),
+                                                config.get('evidence_jpeg_quality', 95))
+        
+        # Multi-person tracking: per-track histories and fall / lying state
         self.history_size = 30  # Number of frames to keep
-        self.pose_history: deque = deque(maxlen=self.history_size)
-        self.center_history: deque = deque(maxlen=self.history_size)
-        self.angle_history: deque = deque(maxlen=self.history_size)
-        self.timestamp_history: deque = deque(maxlen=self.history_size)
+        self.max_missing_frames = config.get('max_missing_frames', 10)  # Số frame cho phép mất detection
+        self.tracker = PoseTracker(
+            capacity=config.get('max_tracks', config.get('max_det', 10)),
+            history_size=self.history_size,
+            max_missing=self.max_missing_frames,
+            min_affinity=config.get('track_min_affinity', 0.3),
+        )
         
-        # NEW: Advanced tracking for better fall detection
-        self.velocity_history: deque = deque(maxlen=self.history_size)  # Track velocities
-        self.acceleration_history: deque = deque(maxlen=10)  # Track accelerations
-        self.stability_scores: deque = deque(maxlen=self.history_size)  # Track balance
+        self.current_state = PoseState.UNKNOWN  # State of the primary (most critical) track
+        self.last_fall_time: float = float('-inf')  # Last alert of any kind (cooldown for frame-level motion alerts)
         
-        self.current_state = PoseState.UNKNOWN
-        self.fall_start_time: Optional[float] = None
-        self.last_fall_time: float = 0
-        self.fall_confirmed = False
-        
-        # LYING detection tracking
-        self.lying_start_time: Optional[float] = None
-        self.last_lying_alert_time: float = 0
+        # LYING detection settings
         self.lying_alert_threshold = config.get('lying_alert_threshold', 3.0)  # Alert after 3s of lying
         self.lying_cooldown = config.get('lying_cooldown', 10.0)  # Cooldown between lying alerts
         
-        # Missing detection tracking
+        # Frames in a row without any person detected
         self.missing_frames = 0
-        self.max_missing_frames = config.get('max_missing_frames', 10)  # Số frame cho phép mất detection
-        self.last_valid_center: Optional[Tuple[float, float]] = None
-        self.last_valid_angle: Optional[float] = None
-        self.last_valid_speed: float = 0.0
-        self.last_valid_acceleration: float = 0.0  # NEW
-        self.was_falling_before_missing = False
-        self.frames_in_falling_state = 0  # Đếm số frame ở trạng thái FALLING
         
         # CRITICAL: Motion-based detection (không cần bounding box)
-        self.prev_frame = None  # Frame trước đó
-        self.frame_diff_history: deque = deque(maxlen=10)  # Lịch sử frame difference
+        self.motion_engine = MotionEngine(width=config.get('motion_width', 160))  # Frame differencing (downscaled)
+        self.frame_diff_history = RingBuffer(10)  # Lịch sử frame difference
         self.motion_detected_frames = 0  # Số frame liên tiếp có motion lớn
         self.motion_threshold = config.get('motion_threshold', 0.15)  # Ngưỡng phát hiện motion lớn
         self.use_motion_fallback = config.get('use_motion_fallback', True)  # Enable motion-based detection
@@ -165,45 +207,48 @@ class YOLOFallDetector:
         if self.use_motion_fallback:
             logger.info("✅ Motion-based fallback detection ENABLED")
     
-    def _get_keypoints(self, result) -> Optional[np.ndarray]:
-        """Extract keypoints from YOLO result"""
-        if result.keypoints is None or len(result.keypoints) == 0:
-            return None
+    def _get_detections(self, result) -> Tuple[np.ndarray, np.ndarray]:
+        """Extract every person from a YOLO result
         
-        # Get first person's keypoints
-        kpts = result.keypoints[0]
-        if kpts.xy is None or len(kpts.xy) == 0:
-            return None
-        
-        return kpts.xy[0].cpu().numpy()  # Shape: (17, 2)
-    
-    def _get_keypoint_confidence(self, result) -> Optional[np.ndarray]:
-        """Extract keypoint confidence from YOLO result"""
-        if result.keypoints is None or len(result.keypoints) == 0:
-            return None
+        Returns:
+            boxes (N, 4) xyxy, keypoints (N, 17, 3) as x, y, confidence
+        """
+        empty = (np.zeros((0, 4), dtype=np.float32), np.zeros((0, 17, 3), dtype=np.float32))
+        if result is None or result.keypoints is None or len(result.keypoints) == 0:
+            return empty
         
-        kpts = result.keypoints[0]
-        if kpts.conf is None or len(kpts.conf) == 0:
-            return None
+        kpts = result.keypoints
+        if kpts.xy is None or kpts.conf is None or len(kpts.xy) == 0:
+            return empty
         
-        return kpts.conf[0].cpu().numpy()
+        keypoints = stack_keypoints(kpts.xy.cpu().numpy(), kpts.conf.cpu().numpy())
+        if result.boxes is not None and len(result.boxes) == len(keypoints):
+            boxes = result.boxes.xyxy.cpu().numpy().astype(np.float32)
+        else:
+            # Box from visible keypoints
+            boxes = np.zeros((len(keypoints), 4), dtype=np.float32)
+            for i, kpt in enumerate(keypoints):
+                visible = kpt[kpt[:, 2] > 0.3, :2] if np.any(kpt[:, 2] > 0.3) else kpt[:, :2]
+                boxes[i, :2] = visible.min(axis=0)
+                boxes[i, 2:] = visible.max(axis=0)
+        return boxes, keypoints
+    
+    def _pose_features(self, keypoints: np.ndarray, conf: np.ndarray) -> np.void:
+        """Feature row of one person (see pose_features.compute_pose_features)"""
+        return compute_pose_features(stack_keypoints(keypoints, conf))[0]
+    
+    @staticmethod
+    def _feature(features: np.void, name: str) -> Optional[float]:
+        """Feature value, None when it could not be computed"""
+        value = features[name]
+        return None if np.isnan(value) else float(value)
     
     def _get_body_center(self, keypoints: np.ndarray, conf: np.ndarray) -> Optional[Tuple[float, float]]:
         """Calculate body center from hip landmarks"""
-        try:
-            left_hip = keypoints[self.LEFT_HIP]
-            right_hip = keypoints[self.RIGHT_HIP]
-            left_conf = conf[self.LEFT_HIP]
-            right_conf = conf[self.RIGHT_HIP]
-            
-            if left_conf > 0.5 and right_conf > 0.5:
-                return (
-                    (left_hip[0] + right_hip[0]) / 2,
-                    (left_hip[1] + right_hip[1]) / 2
-                )
-        except (IndexError, TypeError):
-            pass
-        return None
+        features = self._pose_features(keypoints, conf)
+        if np.isnan(features['center_x']):
+            return None
+        return (float(features['center_x']), float(features['center_y']))
 
     def _get_body_bbox_ratio(self, keypoints: np.ndarray, conf: np.ndarray, min_conf: float = 0.3) -> Optional[float]:
         """Calculate width/height ratio of body bounding box
@@ -212,29 +257,8 @@ class YOLOFallDetector:
             ratio > 1.0: Body is more horizontal (lying)
             ratio < 1.0: Body is more vertical (standing/sitting)
         """
-        try:
-            # Collect all visible keypoints
-            visible_points = []
-            for i, (kpt, c) in enumerate(zip(keypoints, conf)):
-                if c > min_conf:
-                    visible_points.append(kpt)
-            
-            if len(visible_points) < 4:
-                return None
-            
-            points = np.array(visible_points)
-            x_min, y_min = points.min(axis=0)
-            x_max, y_max = points.max(axis=0)
-            
-            width = x_max - x_min
-            height = y_max - y_min
-            
-            if height < 10:  # Avoid division by near-zero
-                return None
-            
-            return width / height
-        except (IndexError, TypeError):
-            return None
+        features = compute_pose_features(stack_keypoints(keypoints, conf), bbox_min_conf=min_conf)[0]
+        return self._feature(features, 'bbox_ratio')
 
     def _get_head_hip_vertical_diff(self, keypoints: np.ndarray, conf: np.ndarray) -> Optional[float]:
         """Calculate vertical distance between head and hip (normalized)
@@ -243,26 +267,7 @@ class YOLOFallDetector:
             Large positive: Head is above hip (standing/sitting)
             Small/negative: Head is near or below hip level (lying)
         """
-        try:
-            # Get head position (nose or average of eyes)
-            head_y = None
-            if conf[self.NOSE] > 0.5:
-                head_y = keypoints[self.NOSE][1]
-            elif conf[self.LEFT_EYE] > 0.5 and conf[self.RIGHT_EYE] > 0.5:
-                head_y = (keypoints[self.LEFT_EYE][1] + keypoints[self.RIGHT_EYE][1]) / 2
-            
-            # Get hip position
-            hip_y = None
-            if conf[self.LEFT_HIP] > 0.5 and conf[self.RIGHT_HIP] > 0.5:
-                hip_y = (keypoints[self.LEFT_HIP][1] + keypoints[self.RIGHT_HIP][1]) / 2
-            
-            if head_y is None or hip_y is None:
-                return None
-            
-            # Positive = head above hip (normal), Negative = head below hip
-            return hip_y - head_y
-        except (IndexError, TypeError):
-            return None
+        return self._feature(self._pose_features(keypoints, conf), 'head_hip_diff')
 
     def _get_leg_angle(self, keypoints: np.ndarray, conf: np.ndarray) -> Optional[float]:
         """Calculate average leg angle from vertical
@@ -272,144 +277,55 @@ class YOLOFallDetector:
             30-60: Legs bent (sitting)
             60-90: Legs horizontal (lying)
         """
-        try:
-            angles = []
-            
-            # Left leg: hip -> ankle
-            if conf[self.LEFT_HIP] > 0.4 and conf[self.LEFT_ANKLE] > 0.4:
-                hip = keypoints[self.LEFT_HIP]
-                ankle = keypoints[self.LEFT_ANKLE]
-                leg_vector = ankle - hip
-                vertical = np.array([0, 1])  # Pointing down
-                
-                mag = np.linalg.norm(leg_vector)
-                if mag > 10:
-                    dot = np.dot(leg_vector, vertical)
-                    cos_angle = np.clip(dot / mag, -1, 1)
-                    angle = np.degrees(np.arccos(cos_angle))
-                    angles.append(angle)
-            
-            # Right leg: hip -> ankle
-            if conf[self.RIGHT_HIP] > 0.4 and conf[self.RIGHT_ANKLE] > 0.4:
-                hip = keypoints[self.RIGHT_HIP]
-                ankle = keypoints[self.RIGHT_ANKLE]
-                leg_vector = ankle - hip
-                vertical = np.array([0, 1])
-                
-                mag = np.linalg.norm(leg_vector)
-                if mag > 10:
-                    dot = np.dot(leg_vector, vertical)
-                    cos_angle = np.clip(dot / mag, -1, 1)
-                    angle = np.degrees(np.arccos(cos_angle))
-                    angles.append(angle)
-            
-            if angles:
-                return np.mean(angles)
-            return None
-        except (IndexError, TypeError):
-            return None
+        return self._feature(self._pose_features(keypoints, conf), 'leg_angle')
     
     def _get_body_angle(self, keypoints: np.ndarray, conf: np.ndarray) -> Optional[float]:
         """
         Calculate body angle from vertical
         Returns angle in degrees (0 = upright, 90 = horizontal)
         """
-        try:
-            # Get shoulders
-            left_shoulder = keypoints[self.LEFT_SHOULDER]
-            right_shoulder = keypoints[self.RIGHT_SHOULDER]
-            
-            # Get hips
-            left_hip = keypoints[self.LEFT_HIP]
-            right_hip = keypoints[self.RIGHT_HIP]
-            
-            # Check confidence
-            if (conf[self.LEFT_SHOULDER] > 0.5 and conf[self.RIGHT_SHOULDER] > 0.5 and
-                conf[self.LEFT_HIP] > 0.5 and conf[self.RIGHT_HIP] > 0.5):
-                
-                shoulder_center = np.array([
-                    (left_shoulder[0] + right_shoulder[0]) / 2,
-                    (left_shoulder[1] + right_shoulder[1]) / 2
-                ])
-                
-                hip_center = np.array([
-                    (left_hip[0] + right_hip[0]) / 2,
-                    (left_hip[1] + right_hip[1]) / 2
-                ])
-                
-                # Calculate angle from vertical
-                body_vector = shoulder_center - hip_center
-                vertical_vector = np.array([0, -1])  # Pointing up
-                
-                mag1 = np.linalg.norm(body_vector)
-                mag2 = np.linalg.norm(vertical_vector)
-                
-                if mag1 > 0 and mag2 > 0:
-                    dot = np.dot(body_vector, vertical_vector)
-                    cos_angle = np.clip(dot / (mag1 * mag2), -1, 1)
-                    angle = np.degrees(np.arccos(cos_angle))
-                    return angle
-        except (IndexError, TypeError):
-            pass
-        return None
+        return self._feature(self._pose_features(keypoints, conf), 'angle')
     
-    def _calculate_vertical_speed(self, frame_height: Optional[int] = None) -> float:
+    def _calculate_vertical_speed(self, history: TrackHistory, frame_height: Optional[int] = None) -> float:
         """Calculate vertical movement speed (normalized, 0-1)
         
         Positive = moving down, Negative = moving up
         Normalized by frame height for consistency across resolutions
+        Window: last 5 samples, pairs with a missing center are skipped
         """
-        if len(self.center_history) < 2 or len(self.timestamp_history) < 2:
-            return 0.0
-        
-        recent_centers = list(self.center_history)[-5:]
-        recent_times = list(self.timestamp_history)[-5:]
-        
-        if len(recent_centers) < 2:
+        window = history.last(5)
+        if len(window) < 2:
             return 0.0
         
-        total_dy = 0
-        total_dt = 0
-        
-        for i in range(1, len(recent_centers)):
-            if recent_centers[i] is not None and recent_centers[i-1] is not None:
-                dy = recent_centers[i][1] - recent_centers[i-1][1]
-                dt = recent_times[i] - recent_times[i-1]
-                if dt > 0:
-                    total_dy += dy
-                    total_dt += dt
+        dy = np.diff(window[:, TrackHistory.CY])
+        dt = np.diff(window[:, TrackHistory.T])
+        valid = ~np.isnan(dy) & (dt > 0)
+        total_dt = dt[valid].sum()
         
         if total_dt > 0:
-            speed_pixels = total_dy / total_dt  # Positive = moving down
+            speed_pixels = dy[valid].sum() / total_dt  # Positive = moving down
             
             # Normalize by frame height if provided
             if frame_height and frame_height > 0:
-                return speed_pixels / frame_height  # 0-1 range
-            return speed_pixels / 1000.0  # Fallback normalization
+                return float(speed_pixels / frame_height)  # 0-1 range
+            return float(speed_pixels / 1000.0)  # Fallback normalization
         return 0.0
     
-    def _calculate_acceleration(self, current_speed: float, current_time: float) -> float:
-        """Calculate vertical acceleration (change in speed)
+    def _calculate_acceleration(self, history: TrackHistory, current_speed: float, current_time: float) -> float:
+        """Calculate vertical acceleration (change in speed since the previous sample)
         
         High acceleration = sudden movement change (potential fall)
         """
-        if len(self.velocity_history) < 2 or len(self.timestamp_history) < 2:
+        if len(history) < 2:
             return 0.0
         
-        # Get previous speed and time
-        if len(self.velocity_history) > 0:
-            prev_speed = self.velocity_history[-1]
-            if len(self.timestamp_history) > 1:
-                prev_time = self.timestamp_history[-2]
-                dt = current_time - prev_time
-                
-                if dt > 0:
-                    acceleration = (current_speed - prev_speed) / dt
-                    return acceleration
-        
+        prev_time, prev_speed = history.last(2)[0, [TrackHistory.T, TrackHistory.SPEED]]
+        dt = current_time - prev_time
+        if dt > 0 and not np.isnan(prev_speed):
+            return float((current_speed - prev_speed) / dt)
         return 0.0
     
-    def _calculate_stability_score(self, keypoints: np.ndarray, conf: np.ndarray) -> float:
+    def _calculate_stability_score(self, keypoints: np.ndarray, conf: np.ndarray, history: TrackHistory) -> float:
         """Calculate pose stability score (0-1)
         
         Higher score = more stable/balanced
@@ -420,38 +336,20 @@ class YOLOFallDetector:
         - Center of mass position
         - Upper body sway
         """
-        try:
-            # Get ankle positions (base of support)
-            left_ankle = keypoints[self.LEFT_ANKLE]
-            right_ankle = keypoints[self.RIGHT_ANKLE]
-            left_ankle_conf = conf[self.LEFT_ANKLE]
-            right_ankle_conf = conf[self.RIGHT_ANKLE]
-            
-            stability = 1.0  # Start with max stability
-            
-            # Factor 1: Base of support
-            if left_ankle_conf > 0.5 and right_ankle_conf > 0.5:
-                feet_distance = np.linalg.norm(left_ankle - right_ankle)
-                # Wider base = more stable (normalize to 0-1)
-                base_score = min(feet_distance / 200, 1.0)  # 200px = max normal width
-                stability *= (0.3 + 0.7 * base_score)  # Weight: 30% base + 70% from width
-            else:
-                stability *= 0.5  # Penalty if can't see both feet
-            
-            # Factor 2: Upper body sway (shoulders movement)
-            if len(self.center_history) >= 5:
-                recent_centers = list(self.center_history)[-5:]
-                # Calculate standard deviation of positions
-                if all(c is not None for c in recent_centers):
-                    x_positions = [c[0] for c in recent_centers]
-                    sway = np.std(x_positions)
-                    sway_score = max(0, 1.0 - sway / 50)  # More sway = less stable
-                    stability *= sway_score
-            
-            return max(0.0, min(1.0, stability))
-            
-        except (IndexError, TypeError):
-            return 0.5  # Neutral score if calculation fails
+        return self._stability_score(float(self._pose_features(keypoints, conf)['support']), history)
+    
+    def _stability_score(self, support: float, history: TrackHistory) -> float:
+        """Stability from the base-of-support factor (pose feature) and recent sway"""
+        stability = support
+        
+        # Upper body sway (shoulders movement): std of the last 5 center x positions
+        x_positions = history.last(5)[:, TrackHistory.CX]
+        if len(x_positions) == 5 and not np.isnan(x_positions).any():
+            sway = x_positions.std()
+            sway_score = max(0, 1.0 - sway / 50)  # More sway = less stable
+            stability *= sway_score
+        
+        return max(0.0, min(1.0, stability))
     
     def _calculate_fall_confidence(self, angle: Optional[float], vertical_speed: float, 
                                     acceleration: float, stability: float, 
@@ -464,35 +362,36 @@ class YOLOFallDetector:
             return 0.0
         
         score = 0.0
+        weights = self.fall_weights
         
         # Factor 1: Angle (30% weight)
         angle_score = 0.0
         if angle > 30:
             angle_score = min((angle - 30) / 60, 1.0)  # 30-90° range
-        score += angle_score * 0.30
+        score += angle_score * weights['angle']
         
         # Factor 2: Downward velocity (25% weight)
         speed_score = 0.0
         if vertical_speed > 0:  # Moving down
             speed_score = min(vertical_speed / self.vertical_speed_threshold, 1.0)
-        score += speed_score * 0.25
+        score += speed_score * weights['speed']
         
         # Factor 3: Acceleration (20% weight)
         # High positive acceleration = suddenly moving down faster
         accel_score = 0.0
         if acceleration > 0.5:  # Sudden downward acceleration
             accel_score = min(acceleration / 2.0, 1.0)
-        score += accel_score * 0.20
+        score += accel_score * weights['acceleration']
         
         # Factor 4: Instability (15% weight)
         instability_score = 1.0 - stability  # Low stability = high fall risk
-        score += instability_score * 0.15
+        score += instability_score * weights['instability']
         
         # Factor 5: Vertical position (10% weight)
         if center_y_norm is not None:
             # If already near ground with high angle, likely falling/fallen
             if center_y_norm > 0.7 and angle > 60:
-                score += 0.10
+                score += weights['position']
             elif center_y_norm < 0.4:  # Still high up
                 score *= 0.8  # Reduce confidence if person is high up
         
@@ -504,66 +403,45 @@ class YOLOFallDetector:
         CRITICAL: Hoạt động KHÔNG CẦN bounding box
         Phát hiện sudden large motion = potential fall
         
+        Runs on a downscaled frame (MotionEngine), reports through
+        self.motion_engine.stats instead of logging every frame.
+        
         Returns:
-            Motion magnitude (0-1), cao = motion lớn
+            Motion magnitude (0-1), cao = motion lớn (lower half weighted 0.7)
         """
-        if self.prev_frame is None:
-            self.prev_frame = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
-            return 0.0
+        return self.motion_engine.update(current_frame)
+    
+    def observe_motion(self, frame: Optional[np.ndarray] = None, motion: Optional[float] = None):
+        """
+        Record the motion of a frame the pose model skipped (motion gate / calm rate)
         
-        try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(current_frame, cv2.COLOR_BGR2GRAY)
-            
-            # Apply Gaussian blur to reduce noise - GI���M từ 21x21 → 11x11
-            gray = cv2.GaussianBlur(gray, (11, 11), 0)
-            prev_gray = cv2.GaussianBlur(self.prev_frame, (11, 11), 0)
-            
-            # Compute absolute difference
-            frame_diff = cv2.absdiff(prev_gray, gray)
-            
-            # Threshold to get binary image - GIẢM từ 25 → 15 để nhạy hơn
-            _, thresh = cv2.threshold(frame_diff, 15, 255, cv2.THRESH_BINARY)
-            
-            # Calculate percentage of changed pixels
-            total_pixels = thresh.shape[0] * thresh.shape[1]
-            changed_pixels = np.count_nonzero(thresh)
-            motion_ratio = changed_pixels / total_pixels
-            
-            # Focus on lower half of frame (where falls happen)
-            lower_half = thresh[thresh.shape[0]//2:, :]
-            lower_changed = np.count_nonzero(lower_half)
-            lower_ratio = lower_changed / (lower_half.shape[0] * lower_half.shape[1])
-            
-            # Weighted average: lower half more important
-            motion_magnitude = (motion_ratio * 0.3) + (lower_ratio * 0.7)
-            
-            # Update prev frame
-            self.prev_frame = gray
-            
-            # LOG ALWAYS for debugging (không filter)
-            logger.info(f"🌊 Motion: {motion_magnitude:.3f} (thresh: {self.motion_threshold:.3f})")
-            
-            return min(motion_magnitude, 1.0)
-            
-        except Exception as e:
-            logger.error(f"Motion detection error: {e}")
-            return 0.0
+        The motion fallback compares each magnitude with the previous frames,
+        so the history has to be sampled on every camera frame, not only on
+        the frames process_frame() happens to see.
+        
+        Args:
+            frame: BGR frame, only used when motion is None
+            motion: magnitude already measured for this frame (e.g. MotionGate.magnitude)
+        """
+        if not self.use_motion_fallback:
+            return
+        if motion is None:
+            motion = self._detect_motion_magnitude(frame)
+        self.frame_diff_history.append(motion)
     
     def _analyze_motion_pattern(self, motion_mag: float, current_time: float) -> bool:
         """Analyze motion pattern to detect fall
         
         Returns True if motion pattern indicates fall
+        (motion_mag is already the last entry of frame_diff_history)
         """
-        self.frame_diff_history.append(motion_mag)
-        
         # GIẢM từ 5 → 2 frames để nhanh hơn
         if len(self.frame_diff_history) < 2:
             return False
         
-        recent_motion = list(self.frame_diff_history)[-5:] if len(self.frame_diff_history) >= 5 else list(self.frame_diff_history)
-        avg_motion = np.mean(recent_motion)
-        max_motion = np.max(recent_motion)
+        recent_motion = self.frame_diff_history.last(5)
+        avg_motion = recent_motion.mean()
+        max_motion = recent_motion.max()
         
         # CRITICAL: Chỉ phát hiện SUDDEN SPIKE, KHÔNG phải sustained motion
         # Sustained motion = đi bộ bình thường, Sudden spike = té ngã
@@ -599,7 +477,8 @@ class YOLOFallDetector:
     def _determine_pose_state(self, angle: Optional[float], vertical_speed: float, 
                               acceleration: float, stability: float,
                               keypoints: Optional[np.ndarray] = None, conf: Optional[np.ndarray] = None,
-                              center_y: Optional[float] = None, frame_height: Optional[int] = None) -> PoseState:
+                              center_y: Optional[float] = None, frame_height: Optional[int] = None,
+                              features: Optional[np.void] = None) -> PoseState:
         """Determine current pose state using advanced multi-factor analysis
         
         Key improvements:
@@ -608,6 +487,8 @@ class YOLOFallDetector:
         - Considers head-hip vertical difference
         - Considers leg angle
         - Better separation of sitting vs lying
+        
+        features: precomputed pose feature row (else computed from keypoints/conf)
         """
         if angle is None:
             return PoseState.UNKNOWN
@@ -622,10 +503,12 @@ class YOLOFallDetector:
         head_hip_diff = None
         leg_angle = None
         
-        if keypoints is not None and conf is not None:
-            bbox_ratio = self._get_body_bbox_ratio(keypoints, conf)
-            head_hip_diff = self._get_head_hip_vertical_diff(keypoints, conf)
-            leg_angle = self._get_leg_angle(keypoints, conf)
+        if features is None and keypoints is not None and conf is not None:
+            features = self._pose_features(keypoints, conf)
+        if features is not None:
+            bbox_ratio = self._feature(features, 'bbox_ratio')
+            head_hip_diff = self._feature(features, 'head_hip_diff')
+            leg_angle = self._feature(features, 'leg_angle')
         
         # Calculate fall confidence score (0-1)
         fall_confidence = self._calculate_fall_confidence(
@@ -645,7 +528,7 @@ class YOLOFallDetector:
         standing_score = 0
         
         # Factor 1: Body angle (primary indicator)
-        if angle > 70:
+        if angle > self.angle_threshold:
             lying_score += 3
         elif angle > 50:
             lying_score += 1
@@ -720,516 +603,625 @@ class YOLOFallDetector:
         else:
             return PoseState.STANDING
     
-    def process_frame(self, frame: np.ndarray) -> dict:
+    def process_frame(self, frame: np.ndarray, timestamp: Optional[float] = None,
+                      annotate: bool = True, motion: Optional[float] = None) -> dict:
         """
         Process a video frame for fall detection
         
+        Every person in the frame is associated to a track and evaluated in
+        the same pass; top-level state / angle / speed describe the primary
+        (most critical) track.
+        
         Args:
             frame: BGR image from camera
+            timestamp: Capture time of the frame in seconds (e.g. video PTS);
+                defaults to the detector clock. Speeds, accelerations,
+                cooldowns and lying durations are all measured on it, so a
+                recording replayed at any speed gives the same results.
+            annotate: Also return an annotated copy of the frame. Pass False
+                and call draw() on the frame actually published to skip the
+                copy and rendering when nobody is watching.
+            motion: Motion magnitude already measured on this frame against
+                the previous camera frame (e.g. MotionGate.magnitude). Pass
+                it when frames are skipped, together with observe_motion()
+                on the skipped frames; by default the detector diffs the
+                frames it is given.
             
         Returns:
             Dictionary with keys:
                 - fall_detected: bool
-                - fall_event: Optional[FallEvent]
-                - annotated_frame: np.ndarray
+                - fall_event: Optional[FallEvent] (first of fall_events)
+                - fall_events: List[FallEvent] (one per person that fell)
+                - lying_detected / lying_event / lying_events: same for lying alerts
+                - annotated_frame: np.ndarray (only when annotate=True)
                 - state: PoseState
                 - confidence: float
                 - angle: Optional[float]
                 - speed: float
+                - poses: per-track metrics (track_id, state, center, angle, ...)
         """
-        current_time = time.time()
-        fall_detected = False
-        fall_event = None
-        annotated_frame = frame.copy()
-        
-        result_dict = {
-            'fall_detected': False,
-            'fall_event': None,
-            'annotated_frame': annotated_frame,
-            'state': PoseState.UNKNOWN,
-            'confidence': 0.0,
-            'angle': None,
-            'speed': 0.0,
-        }
+        current_time = self.clock() if timestamp is None else timestamp
         
         if self.model is None:
+            result_dict = {
+                'fall_detected': False,
+                'fall_event': None,
+                'state': PoseState.UNKNOWN,
+                'confidence': 0.0,
+                'angle': None,
+                'speed': 0.0,
+            }
+            if annotate:
+                result_dict['annotated_frame'] = frame.copy()
             return result_dict
         
-        # Run YOLOv8-pose detection with GPU optimization and advanced settings
-        imgsz = self.config.get('imgsz', 640)
-        max_det = self.config.get('max_det', 10)
-        
         # 1. MOTION DETECTION (luôn chạy trước - không phụ thuộc YOLO)
         motion_magnitude = 0.0
         if self.use_motion_fallback:
-            motion_magnitude = self._detect_motion_magnitude(frame)
-            # Store for pattern analysis (deque auto-manages size with maxlen)
-            self.frame_diff_history.append(motion_magnitude)
+            motion_magnitude = self._detect_motion_magnitude(frame) if motion is None else motion
+        
+        # 2. YOLO POSE DETECTION (crops around tracked persons in ROI mode)
+        boxes, keypoints = self.detect(frame, current_time)
+        
+        # 3. FALL LOGIC - every person in one pass
+        result_dict = self.update(boxes, keypoints, current_time, frame.shape[:2], motion_magnitude, frame)
+        
+        if annotate:
+            result_dict['annotated_frame'] = self.draw(frame.copy(), result_dict)
+        
+        return result_dict
+    
+    def detect_poses(self, frame: np.ndarray):
+        """
+        Run YOLOv8-pose on a frame (the expensive stage)
         
-        # 2. YOLO POSE DETECTION
-        results = self.model(
-            frame, 
+        Returns:
+            (YOLO result or None, boxes (N, 4) xyxy, keypoints (N, 17, 3) as x, y, confidence)
+        """
+        results = self._infer(frame, self.config.get('imgsz', 640))
+        result = results[0] if len(results) > 0 else None
+        return (result,) + self._get_detections(result)
+    
+    def detect(self, frame: np.ndarray, timestamp: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pose detections of a frame about to be passed to update()
+        
+        Same as detect_poses() unless ROI mode is enabled: then only padded
+        crops around the persons tracked so far are inferred, with a
+        full-frame scan whenever ROISelector.plan() asks for one.
+        
+        Returns:
+            boxes (N, 4) xyxy, keypoints (N, 17, 3) as x, y, confidence (frame coordinates)
+        """
+        crops = None
+        if self.roi is not None:
+            tracker = self.tracker
+            active = tracker.active_slots
+            crops = self.roi.plan(tracker.boxes[active], frame.shape[:2], timestamp,
+                                  complete=not np.any(tracker.missing[active]))
+        if crops is None:
+            return self.detect_poses(frame)[1:]
+        
+        imgsz = self.roi.imgsz or self.config.get('imgsz', 640)
+        results = self._infer([frame[y1:y2, x1:x2] for x1, y1, x2, y2 in crops], imgsz)
+        all_boxes, all_keypoints = [], []
+        for crop, result in zip(crops, results):
+            boxes, keypoints = self._get_detections(result)
+            keep = [self.roi.keep(box, crop, frame.shape[:2]) for box in boxes]
+            boxes, keypoints = boxes[keep], keypoints[keep]
+            offset = np.array(crop[:2], dtype=np.float32)
+            boxes += np.tile(offset, 2)
+            keypoints[:, :, :2] += offset
+            all_boxes.append(boxes)
+            all_keypoints.append(keypoints)
+        return np.concatenate(all_boxes), np.concatenate(all_keypoints)
+    
+    def _infer(self, source, imgsz: int) -> list:
+        """YOLOv8-pose on one image or a batch (list) of images"""
+        # Run YOLOv8-pose detection with GPU optimization and advanced settings
+        return self.model(
+            source,
             conf=self.confidence_threshold,
             iou=self.iou_threshold,
             device=self.device,
             half=self.half_precision,  # FP16 for faster GPU inference
             imgsz=imgsz,  # Input resolution
-            max_det=max_det,  # Max detections
+            max_det=self.config.get('max_det', 10),  # Max detections
             verbose=False
         )
+    
+    def inference_settings(self) -> Dict:
+        """Settings that change detect_poses() output (pose cache key)"""
+        return {
+            'model': Path(self.model_path).stem,
+            'imgsz': self.config.get('imgsz', 640),
+            'conf': self.confidence_threshold,
+            'iou': self.iou_threshold,
+            'max_det': self.config.get('max_det', 10),
+        }
+    
+    def update(self, boxes: np.ndarray, keypoints: np.ndarray, timestamp: float,
+               frame_size: Tuple[int, int], motion_magnitude: float = 0.0,
+               frame: Optional[np.ndarray] = None) -> dict:
+        """
+        Fall / lying logic for one frame of pose detections (no model needed)
         
-        if len(results) == 0 or len(results[0]) == 0:
-            self.missing_frames += 1
-            return self._handle_missing_detection(current_time, annotated_frame)
+        Used by process_frame, and directly to replay cached poses.
         
-        result = results[0]
+        Args:
+            boxes: (N, 4) person boxes, xyxy
+            keypoints: (N, 17, 3) keypoints as x, y, confidence
+            timestamp: frame time in seconds
+            frame_size: (height, width) of the frame
+            motion_magnitude: frame-difference motion (0 = not measured)
+            frame: BGR frame for alert snapshots (events carry no image when None)
         
-        # Get keypoints
-        keypoints = self._get_keypoints(result)
-        confidence = self._get_keypoint_confidence(result)
+        Returns:
+            process_frame result without 'annotated_frame', plus 'tracks', 'keypoints' and 'lost_tracks'
+        """
+        current_time = timestamp
+        frame_height = frame_size[0]
         
-        if keypoints is None or confidence is None:
-            self.missing_frames += 1
-            return self._handle_missing_detection(current_time, annotated_frame)
+        if self.use_motion_fallback:
+            # Store for pattern analysis (ring buffer keeps the last 10)
+            self.frame_diff_history.append(motion_magnitude)
         
-        # Reset missing frames counter when detection is successful
-        self.missing_frames = 0
+        # FEATURES + TRACKING - every person in one pass
+        features = compute_pose_features(keypoints)
+        slots, missing_slots = self.tracker.update(boxes, current_time)
+        tracks = [
+            self._update_track(int(slots[i]), boxes[i], features[i], frame, current_time, frame_height)
+            for i in np.flatnonzero(slots >= 0)
+        ]
+        tracks.sort(key=lambda t: _STATE_INDEX[t['state']], reverse=True)  # Most critical first
+        
+        self.missing_frames = 0 if tracks else self.missing_frames + 1
         
-        # Calculate body metrics
-        center = self._get_body_center(keypoints, confidence)
-        angle = self._get_body_angle(keypoints, confidence)
+        fall_events = [t['fall_event'] for t in tracks if t['fall_event'] is not None]
+        lying_events = [t['lying_event'] for t in tracks if t['lying_event'] is not None]
+        
+        # Tracks not seen in this frame: person may have dropped out of view while falling
+        for slot in missing_slots:
+            event = self._check_missing_track(int(slot), frame, current_time)
+            if event is not None:
+                fall_events.append(event)
+        
+        # CRITICAL: CHECK MOTION-BASED FALL (ngay cả khi có bounding box)
+        if not fall_events and self.use_motion_fallback and motion_magnitude > 0:
+            event = self._check_motion_fall(motion_magnitude, tracks, frame, frame_size, current_time)
+            if event is not None:
+                fall_events.append(event)
+        
+        self.tracker.evict_stale()
+        lost_slots = self._lost_slots()
+        
+        # Primary track: most critical person in view, else the most critical lost track
+        if tracks:
+            primary = tracks[0]
+        elif len(lost_slots):
+            primary = self._lost_track_info(int(lost_slots[np.argmax(self.tracker.state[lost_slots])]))
+        else:
+            primary = None
+        self.current_state = primary['state'] if primary else PoseState.UNKNOWN
+        
+        # Build result dictionary with pose info for debugging
+        pose_info = []
+        for track in tracks:
+            center, angle = track['center'], track['angle']
+            if center is None or angle is None:
+                continue
+            center_y_normalized = center[1] / frame_height if frame_height > 0 else 0
+            pose_info.append({
+                'track_id': track['track_id'],
+                'state': track['state'].value,
+                'box': track['box'],
+                'center': center,
+                'center_y_normalized': center_y_normalized,
+                'angle': angle,
+                'vertical_speed': track['speed'],
+                'acceleration': track['acceleration'],
+                'stability': track['stability'],
+                'fall_confidence': self._calculate_fall_confidence(
+                    angle, track['speed'], track['acceleration'], track['stability'], center_y_normalized
+                ),
+            })
+        
+        fall_detected = bool(fall_events)
+        lying_detected = bool(lying_events)
+        return {
+            'fall_detected': fall_detected,
+            'fall_event': fall_events[0] if fall_detected else None,
+            'fall_events': fall_events,
+            'lying_detected': lying_detected,
+            'lying_event': lying_events[0] if lying_detected else None,
+            'lying_events': lying_events,
+            'state': self.current_state,
+            'confidence': 0.95 if fall_detected else (0.85 if lying_detected else 0.0),
+            'angle': primary['angle'] if primary else None,
+            'speed': primary['speed'] if primary else 0.0,
+            'acceleration': primary['acceleration'] if primary else 0.0,
+            'stability': primary['stability'] if primary else None,
+            'motion_magnitude': motion_magnitude,  # NEW: motion-based metric
+            'poses': pose_info,
+            'tracks': tracks,
+            'keypoints': keypoints,  # (N, 17, 3) for draw()
+            'lost_tracks': [self._lost_marker(int(slot)) for slot in lost_slots],  # For draw()
+            'track_count': len(self.tracker.active_slots),
+            'missing_frames': self.missing_frames,
+        }
+    
+    def _lost_slots(self) -> np.ndarray:
+        """Active tracks not seen in the last frame (not evicted yet)"""
+        tracker = self.tracker
+        return np.flatnonzero(tracker.active & (tracker.missing > 0))
+    
+    def _update_track(self, slot: int, box: np.ndarray, features: np.void,
+                      frame: Optional[np.ndarray], current_time: float, frame_height: int) -> dict:
+        """Update one tracked person with this frame's pose features and run the fall / lying logic"""
+        tracker = self.tracker
+        history = tracker.history[slot]
+        track_id = int(tracker.ids[slot])
+        
+        # Body metrics (computed for all persons at once)
+        center = None
+        if not np.isnan(features['center_x']):
+            center = (float(features['center_x']), float(features['center_y']))
+        angle = self._feature(features, 'angle')
         
         # Store last valid data
         if center is not None:
-            self.last_valid_center = center
+            tracker.last_center[slot] = center
         if angle is not None:
-            self.last_valid_angle = angle
+            tracker.last_angle[slot] = angle
         
-        # Update history
-        self.center_history.append(center)
-        self.angle_history.append(angle)
-        self.timestamp_history.append(current_time)
+        # Update history (speed / acceleration / stability filled in below)
+        history.append((current_time, features['center_x'], features['center_y'], features['angle'],
+                        np.nan, np.nan, np.nan))
         
         # Calculate vertical speed (normalized by frame height)
-        frame_height = frame.shape[0]
-        vertical_speed = self._calculate_vertical_speed(frame_height)
-        self.velocity_history.append(vertical_speed)  # Store for acceleration calc
-        self.last_valid_speed = vertical_speed
+        vertical_speed = self._calculate_vertical_speed(history, frame_height)
+        acceleration = self._calculate_acceleration(history, vertical_speed, current_time)
+        stability = self._stability_score(float(features['support']), history)
         
-        # NEW: Calculate acceleration (change in speed)
-        acceleration = self._calculate_acceleration(vertical_speed, current_time)
-        self.acceleration_history.append(acceleration)
-        self.last_valid_acceleration = acceleration
+        history.set_last(TrackHistory.SPEED, vertical_speed)
+        history.set_last(TrackHistory.ACCEL, acceleration)
+        history.set_last(TrackHistory.STABILITY, stability)
+        tracker.last_speed[slot] = vertical_speed
+        tracker.last_accel[slot] = acceleration
         
-        # NEW: Calculate stability score
-        stability = self._calculate_stability_score(keypoints, confidence)
-        self.stability_scores.append(stability)
-        
-        # Determine pose state with new advanced metrics
+        # Determine pose state with advanced metrics
         center_y = center[1] if center is not None else None
         new_state = self._determine_pose_state(
             angle, vertical_speed, acceleration, stability,
-            keypoints=keypoints, conf=confidence,
-            center_y=center_y, frame_height=frame_height
+            center_y=center_y, frame_height=frame_height, features=features
         )
-        previous_state = self.current_state
+        previous_state = STATE_CODES[tracker.state[slot]]
         
         # Track frames in falling state for momentum tracking
         if new_state == PoseState.FALLING:
-            self.frames_in_falling_state += 1
+            tracker.falling_frames[slot] += 1
         else:
-            self.frames_in_falling_state = 0
+            tracker.falling_frames[slot] = 0
         
         # Track if was falling before potential missing detection
         # Quan trọng: Chỉ set True nếu thực sự đang trong quá trình falling (nhiều frame)
-        if new_state == PoseState.FALLING and self.frames_in_falling_state >= 2:
-            self.was_falling_before_missing = True
-        elif self.fall_start_time is not None and new_state != PoseState.STANDING:
-            self.was_falling_before_missing = True
-        else:
-            self.was_falling_before_missing = False
+        fall_started = not np.isnan(tracker.fall_start[slot])
+        tracker.was_falling[slot] = (
+            (new_state == PoseState.FALLING and tracker.falling_frames[slot] >= 2) or
+            (fall_started and new_state != PoseState.STANDING)
+        )
         
         # Debug log state changes
         if new_state != previous_state:
             angle_str = f"{angle:.1f}°" if angle is not None else "N/A"
-            logger.info(f"🔄 State changed: {previous_state.value} → {new_state.value} | Angle: {angle_str} | Speed: {vertical_speed:.2f}")
+            logger.info(f"🔄 Track #{track_id}: {previous_state.value} → {new_state.value} | Angle: {angle_str} | Speed: {vertical_speed:.2f}")
         
         # Fall detection logic
+        fall_event = None
+        in_cooldown = current_time - tracker.last_fall_time[slot] < self.cooldown_seconds
         if new_state == PoseState.FALLING:
-            if self.fall_start_time is None:
-                self.fall_start_time = current_time
+            if not fall_started:
+                tracker.fall_start[slot] = current_time
             
-            fall_duration = current_time - self.fall_start_time
+            fall_duration = current_time - tracker.fall_start[slot]
             
             # TRIGGER NGAY khi có FALLING state (không cần duration)
             # Vì FALLING state mất rất nhanh (1-2 frames)
-            if not self.fall_confirmed:
-                # Check cooldown
-                if current_time - self.last_fall_time >= self.cooldown_seconds:
-                    self.fall_confirmed = True
-                    self.last_fall_time = current_time
-                    fall_detected = True
-                    
-                    # Create fall event
-                    location = (int(center[0]), int(center[1])) if center else (0, 0)
-                    
-                    # Encode frame as JPEG
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_data = buffer.tobytes()
-                    
-                    fall_event = FallEvent(
-                        timestamp=current_time,
-                        confidence=0.9,
-                        location=location,
-                        previous_state=previous_state,
-                        duration=fall_duration,
-                        frame_data=frame_data
-                    )
-                    
-                    logger.warning(f"🚨 Fall detected! State: FALLING, Duration: {fall_duration:.2f}s, Speed: {vertical_speed:.2f}")
+            if not tracker.fall_confirmed[slot] and not in_cooldown:
+                fall_event = self._confirm_fall(slot, frame, center, 0.9, previous_state, fall_duration, current_time)
+                logger.warning(f"🚨 Fall detected! Track #{track_id}, Duration: {fall_duration:.2f}s, Speed: {vertical_speed:.2f}")
         
         elif new_state == PoseState.LYING and previous_state == PoseState.FALLING:
             # Confirm fall if transitioning from falling to lying
-            if not self.fall_confirmed and current_time - self.last_fall_time >= self.cooldown_seconds:
-                self.fall_confirmed = True
-                self.last_fall_time = current_time
-                fall_detected = True
-                
-                location = (int(center[0]), int(center[1])) if center else (0, 0)
-                _, buffer = cv2.imencode('.jpg', frame)
-                frame_data = buffer.tobytes()
-                
-                fall_event = FallEvent(
-                    timestamp=current_time,
-                    confidence=0.95,
-                    location=location,
-                    previous_state=previous_state,
-                    duration=current_time - (self.fall_start_time or current_time),
-                    frame_data=frame_data
-                )
+            if not tracker.fall_confirmed[slot] and not in_cooldown:
+                fall_event = self._confirm_fall(slot, frame, center, 0.95, previous_state,
+                                                self._fall_duration(slot, current_time), current_time)
         else:
             # Reset fall tracking if person is standing/sitting normally
             if new_state in [PoseState.STANDING, PoseState.SITTING]:
-                self.fall_start_time = None
-                self.fall_confirmed = False
+                tracker.fall_start[slot] = np.nan
+                tracker.fall_confirmed[slot] = False
         
         # ============== LYING DETECTION (Alert when lying for too long) ==============
-        lying_detected = False
         lying_event = None
-        
         if new_state == PoseState.LYING:
             # Start tracking lying duration
-            if self.lying_start_time is None:
-                self.lying_start_time = current_time
-                logger.info(f"🛏️ Started tracking LYING state")
+            if np.isnan(tracker.lying_start[slot]):
+                tracker.lying_start[slot] = current_time
+                logger.info(f"🛏️ Track #{track_id}: started tracking LYING state")
             
-            lying_duration = current_time - self.lying_start_time
+            lying_duration = current_time - tracker.lying_start[slot]
             
             # Alert if lying for too long (configurable threshold)
-            if lying_duration >= self.lying_alert_threshold:
-                if current_time - self.last_lying_alert_time >= self.lying_cooldown:
-                    lying_detected = True
-                    self.last_lying_alert_time = current_time
-                    
-                    location = (int(center[0]), int(center[1])) if center else (0, 0)
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_data = buffer.tobytes()
-                    
-                    lying_event = FallEvent(
-                        timestamp=current_time,
-                        confidence=0.85,
-                        location=location,
-                        previous_state=previous_state,
-                        duration=lying_duration,
-                        frame_data=frame_data
-                    )
-                    
-                    logger.warning(f"⚠️ LYING ALERT! Person lying for {lying_duration:.1f}s")
+            if (lying_duration >= self.lying_alert_threshold and
+                    current_time - tracker.last_lying_alert[slot] >= self.lying_cooldown):
+                tracker.last_lying_alert[slot] = current_time
+                lying_event = self._make_event(frame, center, 0.85, previous_state,
+                                               lying_duration, current_time, track_id)
+                logger.warning(f"⚠️ LYING ALERT! Track #{track_id} lying for {lying_duration:.1f}s")
         else:
             # Reset lying tracking when not lying
-            if self.lying_start_time is not None:
-                logger.info(f"🛏️ Stopped tracking LYING state (now {new_state.value})")
-            self.lying_start_time = None
+            if not np.isnan(tracker.lying_start[slot]):
+                logger.info(f"🛏️ Track #{track_id}: stopped tracking LYING state (now {new_state.value})")
+            tracker.lying_start[slot] = np.nan
         
-        # CRITICAL: CHECK MOTION-BASED FALL (ngay cả khi có bounding box)
-        if not fall_detected and self.use_motion_fallback and motion_magnitude > 0:
-            motion_fall_detected = self._analyze_motion_pattern(motion_magnitude, current_time)
-            
-            # Log motion ALWAYS
-            if motion_magnitude > 0.05:
-                logger.info(f"🌊 Motion: {motion_magnitude:.3f} | Threshold: {self.motion_threshold:.3f} | State: {new_state.value}")
-            
-            if motion_magnitude > self.motion_threshold * 0.5:
-                logger.warning(f"⚠️ HIGH MOTION: {motion_magnitude:.3f}")
-            
-            if motion_fall_detected:
-                logger.warning(f"🔴 MOTION PATTERN DETECTED! Cooldown check: {current_time - self.last_fall_time:.1f}s")
-            
-            # Trigger motion-based fall
-            if motion_fall_detected and current_time - self.last_fall_time >= self.cooldown_seconds:
-                # CHẶT CHẼ context check - chỉ trigger khi THẬT SỰ có dấu hiệu té
-                context_valid = (
-                    new_state == PoseState.FALLING or  # Đang falling
-                    self.was_falling_before_missing or  # Vừa falling trước đó
-                    acceleration > 0.3 or  # Acceleration CAO (không phải 0.2)
-                    (stability < 0.4 and vertical_speed > 0.05)  # Mất cân bằng + đang di chuyển xuống
-                )
-                
-                logger.info(f"⚙️ Context: valid={context_valid}, state={new_state.value}, accel={acceleration:.3f}, stab={stability:.2f}, speed={vertical_speed:.3f}")
-                
-                # Chỉ bypass nếu motion RẤT lớn (1.5x, không phải 0.8x)
-                if context_valid or motion_magnitude > self.motion_threshold * 1.5:
-                    confidence = 0.75 + (motion_magnitude * 0.15)
-                    logger.error(f"🚨 MOTION-BASED FALL! Motion={motion_magnitude:.3f}, Confidence={confidence:.2f}")
-                    
-                    self.fall_confirmed = True
-                    self.last_fall_time = current_time
-                    fall_detected = True
-                    
-                    location = center if center else (frame.shape[1]//2, frame.shape[0]//2)
-                    location = (int(location[0]), int(location[1]))
-                    
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_data = buffer.tobytes()
-                    
-                    fall_event = FallEvent(
-                        timestamp=current_time,
-                        confidence=confidence,
-                        location=location,
-                        previous_state=previous_state,
-                        duration=current_time - (self.fall_start_time or current_time),
-                        frame_data=frame_data
-                    )
-        
-        self.current_state = new_state
-        
-        # Draw annotations
-        annotated_frame = self._draw_annotations(annotated_frame, result, new_state, angle, vertical_speed)
+        tracker.state[slot] = _STATE_INDEX[new_state]
         
-        # Build result dictionary with pose info for debugging
-        pose_info = []
-        if center is not None and angle is not None:
-            center_y_normalized = center[1] / frame_height if frame_height > 0 else 0
-            # NEW: Include all advanced metrics
-            pose_info.append({
-                'center': center,
-                'center_y_normalized': center_y_normalized,
-                'angle': angle,
-                'vertical_speed': vertical_speed,
-                'acceleration': acceleration,  # NEW
-                'stability': stability,  # NEW
-                'fall_confidence': self._calculate_fall_confidence(  # NEW
-                    angle, vertical_speed, acceleration, stability, center_y_normalized
-                ),
-            })
-        
-        result_dict = {
-            'fall_detected': fall_detected,
-            'fall_event': fall_event,
-            'lying_detected': lying_detected,
-            'lying_event': lying_event,
-            'annotated_frame': annotated_frame,
+        return {
+            'track_id': track_id,
+            'slot': slot,
+            'box': tuple(int(v) for v in box),
             'state': new_state,
-            'confidence': 0.95 if fall_detected else (0.85 if lying_detected else 0.0),
+            'center': center,
             'angle': angle,
             'speed': vertical_speed,
-            'acceleration': acceleration,  # NEW
-            'stability': stability,  # NEW
-            'motion_magnitude': motion_magnitude,  # NEW: motion-based metric
-            'poses': pose_info,
+            'acceleration': acceleration,
+            'stability': stability,
+            'fall_event': fall_event,
+            'lying_event': lying_event,
+        }
+    
+    def _lost_track_info(self, slot: int) -> dict:
+        """Last known metrics of a track not seen in this frame"""
+        tracker = self.tracker
+        center = tracker.last_center[slot]
+        angle = tracker.last_angle[slot]
+        return {
+            'track_id': int(tracker.ids[slot]),
+            'slot': slot,
+            'box': tuple(int(v) for v in tracker.boxes[slot]),
+            'state': STATE_CODES[tracker.state[slot]],  # Maintain last state
+            'center': None if np.isnan(center[0]) else (float(center[0]), float(center[1])),
+            'angle': None if np.isnan(angle) else float(angle),
+            'speed': float(tracker.last_speed[slot]),
+            'acceleration': float(tracker.last_accel[slot]),
+            'stability': None,
         }
+    
+    def _lost_marker(self, slot: int) -> dict:
+        """What draw() shows for a lost track, captured now (draw() may run later, on another thread)"""
+        tracker = self.tracker
+        center = tracker.last_center[slot]
+        return {
+            'track_id': int(tracker.ids[slot]),
+            'center': None if np.isnan(center[0]) else (int(center[0]), int(center[1])),
+            'missing': int(tracker.missing[slot]),
+            'was_falling': bool(tracker.was_falling[slot]),
+        }
+    
+    def _fall_duration(self, slot: int, current_time: float) -> float:
+        fall_start = self.tracker.fall_start[slot] if slot >= 0 else np.nan
+        return 0.0 if np.isnan(fall_start) else current_time - fall_start
+    
+    def _make_event(self, frame: Optional[np.ndarray], location, confidence: float, previous_state: PoseState,
+                    duration: float, current_time: float, track_id: Optional[int] = None) -> FallEvent:
+        """
+        Build an alert event; the frame is JPEG-encoded on the evidence pool
+        (no image when replaying cached poses). The frame must not be modified
+        by the caller after process_frame / update returns it in an event.
+        """
+        location = (int(location[0]), int(location[1])) if location is not None else (0, 0)
+        return FallEvent(
+            timestamp=current_time,
+            confidence=confidence,
+            location=location,
+            previous_state=previous_state,
+            duration=duration,
+            evidence=self.evidence_encoder.submit(frame) if frame is not None else None,
+            track_id=track_id
+        )
+    
+    def _confirm_fall(self, slot: int, frame: Optional[np.ndarray], location, confidence: float,
+                      previous_state: PoseState, duration: float, current_time: float) -> FallEvent:
+        """Mark a fall as alerted (per-track and global cooldown) and build its event"""
+        track_id = None
+        if slot >= 0:
+            self.tracker.fall_confirmed[slot] = True
+            self.tracker.last_fall_time[slot] = current_time
+            track_id = int(self.tracker.ids[slot])
+        self.last_fall_time = current_time
+        return self._make_event(frame, location, confidence, previous_state, duration, current_time, track_id)
+    
+    def _check_missing_track(self, slot: int, frame: Optional[np.ndarray], current_time: float) -> Optional[FallEvent]:
+        """Pose-based fall for a track that disappeared while falling"""
+        tracker = self.tracker
+        missing = int(tracker.missing[slot])
+        last_speed = float(tracker.last_speed[slot])
+        
+        if (tracker.was_falling[slot] and
+                missing <= 15 and
+                last_speed > self.vertical_speed_threshold * 0.5 and
+                last_speed > 0 and
+                current_time - tracker.last_fall_time[slot] >= self.cooldown_seconds):
+            
+            confidence = 0.85 - (missing / 15) * 0.3
+            logger.warning(f"⚠️ Pose-based fall (disappearance). Track #{tracker.ids[slot]} missing {missing} frames")
+            
+            center = tracker.last_center[slot]
+            location = None if np.isnan(center[0]) else center
+            return self._confirm_fall(slot, frame, location, confidence, STATE_CODES[tracker.state[slot]],
+                                      self._fall_duration(slot, current_time), current_time)
+        return None
+    
+    def _check_motion_fall(self, motion_magnitude: float, tracks: List[dict], frame: Optional[np.ndarray],
+                           frame_size: Tuple[int, int], current_time: float) -> Optional[FallEvent]:
+        """Frame-level motion fallback, attributed to the track whose pose backs it up"""
+        motion_fall_detected = self._analyze_motion_pattern(motion_magnitude, current_time)
         
-        return result_dict
+        # Log motion ALWAYS
+        if motion_magnitude > 0.05:
+            logger.info(f"🌊 Motion: {motion_magnitude:.3f} | Threshold: {self.motion_threshold:.3f} | "
+                        f"Persons: {len(tracks)} | Missing: {self.missing_frames}")
+        
+        if motion_magnitude > self.motion_threshold * 0.5:
+            logger.warning(f"⚠️ HIGH MOTION: {motion_magnitude:.3f}")
+        
+        if motion_fall_detected:
+            logger.warning(f"🔴 MOTION PATTERN DETECTED! Cooldown check: {current_time - self.last_fall_time:.1f}s")
+        
+        if not motion_fall_detected or current_time - self.last_fall_time < self.cooldown_seconds:
+            return None
+        
+        tracker = self.tracker
+        if tracks:
+            # CHẶT CHẼ context check - chỉ trigger khi THẬT SỰ có dấu hiệu té
+            candidates = [
+                t['slot'] for t in tracks
+                if t['state'] == PoseState.FALLING or  # Đang falling
+                tracker.was_falling[t['slot']] or  # Vừa falling trước đó
+                t['acceleration'] > 0.3 or  # Acceleration CAO (không phải 0.2)
+                (t['stability'] < 0.4 and t['speed'] > 0.05)  # Mất cân bằng + đang di chuyển xuống
+            ]
+            context_valid = bool(candidates)
+            bypass = self.motion_threshold * 1.5  # Chỉ bypass nếu motion RẤT lớn
+            confidence = 0.75 + (motion_magnitude * 0.15)
+        else:
+            # Không ai trong khung hình - context check RẤT NỚI LỎNG để catch sudden falls
+            candidates = [
+                int(slot) for slot in tracker.active_slots
+                if tracker.was_falling[slot] or
+                tracker.last_accel[slot] > 0.2 or
+                tracker.history[slot].last(1)[:, TrackHistory.STABILITY].min(initial=1.0) < 0.6
+            ]
+            context_valid = (bool(candidates) or
+                             self.missing_frames >= 2 or
+                             motion_magnitude > self.motion_threshold * 1.0)  # Motion rất lớn = bỏ qua context
+            bypass = self.motion_threshold * 0.8
+            confidence = 0.7 + (motion_magnitude * 0.2)  # 0.7-0.9
+        
+        logger.info(f"⚙️ Context: valid={context_valid}, candidates={[int(tracker.ids[s]) for s in candidates]}, "
+                    f"missing={self.missing_frames}")
+        
+        if not (context_valid or motion_magnitude > bypass):
+            return None
+        
+        slot = candidates[0] if candidates else (tracks[0]['slot'] if tracks else -1)
+        location = (frame_size[1] // 2, frame_size[0] // 2)
+        previous_state = self.current_state
+        if slot >= 0:
+            previous_state = STATE_CODES[tracker.state[slot]]
+            if not np.isnan(tracker.last_center[slot][0]):
+                location = tracker.last_center[slot]
+        
+        logger.error(f"🚨 MOTION-BASED FALL! Motion={motion_magnitude:.3f}, Confidence={confidence:.2f}")
+        return self._confirm_fall(slot, frame, location, confidence, previous_state,
+                                  self._fall_duration(slot, current_time), current_time)
     
-    def _draw_annotations(self, frame: np.ndarray, result, state: PoseState, 
-                          angle: Optional[float], speed: float) -> np.ndarray:
-        """Draw pose skeleton and status on frame"""
-        # Draw YOLO pose results
-        annotated = result.plot()
-        
-        # Add status text
-        status_color = (0, 255, 0)  # Green
+    @staticmethod
+    def _state_color(state: PoseState) -> Tuple[int, int, int]:
         if state == PoseState.FALLING:
-            status_color = (0, 0, 255)  # Red
-        elif state == PoseState.LYING:
-            status_color = (0, 165, 255)  # Orange
+            return (0, 0, 255)  # Red
+        if state == PoseState.LYING:
+            return (0, 165, 255)  # Orange
+        return (0, 255, 0)  # Green
+    
+    def draw(self, frame: np.ndarray, result: dict) -> np.ndarray:
+        """
+        Render a process_frame / update result onto a frame, in place
         
-        # Draw status
-        cv2.putText(annotated, f"State: {state.value}", (10, 30),
+        Only reads the result (never the live tracker), so it is safe to call
+        later or from another thread. Returns the same frame for chaining.
+        """
+        tracks = result.get('tracks') or []
+        if tracks:
+            self._draw_skeletons(frame, result['keypoints'])
+            self._draw_status(frame, result['state'], result['angle'], result['speed'])
+            self._draw_tracks(frame, tracks)
+        self._draw_lost_tracks(frame, result.get('lost_tracks') or [], detected=bool(tracks))
+        return frame
+    
+    def _draw_skeletons(self, frame: np.ndarray, keypoints: np.ndarray, min_conf: float = 0.5):
+        """Pose skeleton of every detected person"""
+        visible = keypoints[..., 2] >= min_conf
+        points = keypoints[..., :2].astype(np.int32)
+        for person, seen in zip(points, visible):
+            for a, b in self.SKELETON:
+                if seen[a] and seen[b]:
+                    cv2.line(frame, tuple(person[a]), tuple(person[b]), (255, 128, 0), 2)
+            for x, y in person[seen]:
+                cv2.circle(frame, (int(x), int(y)), 4, (0, 255, 255), -1)
+    
+    def _draw_status(self, frame: np.ndarray, state: PoseState, angle: Optional[float], speed: float):
+        """State / angle / speed of the primary person"""
+        status_color = self._state_color(state)
+        
+        cv2.putText(frame, f"State: {state.value}", (10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, status_color, 2)
         
         if angle is not None:
-            cv2.putText(annotated, f"Angle: {angle:.1f}°", (10, 60),
+            cv2.putText(frame, f"Angle: {angle:.1f}°", (10, 60),
                         cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
-        cv2.putText(annotated, f"Speed: {speed:.2f}", (10, 90),
+        cv2.putText(frame, f"Speed: {speed:.2f}", (10, 90),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        return annotated
     
-    def _handle_missing_detection(self, current_time: float, frame: np.ndarray) -> dict:
+    def _draw_tracks(self, frame: np.ndarray, tracks: List[dict]):
+        """Track ID + state above each person"""
+        for track in tracks:
+            x1, y1, x2, y2 = track['box']
+            color = self._state_color(track['state'])
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(frame, f"#{track['track_id']} {track['state'].value}", (x1, max(15, y1 - 25)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, self._state_color(track['state']), 2)
+    
+    def _draw_lost_tracks(self, frame: np.ndarray, lost_tracks: List[dict], detected: bool):
         """
         CRITICAL: Xử lý trường hợp mất bounding box
-        
-        NEW: Sử dụng MOTION DETECTION thay vì chỉ dựa vào last state
+        Last known position of tracks not seen in this frame
         """
-        fall_detected = False
-        fall_event = None
-        
-        # NEW: MOTION-BASED DETECTION (không cần bounding box)
-        motion_magnitude = 0.0
-        motion_fall_detected = False
-        
-        if self.use_motion_fallback:
-            motion_magnitude = self._detect_motion_magnitude(frame)
-            motion_fall_detected = self._analyze_motion_pattern(motion_magnitude, current_time)
-            
-            # Log motion for debugging - ALWAYS LOG
-            if motion_magnitude > 0.05:
-                logger.info(f"🌊 Motion: {motion_magnitude:.3f} | Threshold: {self.motion_threshold:.3f} | Missing: {self.missing_frames}")
-            
-            if motion_magnitude > self.motion_threshold * 0.5:
-                logger.warning(f"⚠️ HIGH MOTION: {motion_magnitude:.3f}")
-            
-            # Nếu phát hiện motion lớn + (đang falling hoặc unstable trước đó)
-            if motion_fall_detected:
-                logger.warning(f"🔴 MOTION FALL DETECTED! Checking cooldown... (last: {current_time - self.last_fall_time:.1f}s ago)")
-            
-            if motion_fall_detected and current_time - self.last_fall_time >= self.cooldown_seconds:
-                # Context check - RẤT NỚI LỎNG để catch sudden falls
-                context_valid = (
-                    self.was_falling_before_missing or 
-                    self.last_valid_acceleration > 0.2 or  # Giảm từ 0.3 → 0.2
-                    (hasattr(self, 'stability_scores') and len(self.stability_scores) > 0 and self.stability_scores[-1] < 0.6) or  # Tăng từ 0.5 → 0.6
-                    self.missing_frames >= 2 or  # Giảm từ 3 → 2
-                    motion_magnitude > self.motion_threshold * 1.0  # NEW: Motion rất lớn = bỏ qua context
-                )
-                
-                logger.info(f"⚙️ Context check: valid={context_valid}, was_falling={self.was_falling_before_missing}, accel={self.last_valid_acceleration:.3f}, missing={self.missing_frames}")
-                
-                # Giảm threshold bypass từ 1.2x → 0.8x để RẤT dễ trigger
-                if context_valid or motion_magnitude > self.motion_threshold * 0.8:
-                    confidence = 0.7 + (motion_magnitude * 0.2)  # 0.7-0.9
-                    logger.warning(f"🚨 MOTION-BASED FALL DETECTED! Motion: {motion_magnitude:.3f}, Missing: {self.missing_frames} frames")
-                    
-                    self.fall_confirmed = True
-                    self.last_fall_time = current_time
-                    fall_detected = True
-                    
-                    location = self.last_valid_center if self.last_valid_center else (frame.shape[1]//2, frame.shape[0]//2)
-                    location = (int(location[0]), int(location[1]))
-                    
-                    _, buffer = cv2.imencode('.jpg', frame)
-                    frame_data = buffer.tobytes()
-                    
-                    fall_event = FallEvent(
-                        timestamp=current_time,
-                        confidence=confidence,
-                        location=location,
-                        previous_state=self.current_state,
-                        duration=current_time - (self.fall_start_time or current_time),
-                        frame_data=frame_data
-                    )
-        
-        # Fallback: Pose-based detection (như trước)
-        if not fall_detected and (self.was_falling_before_missing and 
-            self.missing_frames <= 15 and
-            self.last_valid_speed > self.vertical_speed_threshold * 0.5 and
-            self.last_valid_speed > 0 and
-            current_time - self.last_fall_time >= self.cooldown_seconds):
-            
-            confidence = 0.85 - (self.missing_frames / 15) * 0.3
-            logger.warning(f"⚠️ Pose-based fall (disappearance). Missing {self.missing_frames} frames")
-            
-            self.fall_confirmed = True
-            self.last_fall_time = current_time
-            fall_detected = True
-            
-            location = self.last_valid_center if self.last_valid_center else (0, 0)
-            location = (int(location[0]), int(location[1]))
-            
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_data = buffer.tobytes()
-            
-            fall_event = FallEvent(
-                timestamp=current_time,
-                confidence=confidence,
-                location=location,
-                previous_state=self.current_state,
-                duration=current_time - (self.fall_start_time or current_time),
-                frame_data=frame_data
-            )
-        
-        # Tình huống 2: Missing trong thời gian ngắn - maintain state
-        if self.missing_frames <= self.max_missing_frames:
-            # Vẽ warning lên frame
-            warning_color = (0, 140, 255) if self.was_falling_before_missing else (0, 0, 255)
-            warning_text = "TRACKING LOST - FALLING?" if self.was_falling_before_missing else "TRACKING LOST"
-            cv2.putText(frame, f"{warning_text} ({self.missing_frames}/{self.max_missing_frames})", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, warning_color, 2)
-            
-            if self.last_valid_center:
-                cv2.circle(frame, 
-                          (int(self.last_valid_center[0]), int(self.last_valid_center[1])), 
-                          30, (0, 0, 255), 2)
-                cv2.putText(frame, "Last known position", 
-                           (int(self.last_valid_center[0]) - 50, int(self.last_valid_center[1]) - 40),
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-            
-            return {
-                'fall_detected': fall_detected,
-                'fall_event': fall_event,
-                'annotated_frame': frame,
-                'state': self.current_state,  # Maintain last state
-                'confidence': 0.0,
-                'angle': self.last_valid_angle,
-                'speed': self.last_valid_speed,
-                'missing_frames': self.missing_frames,
-            }
-        
-        # Tình huống 3: Missing quá lâu - reset state
-        else:
-            logger.info(f"Lost tracking for {self.missing_frames} frames, resetting state")
-            self.current_state = PoseState.UNKNOWN
-            self.fall_start_time = None
-            self.fall_confirmed = False
-            self.was_falling_before_missing = False
-            
-            cv2.putText(frame, "NO PERSON DETECTED", 
-                       (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            
-            return {
-                'fall_detected': False,
-                'fall_event': None,
-                'annotated_frame': frame,
-                'state': PoseState.UNKNOWN,
-                'confidence': 0.0,
-                'angle': None,
-                'speed': 0.0,
-                'missing_frames': self.missing_frames,
-            }
+        was_falling = any(track['was_falling'] for track in lost_tracks)
+        
+        if not detected:
+            if lost_tracks:
+                # Missing trong thời gian ngắn - maintain state
+                missing = min(track['missing'] for track in lost_tracks)
+                warning_color = (0, 140, 255) if was_falling else (0, 0, 255)
+                warning_text = "TRACKING LOST - FALLING?" if was_falling else "TRACKING LOST"
+                cv2.putText(frame, f"{warning_text} ({missing}/{self.max_missing_frames})", 
+                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, warning_color, 2)
+            else:
+                # Missing quá lâu - không còn track nào
+                cv2.putText(frame, "NO PERSON DETECTED", 
+                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        
+        for track in lost_tracks:
+            if track['center'] is None:
+                continue
+            cx, cy = track['center']
+            cv2.circle(frame, (cx, cy), 30, (0, 0, 255), 2)
+            cv2.putText(frame, f"#{track['track_id']} last known position", 
+                       (cx - 50, cy - 40), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
     
     def reset(self):
         """Reset tracking state"""
-        self.pose_history.clear()
-        self.center_history.clear()
-        self.angle_history.clear()
-        self.timestamp_history.clear()
-        # NEW: Clear advanced tracking histories
-        self.velocity_history.clear()
-        self.acceleration_history.clear()
-        self.stability_scores.clear()
-        
+        self.tracker.reset()
         self.current_state = PoseState.UNKNOWN
+        self.last_fall_time = float('-inf')
         self.missing_frames = 0
-        self.last_valid_center = None
-        self.last_valid_angle = None
-        self.last_valid_speed = 0.0
-        self.last_valid_acceleration = 0.0  # NEW
-        self.was_falling_before_missing = False
-        self.frames_in_falling_state = 0
-        self.fall_start_time = None
-        self.fall_confirmed = False
+        self.frame_diff_history.clear()
+        self.motion_engine.reset()
+        if self.roi is not None:
+            self.roi.reset()
 
 
 # Simple test
@@ -0,0 +1,218 @@
+# alert_dispatcher.py
+# Background delivery of fall / lying alerts to the Backend API (/api/fall-alert)
+# The frame loop only enqueues; a worker thread persists each alert to a small
+# SQLite outbox and sends it with a pooled requests.Session, retrying with
+# exponential backoff, so alerts survive backend outages and restarts
+
+import json
+import time
+import base64
+import queue
+import random
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Optional, Union
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class AlertOutbox:
+    """SQLite table of alerts not yet accepted by the backend"""
+
+    def __init__(self, path: str, max_rows: int = 1000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                payload TEXT NOT NULL,
+                frame BLOB,
+                attempts INTEGER NOT NULL DEFAULT 0
+            )""")
+        self._db.commit()
+
+    def add(self, payload: Dict, frame: Optional[bytes]) -> int:
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO outbox (created, payload, frame) VALUES (?, ?, ?)",
+                (time.time(), json.dumps(payload), frame))
+            # Bounded: drop the oldest alerts beyond max_rows
+            self._db.execute(
+                "DELETE FROM outbox WHERE id <= (SELECT MAX(id) FROM outbox) - ?", (self.max_rows,))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def oldest(self, limit: int = 20):
+        """[(id, payload, frame, attempts)] oldest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, payload, frame, attempts FROM outbox ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [(row[0], json.loads(row[1]), row[2], row[3]) for row in rows]
+
+    def delete(self, alert_id: int):
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (alert_id,))
+            self._db.commit()
+
+    def set_attempts(self, alert_id: int, attempts: int):
+        with self._lock:
+            self._db.execute("UPDATE outbox SET attempts = ? WHERE id = ?", (attempts, alert_id))
+            self._db.commit()
+
+    def expire(self, max_age: float) -> int:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM outbox WHERE created < ?", (time.time() - max_age,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class AlertDispatcher:
+    """
+    Non-blocking alert sender for camera_server.
+
+    - enqueue(): called from the frame loop, never blocks (bounded queue)
+    - worker thread: queue -> outbox -> POST /api/fall-alert
+    - after a failed send, delivery pauses with exponential backoff (+ jitter)
+      up to max_backoff, then resumes with the oldest alert
+    - alerts older than max_age are dropped, client errors (4xx) are not retried
+    """
+
+    def __init__(self, backend_url: str, config: Dict = None):
+        config = config or {}
+        self.url = f"{backend_url}/api/fall-alert"
+        self.timeout = config.get('timeout', 5)
+        self.base_backoff = config.get('base_backoff', 1.0)
+        self.max_backoff = config.get('max_backoff', 60.0)
+        self.max_age = config.get('max_age_hours', 24) * 3600
+        self.outbox = AlertOutbox(
+            config.get('outbox_path', str(Path(__file__).parent.parent.parent / 'data' / 'alerts_outbox.db')),
+            config.get('outbox_max_rows', 1000))
+
+        self.queue: "queue.Queue" = queue.Queue(maxsize=config.get('queue_size', 100))
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'dropped': 0}
+        self._failures = 0  # Consecutive delivery failures
+        self._resume_at = 0.0  # Backoff: no delivery before this time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='alert-dispatcher')
+        self._thread.start()
+        pending = len(self.outbox)
+        logger.info(f"📮 Alert dispatcher started ({pending} alerts pending in outbox)")
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.outbox.close()
+
+    def enqueue(self, payload: Dict, frame_data: Union[bytes, Future, None] = None) -> bool:
+        """
+        Queue an alert (JSON payload + optional JPEG for frameData); never blocks.
+        frame_data may be a Future of the JPEG bytes (e.g. FallEvent.evidence),
+        resolved on the worker thread.
+        """
+        try:
+            self.queue.put_nowait((payload, frame_data))
+            self.stats['queued'] += 1
+            return True
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.error("❌ Alert queue full, alert dropped")
+            return False
+
+    # ============== Worker ==============
+
+    def _run(self):
+        next_expire = 0.0
+        while not self._stop.is_set():
+            # Persist everything that was queued, then try to deliver
+            try:
+                item = self.queue.get(timeout=1.0)
+                self._persist(*item)
+                while True:
+                    self._persist(*self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error(f"❌ Failed to persist alert: {e}")
+
+            if time.time() >= next_expire:
+                expired = self.outbox.expire(self.max_age)
+                if expired:
+                    logger.warning(f"⚠️ Dropped {expired} alerts older than {self.max_age / 3600:.0f}h")
+                next_expire = time.time() + 600
+
+            self._flush()
+
+    def _persist(self, payload: Dict, frame_data: Union[bytes, Future, None]):
+        if isinstance(frame_data, Future):
+            try:
+                frame_data = frame_data.result(timeout=self.timeout)
+            except Exception as e:
+                logger.warning(f"⚠️ Alert frame not available ({type(e).__name__}), sending without image")
+                frame_data = None
+        self.outbox.add(payload, frame_data)
+
+    def _flush(self):
+        if time.time() < self._resume_at:
+            return
+        for alert_id, payload, frame, attempts in self.outbox.oldest():
+            if self._stop.is_set():
+                return
+            if frame:
+                payload['frameData'] = base64.b64encode(frame).decode('utf-8')
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except requests.exceptions.RequestException as e:
+                self._back_off(alert_id, attempts, type(e).__name__)
+                return
+
+            if response.status_code in (200, 201):
+                self.outbox.delete(alert_id)
+                self.stats['sent'] += 1
+                self._failures = 0
+                logger.info(f"✅ {payload.get('alertType', 'fall').capitalize()} alert sent to backend")
+            elif 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                # Client error: retrying the same payload will not help
+                self.outbox.delete(alert_id)
+                self.stats['failed'] += 1
+                logger.error(f"❌ Backend rejected alert ({response.status_code}): {response.text[:200]}")
+            else:
+                self._back_off(alert_id, attempts, f"HTTP {response.status_code}")
+                return
+
+    def _back_off(self, alert_id: int, attempts: int, reason: str):
+        """Pause delivery (backend down or overloaded) - alerts stay in the outbox"""
+        self.outbox.set_attempts(alert_id, attempts + 1)
+        self._failures += 1
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+        delay *= random.uniform(0.8, 1.2)
+        self._resume_at = time.time() + delay
+        logger.warning(f"⚠️ Alert delivery failed ({reason}), retrying in {delay:.1f}s "
+                       f"({len(self.outbox)} pending)")
@@ -0,0 +1,221 @@
+# ann_index.py
+# Approximate nearest-neighbour index for large face galleries (pure NumPy)
+# IVF (inverted file) index: rows are bucketed by their nearest k-means centroid,
+# a query only scores the rows in its `nprobe` closest buckets and the
+# candidates are re-ranked exactly against the float32 gallery matrix
+
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of a FaceGallery.
+
+    The index never stores vectors itself - only the centroids and the
+    row -> list assignment. The gallery keeps the assignment array parallel
+    to its matrix (append on add, same keep-mask on remove). Appended rows
+    go straight into their nearest inverted list (amortized O(1), both
+    buffers grow by doubling); the lists are only rebuilt with one argsort
+    after a removal, a reassignment or (re)training.
+
+    Training is split into fit() (k-means, no shared state touched) and
+    install(), so the gallery can run k-means outside its lock.
+    """
+
+    def __init__(self, dim: int = 512, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_train_size: int = 2048, train_iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.nlist = nlist  # None = auto (~sqrt(N)) at training time
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None  # (nlist, D) float32, normalized
+        self.trained_size = 0
+        self._assignments = np.zeros(0, dtype=np.int32)  # row -> list id (buffer, first `size` valid)
+        self.size = 0
+        self._lists: Optional[List[np.ndarray]] = None  # Row ids per list (buffers, None = rebuild)
+        self._list_sizes: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def assignments(self) -> np.ndarray:
+        return self._assignments[:self.size]
+
+    def _set_assignments(self, assignments: np.ndarray):
+        self._assignments = np.asarray(assignments, dtype=np.int32)
+        self.size = len(self._assignments)
+        self._invalidate()
+
+    def needs_training(self, size: int) -> bool:
+        """Train once the gallery is big enough, retrain after it has grown 4x"""
+        if size < self.min_train_size:
+            return False
+        return not self.is_trained or size > 4 * self.trained_size
+
+    def train(self, matrix: np.ndarray):
+        """Fit and install in one step (blocks for the whole k-means)"""
+        centroids = self.fit(matrix)
+        self.install(centroids, self.assign(matrix, centroids), len(matrix))
+
+    def fit(self, matrix: np.ndarray) -> np.ndarray:
+        """Spherical k-means on (a sample of) the normalized gallery rows; returns the centroids"""
+        n = len(matrix)
+        nlist = self.nlist or int(np.clip(np.sqrt(n), 16, 4096))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, nlist * 64)
+        sample = matrix[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty lists with random sample rows
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            centroids = sums / (np.linalg.norm(sums, axis=1, keepdims=True) + 1e-6)
+        return centroids.astype(np.float32)
+
+    def install(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int):
+        """Switch to fitted centroids and the matching row assignments"""
+        self.centroids = centroids
+        self.trained_size = trained_size
+        self._set_assignments(assignments)
+        logger.info(f"🗂️ IVF index trained: {len(centroids)} lists over {trained_size} embeddings")
+
+    def assign(self, rows: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Nearest list of each row (current centroids unless given)"""
+        centroids = self.centroids if centroids is None else centroids
+        if len(rows) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return np.argmax(rows @ centroids.T, axis=1).astype(np.int32)
+
+    def _invalidate(self):
+        self._lists = None
+        self._list_sizes = None
+
+    def reset(self):
+        """Drop row assignments (centroids are kept)"""
+        self._set_assignments(np.zeros(0, dtype=np.int32))
+
+    def add(self, rows: np.ndarray):
+        """Assign newly appended gallery rows (already normalized) and append them to their lists"""
+        if not self.is_trained or len(rows) == 0:
+            return
+        labels = self.assign(rows)
+        start, end = self.size, self.size + len(labels)
+        if end > len(self._assignments):
+            grown = np.zeros(max(end, 2 * len(self._assignments), 64), dtype=np.int32)
+            grown[:start] = self._assignments[:start]
+            self._assignments = grown
+        self._assignments[start:end] = labels
+        self.size = end
+        if self._lists is not None:
+            for row, label in enumerate(labels, start):
+                self._append_to_list(int(label), row)
+
+    def _append_to_list(self, label: int, row: int):
+        rows, n = self._lists[label], self._list_sizes[label]
+        if n == len(rows):
+            grown = np.zeros(max(8, 2 * n), dtype=np.int32)
+            grown[:n] = rows
+            self._lists[label] = rows = grown
+        rows[n] = row
+        self._list_sizes[label] = n + 1
+
+    def compact(self, keep: np.ndarray):
+        """Apply the gallery's keep-mask after a removal"""
+        if not self.is_trained:
+            return
+        self._set_assignments(self.assignments[keep])
+
+    def reassign(self, matrix: np.ndarray):
+        """Recompute all assignments with the current centroids (no retraining)"""
+        if self.is_trained:
+            self._set_assignments(self.assign(matrix))
+
+    def _build_lists(self):
+        assignments = self.assignments
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self._lists = np.split(order, np.cumsum(counts)[:-1])
+        self._list_sizes = counts.astype(np.int64)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Row ids in the `nprobe` lists closest to a normalized query (D,)"""
+        if self._lists is None:
+            self._build_lists()
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_sims = self.centroids @ query
+        probe = np.argpartition(-centroid_sims, nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[l][:self._list_sizes[l]] for l in probe])
+
+    # ============== Persistence ==============
+
+    @staticmethod
+    def fingerprint(person_ids, person_index: np.ndarray, matrix: np.ndarray) -> int:
+        """Checksum of the gallery layout, used to validate saved assignments
+
+        Covers the IDs, the row -> person mapping and the leading components
+        of every row (cheap, but changes whenever a vector is replaced)
+        """
+        crc = zlib.crc32('\n'.join(person_ids).encode('utf-8'))
+        crc = zlib.crc32(np.ascontiguousarray(person_index, dtype=np.int32).tobytes(), crc)
+        return zlib.crc32(np.ascontiguousarray(matrix[:, :8]).tobytes(), crc)
+
+    def state(self) -> dict:
+        """Copy of the persisted state (centroids, assignments, trained size), for saving off-lock"""
+        return {'centroids': self.centroids, 'assignments': self.assignments.copy(),
+                'trained_size': self.trained_size}
+
+    def save(self, path: str, fingerprint: int, state: Optional[dict] = None):
+        """Write centroids + assignments (pass a state() snapshot when saving off-lock)"""
+        if not self.is_trained:
+            return
+        state = self.state() if state is None else state
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, fingerprint=fingerprint, **state)
+            os.replace(tmp_path, path)
+            logger.debug(f"IVF index saved: {path}")
+        except Exception as e:
+            logger.warning(f"Failed to save IVF index: {e}")
+
+    def load(self, path: str, matrix: np.ndarray, fingerprint: int) -> bool:
+        """Load centroids; reuse saved assignments if the gallery layout is unchanged"""
+        if not Path(path).exists():
+            return False
+        try:
+            with np.load(path) as data:
+                centroids = data['centroids']
+                if centroids.shape[1] != self.dim:
+                    logger.warning(f"IVF index dim mismatch ({centroids.shape[1]} != {self.dim}), ignoring")
+                    return False
+                self.centroids = centroids.astype(np.float32)
+                self.trained_size = int(data['trained_size'])
+                if int(data['fingerprint']) == fingerprint and len(data['assignments']) == len(matrix):
+                    self._set_assignments(data['assignments'])
+                else:
+                    self._set_assignments(self.assign(matrix))
+            logger.info(f"📂 Loaded IVF index: {len(self.centroids)} lists ({path})")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to load IVF index: {e}")
+            return False
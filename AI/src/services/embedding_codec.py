@@ -0,0 +1,37 @@
+# embedding_codec.py
+# Compact wire format for embeddings exchanged with the Backend API
+# Instead of a JSON array of 512 floats (~10 KB of text), an embedding travels
+# as base64 of its little-endian float32 / float16 bytes (~2.7 KB / ~1.4 KB)
+# and is decoded with np.frombuffer (no per-element Python work)
+
+import base64
+from typing import Iterable, Optional
+import numpy as np
+
+# Wire encoding name -> little-endian dtype ("json" = legacy float list)
+WIRE_DTYPES = {
+    'float32': np.dtype('<f4'),
+    'float16': np.dtype('<f2'),
+}
+
+
+def encode_embedding(embedding: np.ndarray, encoding: str = 'float32') -> str:
+    """Embedding (D,) -> base64 string of its little-endian bytes"""
+    data = np.ascontiguousarray(embedding, dtype=WIRE_DTYPES[encoding]).tobytes()
+    return base64.b64encode(data).decode('ascii')
+
+
+def decode_embedding(blob: str, encoding: str = 'float32') -> np.ndarray:
+    """base64 string -> float32 embedding (D,)"""
+    return np.frombuffer(base64.b64decode(blob), dtype=WIRE_DTYPES[encoding]).astype(np.float32)
+
+
+def decode_embeddings(blobs: Iterable[str], encoding: str = 'float32',
+                      dim: Optional[int] = None) -> np.ndarray:
+    """Several base64 blobs of the same length -> float32 matrix (N, D) in one frombuffer call"""
+    raw = [base64.b64decode(b) for b in blobs]
+    itemsize = WIRE_DTYPES[encoding].itemsize
+    if not raw or len({len(r) for r in raw}) != 1 or (dim and len(raw[0]) != dim * itemsize):
+        raise ValueError(f"Embedding blobs do not match dimension {dim}")
+    rows = np.frombuffer(b''.join(raw), dtype=WIRE_DTYPES[encoding])
+    return rows.reshape(len(raw), -1).astype(np.float32)
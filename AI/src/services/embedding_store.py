@@ -0,0 +1,365 @@
+# embedding_store.py
+# Binary on-disk store for face embeddings / features (replaces the faces_db.pkl pickle)
+# Startup memory-maps the embedding matrix instead of unpickling it,
+# registration appends in O(1) instead of re-pickling the whole database
+#
+# Files (base = database_path without extension, e.g. data/faces_db):
+#   <base>.ids.npz    ID/name table snapshot: person IDs, names, row -> person index,
+#                     and the generation of the data files below
+#   <base>[.<gen>].vec  raw little-endian rows (float32 or float16), append-only
+#   <base>[.<gen>].log  append log (JSON lines) of adds/removals since the snapshot
+# Generation 0 (no snapshot written yet) has no suffix. A snapshot writes the
+# next generation's files and then replaces <base>.ids.npz, so that swap is
+# the only commit point and a mapped .vec is never overwritten.
+
+import os
+import re
+import json
+import array
+import zipfile
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingStore:
+    """
+    Append-only embedding store shared by FaceEmbedding, FastFaceRecognition
+    and GPUFaceRecognition.
+
+    - append(): writes the new rows to <base>.vec and one line to <base>.log
+    - remove(): writes one line to <base>.log (rows become tombstones)
+    - rewrite(): full snapshot (compaction), used after a full backend sync
+    - matrix: read-only np.memmap over <base>.vec (no copy at startup)
+    """
+
+    SUPPORTED_DTYPES = ('float32', 'float16')
+
+    def __init__(self, base_path: str, dim: Optional[int] = None, dtype: str = 'float32'):
+        if dtype not in self.SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.base_path = str(base_path)
+        self.ids_path = Path(self.base_path + '.ids.npz')
+        self._set_generation(0)
+
+        self.dim = dim
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+
+        self.person_ids: List[Optional[str]] = []  # person index -> ID (None = removed)
+        self.names: List[str] = []
+        self._id_to_index: Dict[str, int] = {}
+        self._row_person = array.array('i')  # row -> person index (-1 = removed row)
+        self._dead_rows = 0
+        self._matrix: Optional[np.ndarray] = None
+
+        self._open()
+
+    # ============== Loading ==============
+
+    @property
+    def exists(self) -> bool:
+        return self.ids_path.exists() or self.log_path.exists()
+
+    @property
+    def rows(self) -> int:
+        return len(self._row_person)
+
+    @property
+    def row_bytes(self) -> int:
+        return (self.dim or 0) * self.dtype.itemsize
+
+    def __len__(self) -> int:
+        """Number of live persons"""
+        return len(self._id_to_index)
+
+    def _data_paths(self, generation: int) -> Tuple[Path, Path]:
+        suffix = f'.{generation}' if generation else ''
+        return Path(f'{self.base_path}{suffix}.vec'), Path(f'{self.base_path}{suffix}.log')
+
+    def _set_generation(self, generation: int):
+        self.generation = generation
+        self.vec_path, self.log_path = self._data_paths(generation)
+
+    def _remove_stale_files(self):
+        """Delete data files of other generations (left behind by a crash, or still mapped on Windows)"""
+        base = Path(self.base_path)
+        data_file = re.compile(re.escape(base.name) + r'(\.\d+)?\.(vec|log)')
+        for path in base.parent.glob(base.name + '.*'):
+            if not data_file.fullmatch(path.name) or path in (self.vec_path, self.log_path):
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.debug(f"Could not remove stale store file {path}: {e}")
+
+    def _open(self):
+        expected_dim = self.dim
+        try:
+            if self.ids_path.exists():
+                with np.load(self.ids_path) as data:
+                    self._set_generation(int(data['generation']) if 'generation' in data else 0)
+                    self.dim = int(data['dim']) or self.dim
+                    self.dtype = np.dtype(str(data['dtype'])).newbyteorder('<')
+                    self.person_ids = [str(p) for p in data['person_ids']]
+                    self.names = [str(n) for n in data['names']]
+                    self._row_person = array.array('i', data['row_person'].astype(np.int32).tobytes())
+                self._id_to_index = {pid: i for i, pid in enumerate(self.person_ids)}
+            self._replay_log()
+        except (ValueError, KeyError, TypeError, EOFError, zipfile.BadZipFile) as e:
+            # Corrupt snapshot / log: the backend is the primary copy, start over
+            logger.warning(f"Embedding store corrupt ({type(e).__name__}: {e}), starting empty")
+            self._reset_state()
+            return
+        except OSError as e:
+            # Transient I/O or permission problem: keep the files, let the caller fail
+            logger.error(f"Embedding store {self.base_path} could not be read: {e}")
+            raise
+        if expected_dim is not None and self.dim != expected_dim:
+            # Another recognizer's store (different feature size) - never adopt or overwrite it
+            raise ValueError(f"Embedding store {self.base_path} holds {self.dim}-dim rows, "
+                             f"expected {expected_dim}")
+        self._remove_stale_files()
+
+        # Rows are written before their log line, so extra bytes = interrupted append
+        expected = self.rows * self.row_bytes
+        actual = self.vec_path.stat().st_size if self.vec_path.exists() else 0
+        if actual < expected:
+            logger.warning("Embedding store truncated, starting empty")
+            self._reset_state()
+            return
+        if actual > expected:
+            with open(self.vec_path, 'r+b') as f:
+                f.truncate(expected)
+
+        if self._dead_rows:
+            self.compact()
+
+    def _replay_log(self):
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # Partial line from an interrupted write
+                if entry.get('op') == 'init':
+                    self.dim = int(entry['dim'])
+                    self.dtype = np.dtype(entry['dtype']).newbyteorder('<')
+                elif entry.get('op') == 'add':
+                    index = self._person_index(entry['id'], entry.get('name'))
+                    self._row_person.extend([index] * int(entry['n']))
+                elif entry.get('op') == 'del':
+                    self._tombstone(entry['id'])
+
+    def _reset_state(self):
+        self.person_ids = []
+        self.names = []
+        self._id_to_index = {}
+        self._row_person = array.array('i')
+        self._dead_rows = 0
+        self._matrix = None
+        for path in (self.vec_path, self.ids_path, self.log_path):
+            if path.exists():
+                path.unlink()
+        self._set_generation(0)
+
+    def _person_index(self, person_id: str, name: Optional[str]) -> int:
+        index = self._id_to_index.get(person_id)
+        if index is None:
+            index = len(self.person_ids)
+            self._id_to_index[person_id] = index
+            self.person_ids.append(person_id)
+            self.names.append(name or person_id)
+        elif name:
+            self.names[index] = name
+        return index
+
+    def _tombstone(self, person_id: str) -> bool:
+        index = self._id_to_index.pop(person_id, None)
+        if index is None:
+            return False
+        self.person_ids[index] = None
+        rows = np.frombuffer(self._row_person, dtype=np.int32)
+        dead = rows == index
+        count = int(np.count_nonzero(dead))
+        del rows  # Release the buffer export before mutating the array
+        if count:
+            view = memoryview(self._row_person)
+            for row in np.flatnonzero(dead):
+                view[row] = -1
+            view.release()
+        self._dead_rows += count
+        return True
+
+    # ============== Views ==============
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Read-only memory map over all rows (live and removed), shape (rows, dim)"""
+        if self._matrix is None or len(self._matrix) != self.rows:
+            if self.rows == 0:
+                self._matrix = np.zeros((0, self.dim or 0), dtype=self.dtype)
+            else:
+                self._matrix = np.memmap(self.vec_path, dtype=self.dtype, mode='r',
+                                         shape=(self.rows, self.dim))
+        return self._matrix
+
+    def row_person(self) -> np.ndarray:
+        """Copy of the row -> person index array (-1 = removed)"""
+        return np.array(self._row_person, dtype=np.int32)
+
+    def live_arrays(self) -> Tuple[np.ndarray, np.ndarray, List[str], List[str]]:
+        """(matrix, person_index, person_ids, names) of live rows, with dense person indices
+
+        The matrix is the memory map itself when there are no removed rows.
+        """
+        row_person = self.row_person()
+        live_persons = [i for i, pid in enumerate(self.person_ids) if pid is not None]
+        remap = np.full(len(self.person_ids) + 1, -1, dtype=np.int32)
+        remap[live_persons] = np.arange(len(live_persons), dtype=np.int32)
+        ids = [self.person_ids[i] for i in live_persons]
+        names = [self.names[i] for i in live_persons]
+
+        matrix = self.matrix
+        if self._dead_rows:
+            keep = row_person >= 0
+            matrix = np.asarray(matrix[keep])
+            row_person = row_person[keep]
+        return matrix, remap[row_person], ids, names
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """{person_id: {'name', 'embeddings': [row views]}} - rows are views into the memory map
+
+        The views stay valid after a compaction: snapshots write a new .vec
+        file instead of replacing the mapped one.
+        """
+        matrix = self.matrix
+        grouped: Dict[str, Dict] = {}
+        for row, index in enumerate(self._row_person):
+            if index < 0:
+                continue
+            person_id = self.person_ids[index]
+            if person_id not in grouped:
+                grouped[person_id] = {'name': self.names[index], 'embeddings': []}
+            grouped[person_id]['embeddings'].append(matrix[row])
+        return grouped
+
+    # ============== Writing ==============
+
+    def _write_log(self, entry: Dict):
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def append(self, person_id: str, embeddings, name: Optional[str] = None) -> bool:
+        """Append one (D,) or several (N, D) rows for a person - O(1)"""
+        rows = np.asarray(embeddings, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows[np.newaxis, :]
+        if self.dim is None:
+            self.dim = rows.shape[1]
+        if rows.shape[1] != self.dim or len(rows) == 0:
+            logger.warning(f"Embedding store: skipped rows for {person_id} with shape {rows.shape}")
+            return False
+        try:
+            self.vec_path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.exists:
+                self._write_log({'op': 'init', 'dim': self.dim, 'dtype': self.dtype.name})
+            with open(self.vec_path, 'ab') as f:
+                f.write(rows.astype(self.dtype).tobytes())
+            self._write_log({'op': 'add', 'id': person_id, 'name': name, 'n': len(rows)})
+        except Exception as e:
+            logger.warning(f"Failed to append to embedding store: {e}")
+            return False
+        index = self._person_index(person_id, name)
+        self._row_person.extend([index] * len(rows))
+        return True
+
+    def remove(self, person_id: str) -> bool:
+        """Remove a person (rows are reclaimed at the next compaction)"""
+        if person_id not in self._id_to_index:
+            return False
+        try:
+            self._write_log({'op': 'del', 'id': person_id})
+        except Exception as e:
+            logger.warning(f"Failed to write removal to embedding store: {e}")
+            return False
+        self._tombstone(person_id)
+        if self._dead_rows > max(1024, self.rows // 2):
+            self.compact()
+        return True
+
+    def rewrite(self, faces: Dict[str, Dict]) -> bool:
+        """Replace the whole store with `faces` ({person_id: {'name', 'embeddings'}})"""
+        persons = []
+        for person_id, data in faces.items():
+            if isinstance(data, dict):
+                name, embeddings = data.get('name', person_id), data.get('embeddings', [])
+            else:
+                name, embeddings = person_id, data  # Old format - direct list
+            if len(embeddings) > 0:
+                persons.append((person_id, name, np.asarray(embeddings, dtype=np.float32)))
+        if persons and self.dim is None:
+            self.dim = persons[0][2].shape[1]
+        skipped = [p[0] for p in persons if p[2].ndim != 2 or p[2].shape[1] != self.dim]
+        if skipped:
+            logger.warning(f"Embedding store: skipped {len(skipped)} person(s) whose rows are not "
+                           f"{self.dim}-dim (e.g. {skipped[0]})")
+        persons = [p for p in persons if p[2].ndim == 2 and p[2].shape[1] == self.dim]
+        return self._write_snapshot(persons)
+
+    def compact(self) -> bool:
+        """Rewrite the files without removed rows and truncate the log"""
+        matrix, person_index, ids, names = self.live_arrays()
+        persons = []
+        order = np.argsort(person_index, kind='stable')
+        bounds = np.searchsorted(person_index[order], np.arange(len(ids) + 1))
+        for i, person_id in enumerate(ids):
+            rows = order[bounds[i]:bounds[i + 1]]
+            persons.append((person_id, names[i], np.asarray(matrix[rows], dtype=np.float32)))
+        return self._write_snapshot(persons)
+
+    def _write_snapshot(self, persons: List[Tuple[str, str, np.ndarray]]) -> bool:
+        generation = self.generation + 1
+        vec_path, log_path = self._data_paths(generation)
+        tmp_ids = Path(str(self.ids_path) + '.tmp')
+
+        row_person = array.array('i')
+        try:
+            self.vec_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(vec_path, 'wb') as f:
+                for index, (_, _, rows) in enumerate(persons):
+                    f.write(rows.astype(self.dtype).tobytes())
+                    row_person.extend([index] * len(rows))
+                f.flush()
+                os.fsync(f.fileno())
+            with open(log_path, 'w', encoding='utf-8'):
+                pass
+            with open(tmp_ids, 'wb') as f:
+                np.savez(f,
+                         dim=self.dim or 0,
+                         dtype=self.dtype.name,
+                         generation=generation,
+                         person_ids=np.array([p[0] for p in persons], dtype=str),
+                         names=np.array([p[1] or p[0] for p in persons], dtype=str),
+                         row_person=np.array(row_person, dtype=np.int32))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_ids, self.ids_path)  # Commit point
+        except Exception as e:
+            logger.warning(f"Failed to write embedding store snapshot: {e}")
+            return False
+
+        self._matrix = None
+        self._set_generation(generation)
+        self._remove_stale_files()
+        self.person_ids = [p[0] for p in persons]
+        self.names = [p[1] or p[0] for p in persons]
+        self._id_to_index = {pid: i for i, pid in enumerate(self.person_ids)}
+        self._row_person = row_person
+        self._dead_rows = 0
+        logger.debug(f"Embedding store compacted: {len(persons)} persons, {self.rows} rows")
+        return True
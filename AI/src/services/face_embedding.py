@@ -10,12 +10,21 @@ import logging
 import urllib.request
 import requests
 import base64
+import threading
+import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Set
 from datetime import datetime, date
 import numpy as np
 import cv2
 
+from .ann_index import IVFIndex
+from .embedding_codec import encode_embedding
+from .embedding_store import EmbeddingStore
+from .face_gallery import FaceGallery
+from .facenet_engine import FacenetEngine
+from .face_sync import EmbeddingSyncClient, apply_sync_batch, load_cursor, save_cursor
+
 # Suppress TensorFlow warnings
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
@@ -116,6 +125,41 @@ class FaceEmbedding:
         
         # Face database: person_id -> list of embeddings
         self.registered_faces: Dict[str, List[np.ndarray]] = {}
+        # Performance: contiguous normalized matrix mirroring registered_faces for matching
+        # matcher: "exact" = full matrix scan, "ivf" = approximate index for very large galleries
+        self.matcher = self.config.get('matcher', 'exact')
+        db_base = os.path.splitext(self.database_path)[0]
+        self.index_path = db_base + '.ivf.npz'
+        index = None
+        if self.matcher == 'ivf':
+            index = IVFIndex(
+                self.embedding_size,
+                nlist=self.config.get('ann_nlist'),
+                nprobe=self.config.get('ann_nprobe', 8),
+                min_train_size=self.config.get('ann_min_size', 2048)
+            )
+        # The index file is rewritten after a (re)train, otherwise at most every ann_save_interval seconds
+        self.index_save_interval = self.config.get('ann_save_interval', 300)
+        self._index_dirty = False
+        self._index_saved_at = 0.0
+        self._index_save_lock = threading.Lock()
+        self.gallery = FaceGallery(self.embedding_size, index=index)
+        # Local cache: memory-mapped embedding store (replaces the pickled dict)
+        self.store = EmbeddingStore(db_base, self.embedding_size,
+                                    self.config.get('embedding_dtype', 'float32'))
+        
+        # Backend sync: delta since the saved cursor, on a background schedule
+        # embedding_wire_format: "float16"/"float32" = base64 blobs (if the backend supports it), "json" = float lists
+        self.sync_client = EmbeddingSyncClient(self.backend_url, self.embedding_size,
+                                               encoding=self.config.get('embedding_wire_format', 'float32'))
+        self.cursor_path = db_base + '.sync.json'
+        self.sync_cursor: Optional[str] = None
+        self.sync_interval = self.config.get('sync_interval', 60)  # seconds
+        self._sync_lock = threading.RLock()  # One sync / reload at a time (taken before _db_lock)
+        self._db_lock = threading.RLock()  # registered_faces / gallery / store mutations
+        self._sync_wakeup = threading.Event()
+        self._sync_stop = threading.Event()
+        self._sync_thread: Optional[threading.Thread] = None
         self.face_detector = None
         self.deepface_available = False
         self.use_gpu = False
@@ -126,17 +170,20 @@ class FaceEmbedding:
         self.detected_today: Set[str] = set()
         self.detection_date: date = date.today()
         
-        # Performance: cache last recognized person to avoid repeated processing
-        self.last_recognized_id: Optional[str] = None
-        self.last_recognized_time: float = 0
+        # Performance: cache recently recognized faces (bbox, person_id, time) to avoid repeated processing
+        self.recent_faces: List[Tuple[Tuple[int, int, int, int], str, float]] = []
         self.recognition_cooldown: float = 3.0  # seconds between same person recognition
-        
-        # Performance: cache last face bbox to track if same face
-        self.last_face_bbox: Optional[Tuple[int, int, int, int]] = None
         self.same_face_threshold: int = 50  # pixels - if face moved less than this, consider same
         
-        # Performance: preloaded DeepFace model (disabled - using DeepFace.represent instead)
-        self.deepface_model = None
+        # Multi-face: up to max_faces per frame (largest first), embedded batch_size at a time
+        self.max_faces = self.config.get('max_faces', 8)
+        self.batch_size = self.config.get('batch_size', 8)
+        
+        # Performance: preloaded Facenet512 engine (None = per-face DeepFace.represent)
+        # embedding_backend: "keras" (DeepFace weights), "onnx" (ONNX Runtime CPU) or "deepface"
+        self.embedding_backend = self.config.get('embedding_backend', 'keras')
+        self.onnx_model_path = self.config.get('onnx_model_path', str(self.model_dir / 'facenet512.onnx'))
+        self.engine: Optional[FacenetEngine] = None
         
         self._initialize_models()
         self._load_database()
@@ -160,6 +207,9 @@ class FaceEmbedding:
         
         # Initialize DeepFace for embeddings
         self._init_deepface()
+        
+        # Preloaded Facenet512 engine (direct model calls)
+        self._init_engine()
     
     def _init_face_detector(self):
         """Initialize OpenCV DNN face detector"""
@@ -237,6 +287,42 @@ class FaceEmbedding:
             logger.warning("   Using simple histogram embedding instead (less accurate)")
             self.deepface_available = False
     
+    def _init_engine(self):
+        """Load the Facenet512 engine once
+        
+        The engine is only used if it reproduces DeepFace.represent on test
+        faces (one stretched below 160px, one non-square crop that is resized
+        and padded), so embeddings stay comparable with the database.
+        """
+        if self.embedding_backend == 'deepface':
+            return
+        if self.embedding_backend == 'keras' and not self.deepface_available:
+            return
+        try:
+            engine = FacenetEngine(self.embedding_backend, self.onnx_model_path, self.batch_size)
+            if self.deepface_available:
+                rng = np.random.default_rng(0)
+                test_faces = [rng.integers(0, 255, shape, dtype=np.uint8)
+                              for shape in ((180, 150, 3), (240, 190, 3))]
+                for test_face, embedding in zip(test_faces, engine.embed(test_faces)):
+                    expected = self._represent_deepface(test_face)
+                    if expected is None or embedding is None or float(np.dot(expected, embedding)) < 0.99:
+                        raise ValueError(f"engine output does not match DeepFace.represent "
+                                         f"on a {test_face.shape[1]}x{test_face.shape[0]} face")
+            self.engine = engine
+            logger.info(f"✅ Facenet512 engine enabled ({self.embedding_backend}, batch_size={self.batch_size})")
+        except Exception as e:
+            logger.warning(f"⚠️ Facenet512 engine disabled, using DeepFace.represent per face: {e}")
+    
+    def _extract_embeddings(self, face_imgs: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Embed all face crops of a frame (one batch if the engine is available)"""
+        if self.engine is not None:
+            try:
+                return self.engine.embed(face_imgs)
+            except Exception as e:
+                logger.warning(f"Batched extraction failed, falling back per face: {type(e).__name__}: {str(e)[:100]}")
+        return [self._represent_deepface(face_img) for face_img in face_imgs]
+    
     def _detect_faces(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Detect faces in image, returns list of (x, y, w, h)"""
         h, w = image.shape[:2]
@@ -264,7 +350,19 @@ class FaceEmbedding:
             return list(self.face_detector.detectMultiScale(gray, 1.1, 4, minSize=(30, 30)))
     
     def _extract_embedding(self, face_img: np.ndarray) -> Optional[np.ndarray]:
-        """Extract face embedding using DeepFace Facenet512"""
+        """Extract face embedding using Facenet512 (preloaded engine, DeepFace.represent as fallback)"""
+        if self.engine is not None:
+            try:
+                embedding = self.engine.embed_one(face_img)
+                if embedding is None:
+                    logger.warning("Face image too small for embedding extraction")
+                return embedding
+            except Exception as e:
+                logger.warning(f"Engine extraction failed, using DeepFace.represent: {type(e).__name__}")
+        return self._represent_deepface(face_img)
+    
+    def _represent_deepface(self, face_img: np.ndarray) -> Optional[np.ndarray]:
+        """Extract face embedding using DeepFace.represent (per call)"""
         try:
             if self.deepface_available:
                 from deepface import DeepFace
@@ -384,78 +482,87 @@ class FaceEmbedding:
     
     def _load_database(self):
         """Load face database - PRIMARY from SQL Server via Backend API"""
-        # First, try to load from Backend API (SQL Server) - PRIMARY SOURCE
-        backend_loaded = self._load_from_backend()
+        # A saved sync cursor means the local cache is a known backend version
+        self.sync_cursor = load_cursor(self.cursor_path) if self.store.exists else None
         
-        if not backend_loaded:
-            # Fallback: load from local pickle file (cache)
-            if os.path.exists(self.database_path):
-                try:
-                    with open(self.database_path, 'rb') as f:
-                        self.registered_faces = pickle.load(f)
-                    logger.info(f"✅ Loaded {len(self.registered_faces)} faces from local cache")
-                except Exception as e:
-                    logger.warning(f"Failed to load local cache: {e}")
-                    self.registered_faces = {}
+        if self.sync_cursor is not None:
+            # Load the local cache, then fetch only the changes from the backend
+            self._load_local_cache()
+            self._sync_from_backend()
+        elif not self._load_from_backend():
+            # Fallback: load from local cache
+            self._load_local_cache()
         
         # Load today's detections from backend
         self._load_detected_today()
     
-    def _load_from_backend(self) -> bool:
-        """Load embeddings from Backend API (SQL Server) - PRIMARY SOURCE"""
-        try:
-            response = requests.get(
-                f"{self.backend_url}/api/face/embeddings",
-                timeout=10
-            )
+    def _load_local_cache(self):
+        """Load local cache from the embedding store (memory-mapped, no copy)
+        A legacy pickle cache (faces_db.pkl) is migrated into the store once."""
+        with self._db_lock:  # The background sync patches the same gallery / store
+            if not self.store.exists and os.path.exists(self.database_path):
+                try:
+                    with open(self.database_path, 'rb') as f:
+                        legacy_faces = pickle.load(f)
+                    self.store.rewrite(legacy_faces)
+                    logger.info(f"📦 Migrated {len(legacy_faces)} faces from {self.database_path} to embedding store")
+                except Exception as e:
+                    logger.warning(f"Failed to migrate legacy cache: {e}")
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success') and data.get('data'):
-                    # Clear existing and load fresh from SQL Server
-                    self.registered_faces = {}
-                    count = 0
-                    
-                    for item in data['data']:
-                        mayte = item.get('maYTe')
-                        ten_benh_nhan = item.get('tenBenhNhan')
-                        embeddings_list = item.get('embeddings', [])
-                        
-                        if not mayte or not embeddings_list:
-                            continue
-                        
-                        # Load embeddings for this person
-                        person_embeddings = []
-                        for emb_data in embeddings_list:
-                            vector = emb_data.get('vector')
-                            if vector:
-                                embedding = np.array(vector, dtype=np.float32)
-                                # Normalize
-                                embedding = embedding / (np.linalg.norm(embedding) + 1e-6)
-                                person_embeddings.append(embedding)
-                        
-                        if person_embeddings:
-                            # Store as dict with name and embeddings
-                            self.registered_faces[mayte] = {
-                                'name': ten_benh_nhan or mayte,
-                                'embeddings': person_embeddings
-                            }
-                            count += 1
-                    
-                    logger.info(f"✅ Loaded {count} patients from SQL Server (Backend API)")
-                    
-                    # Save to local cache for offline fallback
-                    self._save_database()
-                    return True
-                    
-        except requests.exceptions.ConnectionError:
-            logger.warning("⚠️ Backend API not available, will use local cache")
-            return False
-        except Exception as e:
-            logger.warning(f"Failed to load from backend: {e}")
-            return False
+            if len(self.store) == 0:
+                return
+            try:
+                matrix, person_index, person_ids, _ = self.store.live_arrays()
+                self.gallery.load_arrays(matrix, person_index, person_ids)
+                self.registered_faces = self.store.to_dict()
+            except Exception as e:
+                logger.warning(f"Failed to load local cache: {e}")
+                self.registered_faces = {}
+                self.gallery.clear()
+                return
+        self._sync_index()
+        logger.info(f"✅ Loaded {len(self.registered_faces)} faces from local cache")
+    
+    def _load_from_backend(self) -> bool:
+        """Load all embeddings from Backend API (SQL Server) - PRIMARY SOURCE"""
+        return self._sync_from_backend(full=True)
+    
+    def _sync_from_backend(self, full: bool = False) -> bool:
+        """Fetch embeddings changed since the last sync (or everything) and patch them in
         
-        return False
+        registered_faces, the gallery and the local cache are updated in place,
+        so recognition keeps running while a sync is in progress.
+        """
+        with self._sync_lock:
+            cursor = None if full else self.sync_cursor
+            try:
+                batch = self.sync_client.fetch(cursor)
+                if batch is None and cursor is not None:
+                    # Cursor rejected (e.g. expired on the backend): full download
+                    batch = self.sync_client.fetch(None)
+            except requests.exceptions.ConnectionError:
+                logger.warning("⚠️ Backend API not available, will use local cache")
+                return False
+            except Exception as e:
+                logger.warning(f"Failed to load from backend: {e}")
+                return False
+            
+            if batch is None or (batch.full and not batch.persons):
+                return False
+            
+            with self._db_lock:
+                self.registered_faces, changed = apply_sync_batch(
+                    batch, self.registered_faces, self.gallery, self.store
+                )
+            self._sync_index()
+            self.sync_cursor = batch.cursor
+            save_cursor(self.cursor_path, batch.cursor)
+            
+            if batch.full:
+                logger.info(f"✅ Loaded {changed} patients from SQL Server (Backend API)")
+            elif changed:
+                logger.info(f"✅ Delta sync: {changed} patients changed/removed")
+            return True
     
     def _load_detected_today(self):
         """Load list of people already detected today from Backend"""
@@ -487,15 +594,35 @@ class FaceEmbedding:
         This method is kept for reference only."""
         pass
     
-    def _save_database(self):
-        """Save face database to file"""
-        try:
-            os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
-            with open(self.database_path, 'wb') as f:
-                pickle.dump(self.registered_faces, f)
-            logger.debug("Database saved")
-        except Exception as e:
-            logger.warning(f"Failed to save database: {e}")
+    def _sync_index(self):
+        """Load/train the ANN index (matcher: ivf) after the gallery changed
+        
+        Call without _db_lock held: k-means runs outside every lock, so
+        matching and registration continue meanwhile. The index file is only
+        rewritten after a (re)train; other changes are saved by
+        _maybe_save_index (background sync) and close().
+        """
+        if self.gallery.index is None:
+            return
+        self._index_dirty = True
+        self.gallery.load_index(self.index_path)
+        if self.gallery.refresh_index():
+            self._save_index()
+    
+    def _save_index(self):
+        """Persist the ANN index from a snapshot (the file write happens off-lock)"""
+        with self._index_save_lock:
+            self._index_dirty = False
+            snapshot = self.gallery.index_snapshot()
+            if snapshot is None:
+                return
+            fingerprint, state = snapshot
+            self.gallery.index.save(self.index_path, fingerprint, state)
+            self._index_saved_at = time.time()
+    
+    def _maybe_save_index(self):
+        if self._index_dirty and time.time() - self._index_saved_at >= self.index_save_interval:
+            self._save_index()
     
     def _record_detection(self, person_id: str, similarity: float) -> bool:
         """Record auto-detection to Backend API (once per person per day)"""
@@ -545,16 +672,11 @@ class FaceEmbedding:
                                    image_path: str = None) -> bool:
         """Save embedding to Backend API (SQL Server)"""
         try:
-            response = requests.post(
-                f"{self.backend_url}/api/face/embeddings",
-                json={
-                    'maYTe': person_id,
-                    'embedding': embedding.tolist(),
-                    'imagePath': image_path,
-                    'modelName': 'Facenet512'
-                },
-                timeout=10
-            )
+            response = self._post_embedding({
+                'maYTe': person_id,
+                'imagePath': image_path,
+                'modelName': 'Facenet512'
+            }, embedding, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -568,29 +690,39 @@ class FaceEmbedding:
             logger.warning(f"Failed to save embedding to backend: {e}")
             return False
     
+    def _post_embedding(self, payload: Dict, embedding: np.ndarray, timeout: float) -> requests.Response:
+        """POST /api/face/embeddings - base64 float32 blob if the backend supports it, else float list"""
+        url = f"{self.backend_url}/api/face/embeddings"
+        if self.sync_client.binary_supported:
+            response = requests.post(url, json=dict(
+                payload, embeddingB64=encode_embedding(embedding, 'float32'), embeddingEncoding='float32'
+            ), timeout=timeout)
+            if response.status_code != 400:
+                return response
+            # Rejected: retry as float list; if that works the backend does not accept blobs
+            response = requests.post(url, json=dict(payload, embedding=embedding.tolist()), timeout=timeout)
+            if response.status_code == 200:
+                self.sync_client.binary_supported = False
+            return response
+        return requests.post(url, json=dict(payload, embedding=embedding.tolist()), timeout=timeout)
+    
     def _find_match(self, embedding: np.ndarray) -> Tuple[Optional[str], float]:
-        """Find best matching person in database"""
-        best_match = None
-        best_similarity = 0.0
-        
-        for person_id, person_data in self.registered_faces.items():
-            # Handle both old format (list) and new format (dict with 'embeddings' key)
-            if isinstance(person_data, dict):
-                embeddings_list = person_data.get('embeddings', [])
-            else:
-                embeddings_list = person_data  # Old format - direct list
-            
-            for ref_embedding in embeddings_list:
-                similarity = self._cosine_similarity(embedding, ref_embedding)
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = person_id
-        
-        # Only return match if above threshold
-        if best_similarity >= self.threshold:
-            return best_match, best_similarity
-        
-        return None, best_similarity
+        """Find best matching person in database (one matrix-vector product over the gallery)"""
+        return self._find_matches([embedding])[0]
+    
+    def _find_matches(self, embeddings: List[np.ndarray]) -> List[Tuple[Optional[str], float]]:
+        """Best matching person for several embeddings at once (one matrix product)"""
+        if not embeddings:
+            return []
+        matches = []
+        for best_match, best_similarity in self.gallery.match_batch(np.stack(embeddings)):
+            if best_similarity <= 0.0:
+                best_match, best_similarity = None, 0.0
+            # Only return match if above threshold
+            if best_similarity < self.threshold:
+                best_match = None
+            matches.append((best_match, best_similarity))
+        return matches
     
     def register_face(self, person_id: str, face_img: np.ndarray, 
                        save_to_backend: bool = True, person_name: str = None) -> Tuple[bool, str]:
@@ -611,22 +743,25 @@ class FaceEmbedding:
                 return False, "Không thể trích xuất đặc trưng khuôn mặt"
             
             # Add to local cache (memory)
-            if person_id not in self.registered_faces:
-                self.registered_faces[person_id] = {
-                    'name': person_name or person_id,
-                    'embeddings': []
-                }
-            # If old format, upgrade to new format
-            if not isinstance(self.registered_faces[person_id], dict):
-                self.registered_faces[person_id] = {
-                    'name': person_name or person_id,
-                    'embeddings': list(self.registered_faces[person_id])
-                }
-            # Update name if provided
-            if person_name:
-                self.registered_faces[person_id]['name'] = person_name
-            self.registered_faces[person_id]['embeddings'].append(embedding)
-            self._save_database()  # Save to local pickle (cache)
+            with self._db_lock:
+                if person_id not in self.registered_faces:
+                    self.registered_faces[person_id] = {
+                        'name': person_name or person_id,
+                        'embeddings': []
+                    }
+                # If old format, upgrade to new format
+                if not isinstance(self.registered_faces[person_id], dict):
+                    self.registered_faces[person_id] = {
+                        'name': person_name or person_id,
+                        'embeddings': list(self.registered_faces[person_id])
+                    }
+                # Update name if provided
+                if person_name:
+                    self.registered_faces[person_id]['name'] = person_name
+                self.registered_faces[person_id]['embeddings'].append(embedding)
+                self.gallery.add(person_id, embedding)
+                self.store.append(person_id, embedding, person_name)  # Local cache: O(1) append
+            self._sync_index()
             
             # Save to Backend API (SQL Server) - PRIMARY STORAGE
             if save_to_backend:
@@ -651,15 +786,10 @@ class FaceEmbedding:
         """
         try:
             # Call Backend API - chỉ gửi embedding, không gửi ảnh
-            response = requests.post(
-                f"{self.backend_url}/api/face/embeddings",
-                json={
-                    'maYTe': person_id,
-                    'embedding': embedding.tolist(),
-                    'modelName': 'Facenet512'
-                },
-                timeout=15
-            )
+            response = self._post_embedding({
+                'maYTe': person_id,
+                'modelName': 'Facenet512'
+            }, embedding, timeout=15)
             
             if response.status_code == 200:
                 data = response.json()
@@ -696,24 +826,22 @@ class FaceEmbedding:
         if faces:
             logger.info(f"👤 Detected {len(faces)} face(s), sizes: {[(f[2], f[3]) for f in faces]}")
         
-        # Performance: if no faces, clear cache and return early
+        # Performance: forget expired entries of the recognition cache
+        self.recent_faces = [c for c in self.recent_faces
+                             if current_time - c[2] < self.recognition_cooldown]
+        
+        # Performance: if no faces, return early
         if not faces:
-            self.last_face_bbox = None
             return results
         
-        # Performance: only process the largest face (closest person)
-        if len(faces) > 1:
-            faces = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[:1]
+        # Largest faces (closest persons) first, at most max_faces per frame
+        faces = sorted(faces, key=lambda f: f[2] * f[3], reverse=True)[:self.max_faces]
         
+        pending = []  # (result, face crop) to embed in one batch
         for x, y, w, h in faces:
-            face_img = frame[y:y+h, x:x+w]
-            
             # Check if face is large enough (person is close)
             is_close = w >= self.min_face_size
             
-            # DEBUG: Log face size check
-            logger.info(f"   Face size: {w}x{h}, min_required: {self.min_face_size}, is_close: {is_close}")
-            
             # Performance: skip if face is too small (too far)
             if not is_close:
                 results.append({
@@ -725,90 +853,82 @@ class FaceEmbedding:
                 })
                 continue
             
-            # Performance: check if same face position (person hasn't moved)
-            if self.last_face_bbox is not None:
-                lx, ly, lw, lh = self.last_face_bbox
-                dx = abs(x - lx)
-                dy = abs(y - ly)
-                # If face is in roughly same position and recently recognized
-                if dx < self.same_face_threshold and dy < self.same_face_threshold:
-                    time_since_last = current_time - self.last_recognized_time
-                    if time_since_last < self.recognition_cooldown and self.last_recognized_id:
-                        # Use cached result
-                        results.append({
-                            'bbox': (x, y, w, h),
-                            'person_id': self.last_recognized_id,
-                            'similarity': 0.95,  # High confidence for cache
-                            'status': 'matched',
-                            'is_close': True,
-                            'cached': True
-                        })
-                        continue
-            
-            # Update face bbox cache
-            self.last_face_bbox = (x, y, w, h)
-            
-            # Extract embedding
-            logger.info(f"   Extracting embedding...")
-            embedding = self._extract_embedding(face_img)
-            if embedding is None:
-                logger.warning(f"   ⚠️ Embedding extraction FAILED!")
+            # Performance: same position as a recently recognized face (person hasn't moved)
+            cached_id = self._cached_face((x, y, w, h))
+            if cached_id:
                 results.append({
                     'bbox': (x, y, w, h),
-                    'person_id': None,
-                    'similarity': 0.0,
-                    'status': 'unknown',
-                    'is_close': is_close
+                    'person_id': cached_id,
+                    'similarity': 0.95,  # High confidence for cache
+                    'status': 'matched',
+                    'is_close': True,
+                    'cached': True
                 })
                 continue
             
-            logger.info(f"   Embedding extracted: shape={embedding.shape}")
-            
-            # Find match
-            person_id, similarity = self._find_match(embedding)
-            
-            # DEBUG: Log matching result
-            logger.info(f"   Match result: person_id={person_id}, similarity={similarity:.4f}, threshold={self.threshold}")
-            
             result = {
                 'bbox': (x, y, w, h),
-                'person_id': person_id,
-                'similarity': similarity,
-                'status': 'matched' if person_id else 'unknown',
-                'is_close': is_close
+                'person_id': None,
+                'similarity': 0.0,
+                'status': 'unknown',
+                'is_close': True
             }
             results.append(result)
+            pending.append((result, frame[y:y+h, x:x+w]))
+        
+        if not pending:
+            return results
+        
+        # Extract all embeddings in one batch, then match them all at once
+        embeddings = self._extract_embeddings([face_img for _, face_img in pending])
+        extracted = [(r, e) for (r, _), e in zip(pending, embeddings) if e is not None]
+        if len(extracted) < len(pending):
+            logger.warning(f"   ⚠️ Embedding extraction FAILED for {len(pending) - len(extracted)} face(s)")
+        matches = self._find_matches([e for _, e in extracted])
+        
+        for (result, _), (person_id, similarity) in zip(extracted, matches):
+            result['person_id'] = person_id
+            result['similarity'] = similarity
+            result['status'] = 'matched' if person_id else 'unknown'
             
             if person_id:
                 # Update recognition cache
-                self.last_recognized_id = person_id
-                self.last_recognized_time = current_time
+                self.recent_faces.append((result['bbox'], person_id, current_time))
                 
                 logger.info(f"✅ Face MATCHED: {person_id} (similarity={similarity:.3f})")
                 
                 # Auto-record detection if enabled and face is close enough
-                if auto_record and self.auto_detection_enabled and is_close:
+                if auto_record and self.auto_detection_enabled:
                     self._record_detection(person_id, similarity)
             else:
-                # Unknown face - clear cache
-                self.last_recognized_id = None
                 logger.info(f"❌ Face NOT matched (best similarity: {similarity:.3f} < threshold {self.threshold})")
         
         return results
     
-    def process_frame(self, frame: np.ndarray, auto_record: bool = False, show_bounding_box: bool = True) -> Dict:
+    def _cached_face(self, bbox: Tuple[int, int, int, int]) -> Optional[str]:
+        """Person ID of a recently recognized face at roughly the same position"""
+        x, y = bbox[:2]
+        for (lx, ly, _, _), person_id, _ in reversed(self.recent_faces):
+            if abs(x - lx) < self.same_face_threshold and abs(y - ly) < self.same_face_threshold:
+                return person_id
+        return None
+    
+    def process_frame(self, frame: np.ndarray, auto_record: bool = False, show_bounding_box: bool = True,
+                      annotate: bool = True) -> Dict:
         """Process a video frame for face recognition
         
         Args:
             frame: Input video frame (BGR)
             auto_record: If True, automatically record detections to backend
             show_bounding_box: If True, draw bounding boxes on annotated frame
+            annotate: If False, skip 'annotated_frame' (render later with draw())
         
         Returns dict compatible with camera_server.py:
         {
-            'annotated_frame': np.ndarray,
+            'annotated_frame': np.ndarray,  # Only when annotate=True
             'faces': List[Dict],
-            'recognized_count': int
+            'recognized_count': int,
+            'detections': List[Dict]  # All faces incl. unknown, for draw()
         }
         """
         self.frame_count += 1
@@ -816,13 +936,7 @@ class FaceEmbedding:
         # Only process every N frames for performance
         if self.frame_count % self.detection_interval != 0:
             # Use last results
-            annotated = self._annotate_frame(frame, self.last_results, show_bounding_box)
-            recognized = [f for f in self.last_results if f.get('person_id')]
-            return {
-                'annotated_frame': annotated,
-                'faces': [self._convert_result(r) for r in recognized],  # Only recognized faces
-                'recognized_count': len(recognized)
-            }
+            return self._frame_result(frame, self.last_results, show_bounding_box, annotate)
         
         # Resize for faster processing
         h, w = frame.shape[:2]
@@ -843,27 +957,30 @@ class FaceEmbedding:
                             int(w_box * scale), int(h_box * scale))
         
         self.last_results = results
-        
-        # Annotate frame (with or without bounding box)
-        annotated = self._annotate_frame(frame, results, show_bounding_box)
-        
+        return self._frame_result(frame, results, show_bounding_box, annotate)
+    
+    def _frame_result(self, frame: np.ndarray, results: List[Dict], show_bounding_box: bool,
+                      annotate: bool) -> Dict:
         # Only return recognized faces (confidence >= threshold)
         recognized = [f for f in results if f.get('person_id')]
-        return {
-            'annotated_frame': annotated,
+        frame_result = {
             'faces': [self._convert_result(r) for r in recognized],  # Only recognized faces
-            'recognized_count': len(recognized)
+            'recognized_count': len(recognized),
+            'detections': results,
         }
+        if annotate:
+            # Annotate frame (with or without bounding box)
+            frame_result['annotated_frame'] = self._annotate_frame(frame, results, show_bounding_box)
+        return frame_result
     
     def _convert_result(self, r: Dict) -> Dict:
         """Convert internal result to camera_server format"""
         person_id = r.get('person_id')
         # Try to get the name from registered_faces if available
         name = person_id
-        if person_id and person_id in self.registered_faces:
-            data = self.registered_faces[person_id]
-            if isinstance(data, dict):
-                name = data.get('name', person_id)
+        data = self.registered_faces.get(person_id) if person_id else None
+        if isinstance(data, dict):
+            name = data.get('name', person_id)
         return {
             'person_id': person_id,
             'person_name': name,
@@ -873,22 +990,21 @@ class FaceEmbedding:
         }
     
     def _annotate_frame(self, frame: np.ndarray, results: List[Dict], show_bounding_box: bool = True) -> np.ndarray:
-        """Draw face detection/recognition results on frame
+        """Annotated copy of the frame (the frame itself when show_bounding_box is False)"""
+        if not show_bounding_box:
+            return frame
+        return self.draw(frame.copy(), results)
+    
+    def draw(self, frame: np.ndarray, results: List[Dict]) -> np.ndarray:
+        """Draw face detection/recognition results on frame, in place
         Always show bounding box for detected faces, with different colors:
         - GREEN: Recognized face (in database)
         - RED: Unknown face (not in database)
         
         Args:
-            frame: Input frame
-            results: Face detection/recognition results
-            show_bounding_box: If False, return frame without any annotations
+            frame: Frame to draw on (modified)
+            results: Face detection/recognition results ('detections' of process_frame)
         """
-        annotated = frame.copy()
-        
-        # If show_bounding_box is False, return frame as-is (no annotations)
-        if not show_bounding_box:
-            return annotated
-        
         for r in results:
             x, y, w, h = r['bbox']
             person_id = r.get('person_id')
@@ -907,30 +1023,77 @@ class FaceEmbedding:
                     label = "Detecting..."
             
             # Draw bounding box
-            cv2.rectangle(annotated, (x, y), (x + w, y + h), color, 2)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
             
             # Draw label background
             (label_w, label_h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-            cv2.rectangle(annotated, (x, y - label_h - 10), (x + label_w, y), color, -1)
+            cv2.rectangle(frame, (x, y - label_h - 10), (x + label_w, y), color, -1)
             
             # Draw label text
-            cv2.putText(annotated, label, (x, y - 5), 
+            cv2.putText(frame, label, (x, y - 5), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
-        return annotated
+        return frame
     
     def reload_database(self):
         """Reload face database (call after adding new images)"""
-        self.registered_faces = {}
-        self._load_database()
+        with self._sync_lock:  # The background sync must not patch the gallery mid-reload
+            with self._db_lock:
+                self.registered_faces = {}
+                self.gallery.clear()
+            self._load_database()
         logger.info(f"🔄 Reloaded database: {len(self.registered_faces)} persons")
     
-    def sync_with_backend(self):
-        """Sync database with Backend API"""
-        self._load_from_backend()
+    def sync_with_backend(self, full: bool = False) -> bool:
+        """Sync database with Backend API (only changes since the last sync unless full)"""
+        synced = self._sync_from_backend(full)
         self._load_detected_today()
         logger.info(f"🔄 Synced with backend: {len(self.registered_faces)} persons, "
                    f"{len(self.detected_today)} detected today")
+        return synced
+    
+    def start_background_sync(self, interval: Optional[float] = None):
+        """Run sync_with_backend every `interval` seconds (default: sync_interval) on a daemon thread"""
+        if interval is not None:
+            self.sync_interval = interval
+        if self.sync_interval <= 0 or (self._sync_thread and self._sync_thread.is_alive()):
+            return
+        self._sync_stop.clear()
+        self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True, name='face-sync')
+        self._sync_thread.start()
+        logger.info(f"🔄 Background face sync every {self.sync_interval}s")
+    
+    def stop_background_sync(self):
+        self._sync_stop.set()
+        self._sync_wakeup.set()
+    
+    def close(self):
+        """Stop the background sync and persist pending ANN index changes (call at shutdown)"""
+        self.stop_background_sync()
+        if self._index_dirty:
+            self._save_index()
+    
+    def request_sync(self):
+        """Trigger a sync without blocking the caller (e.g. an HTTP request thread)"""
+        if self._sync_thread is not None and self._sync_thread.is_alive():
+            self._sync_wakeup.set()
+        else:
+            threading.Thread(target=self._run_sync, daemon=True, name='face-sync-once').start()
+    
+    def _sync_loop(self):
+        while not self._sync_stop.is_set():
+            self._sync_wakeup.wait(self.sync_interval)
+            self._sync_wakeup.clear()
+            if self._sync_stop.is_set():
+                break
+            self._run_sync()
+            self._maybe_save_index()
+    
+    def _run_sync(self):
+        try:
+            self.sync_with_backend()
+        except Exception as e:
+            logger.warning(f"Background sync failed: {e}")
     
     def reset_detected_today(self):
         """Reset detected today cache (for testing)"""
@@ -945,7 +1108,7 @@ class FaceEmbedding:
     def list_registered(self) -> List[Dict]:
         """List all registered faces with details (for API compatibility)"""
         result = []
-        for person_id, data in self.registered_faces.items():
+        for person_id, data in list(self.registered_faces.items()):  # Snapshot: sync may patch it
             # Support both old and new format for backward compatibility
             if isinstance(data, dict) and 'embeddings' in data:
                 name = data.get('name', person_id)
@@ -967,9 +1130,13 @@ class FaceEmbedding:
         removed = False
         
         # 1. Remove from memory (registered_faces dictionary)
-        if person_id in self.registered_faces:
-            del self.registered_faces[person_id]
-            self._save_database()
+        with self._db_lock:
+            in_cache = self.registered_faces.pop(person_id, None) is not None
+            if in_cache:
+                self.gallery.remove(person_id)
+                self.store.remove(person_id)
+        if in_cache:
+            self._sync_index()
             logger.info(f"🗑️ Removed person {person_id} from local cache")
             removed = True
         
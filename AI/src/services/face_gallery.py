@@ -0,0 +1,306 @@
+# face_gallery.py
+# In-memory face gallery for fast embedding matching
+# All registered embeddings live in one contiguous, L2-normalized float32 matrix
+# with a parallel person-index array, so matching is a single matrix-vector
+# product instead of a Python loop over every stored embedding
+# Optionally backed by an IVF index (ann_index.py) for hospital-scale galleries
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from .ann_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize one embedding (D,) or a batch (N, D) as float32"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / (norms + 1e-6)
+
+
+class FaceGallery:
+    """
+    Contiguous embedding matrix + person index used by FaceEmbedding._find_match.
+
+    Layout:
+    - matrix[:size]       (N, D) float32, each row L2-normalized
+    - person_index[:size] (N,)   int32, row -> index into person_ids
+    - person_ids          list of person IDs (MAYTE), index -> ID
+
+    Rows are appended into a pre-allocated buffer that grows by doubling, so
+    register_face is amortized O(1). Removing a person compacts the buffer.
+
+    If an index is attached (see IVFIndex), matching only scores the index
+    candidates exactly instead of scanning every row.
+    """
+
+    def __init__(self, dim: int = 512, initial_capacity: int = 256, index=None):
+        self.dim = dim
+        self.index = index
+        self._lock = threading.RLock()
+        self._train_lock = threading.Lock()  # One k-means at a time (runs outside _lock)
+        self._allocate(max(1, initial_capacity))
+
+    def _allocate(self, capacity: int):
+        self.matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self.person_index = np.zeros(capacity, dtype=np.int32)
+        self.person_ids: List[str] = []
+        self._id_to_index: Dict[str, int] = {}
+        self.size = 0
+        self.generation = 0  # Bumped whenever existing rows move (remove / clear / load)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def person_count(self) -> int:
+        return len(self.person_ids)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """View of the active rows (N, D)"""
+        return self.matrix[:self.size]
+
+    def _ensure_capacity(self, extra: int):
+        needed = self.size + extra
+        capacity = self.matrix.shape[0]
+        if needed <= capacity and self.matrix.flags.writeable:
+            return
+        # Also reached for a read-only memory-mapped matrix (see load_arrays): copy on first write
+        capacity = max(capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        person_index = np.zeros(capacity, dtype=np.int32)
+        person_index[:self.size] = self.person_index[:self.size]
+        self.matrix = matrix
+        self.person_index = person_index
+
+    def clear(self):
+        """Drop all embeddings (keeps the allocated buffer unless it is memory-mapped)"""
+        with self._lock:
+            if not self.matrix.flags.writeable:
+                self.matrix = np.zeros((256, self.dim), dtype=np.float32)
+                self.person_index = np.zeros(256, dtype=np.int32)
+            self.size = 0
+            self.person_ids = []
+            self._id_to_index = {}
+            self.generation += 1
+            if self.index is not None:
+                self.index.reset()
+
+    def add(self, person_id: str, embeddings) -> int:
+        """Append one embedding (D,) or several (N, D) for a person
+
+        Returns:
+            Number of rows added (rows with a wrong dimension are skipped)
+        """
+        rows = np.asarray(embeddings, dtype=np.float32)
+        if rows.ndim == 1:
+            rows = rows[np.newaxis, :]
+        if rows.ndim != 2 or rows.shape[1] != self.dim or len(rows) == 0:
+            logger.warning(f"Gallery: skipped embedding(s) for {person_id} with shape {rows.shape}")
+            return 0
+
+        with self._lock:
+            if person_id not in self._id_to_index:
+                self._id_to_index[person_id] = len(self.person_ids)
+                self.person_ids.append(person_id)
+            index = self._id_to_index[person_id]
+
+            self._ensure_capacity(len(rows))
+            start, end = self.size, self.size + len(rows)
+            self.matrix[start:end] = normalize_embeddings(rows)
+            self.person_index[start:end] = index
+            self.size = end
+            if self.index is not None:
+                self.index.add(self.matrix[start:end])
+            return len(rows)
+
+    def remove(self, person_id: str) -> bool:
+        """Remove all embeddings of a person and compact the matrix"""
+        return self.remove_many([person_id]) > 0
+
+    def remove_many(self, person_ids: Iterable[str]) -> int:
+        """Remove several persons with a single compaction of the matrix
+
+        Returns:
+            Number of persons removed
+        """
+        with self._lock:
+            removed = [self._id_to_index[pid] for pid in set(person_ids) if pid in self._id_to_index]
+            if not removed:
+                return 0
+
+            self._ensure_capacity(0)
+            alive = np.ones(len(self.person_ids), dtype=bool)
+            alive[removed] = False
+            # Old person index -> new person index (persons after a removed one shift down)
+            remap = (np.cumsum(alive) - 1).astype(np.int32)
+            keep = alive[self.person_index[:self.size]]
+            kept = int(np.count_nonzero(keep))
+            self.matrix[:kept] = self.matrix[:self.size][keep]
+            self.person_index[:kept] = remap[self.person_index[:self.size][keep]]
+            self.size = kept
+            self.generation += 1
+            if self.index is not None:
+                self.index.compact(keep)
+
+            self.person_ids = [pid for pid, live in zip(self.person_ids, alive) if live]
+            self._id_to_index = {pid: i for i, pid in enumerate(self.person_ids)}
+            return len(removed)
+
+    def rebuild(self, registered_faces: Dict):
+        """Rebuild from a registered_faces dict (new dict format or old list format)"""
+        with self._lock:
+            self.clear()
+            for person_id, person_data in registered_faces.items():
+                if isinstance(person_data, dict):
+                    embeddings_list = person_data.get('embeddings', [])
+                else:
+                    embeddings_list = person_data  # Old format - direct list
+                rows = [e for e in embeddings_list if np.shape(e) == (self.dim,)]
+                if rows:
+                    self.add(person_id, np.stack(rows))
+        logger.debug(f"Gallery rebuilt: {self.person_count} persons, {self.size} embeddings")
+
+    def load_arrays(self, matrix: np.ndarray, person_index: np.ndarray, person_ids: List[str]):
+        """Adopt pre-normalized rows without copying (e.g. an EmbeddingStore memory map)
+
+        A float32 matrix is used as-is, even if read-only; it is copied into a
+        growable buffer on the first add/remove.
+        """
+        with self._lock:
+            self.matrix = np.asarray(matrix, dtype=np.float32)
+            self.person_index = np.array(person_index, dtype=np.int32)
+            self.person_ids = list(person_ids)
+            self._id_to_index = {pid: i for i, pid in enumerate(self.person_ids)}
+            self.size = len(self.matrix)
+            self.generation += 1
+            if self.index is not None:
+                self.index.reset()
+        logger.debug(f"Gallery loaded: {self.person_count} persons, {self.size} embeddings")
+
+    def fingerprint(self) -> int:
+        """Checksum of the current row layout (for validating a persisted index)"""
+        with self._lock:
+            return IVFIndex.fingerprint(self.person_ids, self.person_index[:self.size],
+                                       self.matrix[:self.size])
+
+    def load_index(self, path: str) -> bool:
+        """Load a persisted index into an untrained attached index (see IVFIndex.load)"""
+        with self._lock:
+            if self.index is None or self.index.is_trained:
+                return False
+            return self.index.load(path, self.matrix[:self.size], self.fingerprint())
+
+    def refresh_index(self) -> bool:
+        """(Re)train the attached index if the gallery outgrew it
+
+        k-means runs on a copy of the rows outside the lock, so matching
+        continues (exact, or on the old centroids) meanwhile. Rows appended
+        during training are assigned when the new centroids are installed;
+        if rows were removed or reloaded meanwhile the result is discarded
+        and the next call trains again.
+
+        Returns:
+            True if the index was (re)trained
+        """
+        if not self._train_lock.acquire(blocking=False):
+            return False  # Another thread is already training
+        try:
+            with self._lock:
+                if self.index is None or not self.index.needs_training(self.size):
+                    return False
+                generation, size = self.generation, self.size
+                rows = self.matrix[:size].copy()
+            centroids = self.index.fit(rows)
+            assignments = self.index.assign(rows, centroids)
+            with self._lock:
+                if generation != self.generation:
+                    return False
+                appended = self.index.assign(self.matrix[size:self.size], centroids)
+                self.index.install(centroids, np.concatenate([assignments, appended]), size)
+                return True
+        finally:
+            self._train_lock.release()
+
+    def index_snapshot(self) -> Optional[Tuple[int, dict]]:
+        """(fingerprint, IVFIndex.state()) of a trained index, for saving it off-lock"""
+        with self._lock:
+            if not self._use_index():
+                return None
+            return self.fingerprint(), self.index.state()
+
+    def _use_index(self) -> bool:
+        if self.index is None or not self.index.is_trained:
+            return False
+        if len(self.index.assignments) != self.size:
+            self.index.reassign(self.matrix[:self.size])
+        return True
+
+    def search(self, embedding: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+        """Top-k persons for one query, ranked by their best exact similarity"""
+        query = normalize_embeddings(embedding)
+        with self._lock:
+            if self.size == 0:
+                return []
+            if self._use_index():
+                rows = self.index.candidates(query)
+            else:
+                rows = np.arange(self.size)
+            sims = self.matrix[rows] @ query
+            results = []
+            seen = set()
+            for i in np.argsort(-sims):
+                person = int(self.person_index[rows[i]])
+                if person in seen:
+                    continue
+                seen.add(person)
+                results.append((self.person_ids[person], float(sims[i])))
+                if len(results) >= k:
+                    break
+            return results
+
+    def match(self, embedding: np.ndarray) -> Tuple[Optional[str], float]:
+        """Best matching person and its similarity (no threshold applied)"""
+        return self.match_batch(embedding)[0]
+
+    def match_batch(self, embeddings: Iterable[np.ndarray]) -> List[Tuple[Optional[str], float]]:
+        """Best matching person for each query embedding in one matrix product
+
+        The row-wise argmax equals the max over the per-person maxima, so no
+        explicit per-person reduction is needed to find the winner.
+        """
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        if queries.shape[-1] != self.dim:
+            return [(None, 0.0)] * len(queries)
+
+        with self._lock:
+            if self.size == 0:
+                return [(None, 0.0)] * len(queries)
+            if self._use_index():
+                return [self._match_candidates(query) for query in normalize_embeddings(queries)]
+            sims = normalize_embeddings(queries) @ self.matrix[:self.size].T
+            best_rows = np.argmax(sims, axis=1)
+            best_sims = sims[np.arange(len(queries)), best_rows]
+            return [
+                (self.person_ids[self.person_index[row]], float(sim))
+                for row, sim in zip(best_rows, best_sims)
+            ]
+
+    def _match_candidates(self, query: np.ndarray) -> Tuple[Optional[str], float]:
+        """Exact re-rank of the index candidates for one normalized query"""
+        rows = self.index.candidates(query)
+        if len(rows) == 0:
+            return None, 0.0
+        sims = self.matrix[rows] @ query
+        best = int(np.argmax(sims))
+        return self.person_ids[self.person_index[rows[best]]], float(sims[best])
@@ -10,6 +10,8 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import cv2
 
+from .embedding_store import EmbeddingStore
+
 logger = logging.getLogger(__name__)
 
 class FastFaceRecognition:
@@ -19,6 +21,8 @@ class FastFaceRecognition:
     No external compilation required - works out of the box.
     """
     
+    FEATURE_SIZE = 80  # 64-bin histogram + 4x4 gradient grid (_extract_face_feature)
+    
     def __init__(self, config: Dict = None):
         self.config = config or {}
         self.database_path = self.config.get('database_path', 'data/faces_db.pkl')
@@ -28,6 +32,11 @@ class FastFaceRecognition:
         self.threshold = self.config.get('threshold', 0.92)  # High threshold to avoid false positives
         
         self.registered_faces: Dict[str, List[np.ndarray]] = {}  # person_id -> list of face histograms
+        # Local database: memory-mapped feature store (replaces the pickled {'faces': ...} dict)
+        # Own base next to database_path: FaceEmbedding keeps 512-dim embeddings under faces_db.*
+        store_path = self.config.get('store_path',
+                                     os.path.join(os.path.dirname(self.database_path), 'faces_hist_db'))
+        self.store = EmbeddingStore(store_path, self.FEATURE_SIZE)
         self.face_detector = None
         self.frame_count = 0
         self.last_results = []
@@ -85,16 +94,22 @@ class FastFaceRecognition:
     
     def _load_database(self):
         """Load registered faces from database or folder"""
-        # Try to load from pickle file first
-        if os.path.exists(self.database_path):
+        # Migrate a legacy pickle database into the feature store once
+        if not self.store.exists and os.path.exists(self.database_path):
             try:
                 with open(self.database_path, 'rb') as f:
                     data = pickle.load(f)
-                    self.registered_faces = data.get('faces', {})
-                logger.info(f"📂 Loaded {len(self.registered_faces)} faces from database")
-                return
+                self.store.rewrite(data.get('faces', {}))
             except Exception as e:
-                logger.warning(f"Could not load database: {e}")
+                logger.warning(f"Could not migrate database: {e}")
+        
+        # Load from feature store (rows are views into the memory map)
+        if len(self.store) > 0:
+            self.registered_faces = {
+                person_id: data['embeddings'] for person_id, data in self.store.to_dict().items()
+            }
+            logger.info(f"📂 Loaded {len(self.registered_faces)} faces from database")
+            return
         
         # Otherwise, scan faces folder and build features
         self._scan_faces_folder()
@@ -128,16 +143,11 @@ class FastFaceRecognition:
         self._save_database()
     
     def _save_database(self):
-        """Save registered faces to pickle file"""
-        try:
-            db_dir = os.path.dirname(self.database_path)
-            if db_dir:
-                os.makedirs(db_dir, exist_ok=True)
-            with open(self.database_path, 'wb') as f:
-                pickle.dump({'faces': self.registered_faces}, f)
+        """Save all registered faces to the feature store (full snapshot)"""
+        if self.store.rewrite(self.registered_faces):
             logger.info(f"💾 Saved database with {len(self.registered_faces)} faces")
-        except Exception as e:
-            logger.error(f"Could not save database: {e}")
+        else:
+            logger.error("Could not save database")
     
     def _detect_faces_dnn(self, image: np.ndarray) -> List[Tuple[int, int, int, int]]:
         """Detect faces using DNN (more robust)"""
@@ -378,7 +388,7 @@ class FastFaceRecognition:
         """Delete a registered face"""
         if person_id in self.registered_faces:
             del self.registered_faces[person_id]
-            self._save_database()
+            self.store.remove(person_id)
             logger.info(f"🗑️ Deleted face for {person_id}")
             return True
         return False
@@ -396,7 +406,7 @@ class FastFaceRecognition:
         
         self.registered_faces[person_id].append(feature)
         
-        self._save_database()
+        self.store.append(person_id, feature)
         logger.info(f"✅ Registered face for {person_id}")
         return True
     
@@ -10,6 +10,8 @@ from typing import Dict, List, Optional, Tuple
 import numpy as np
 import cv2
 
+from .embedding_store import EmbeddingStore
+
 logger = logging.getLogger(__name__)
 
 # Check if CUDA is available via onnxruntime
@@ -37,6 +39,8 @@ class GPUFaceRecognition:
     Falls back to CPU DNN if GPU initialization fails.
     """
     
+    FEATURE_SIZE = 80  # 64-bin histogram + 4x4 gradient grid (_extract_face_feature)
+    
     def __init__(self, config: Dict = None):
         self.config = config or {}
         self.database_path = self.config.get('database_path', 'data/faces_db.pkl')
@@ -47,6 +51,11 @@ class GPUFaceRecognition:
         self.use_fp16 = self.config.get('use_fp16', True)
         
         self.registered_faces: Dict[str, List[np.ndarray]] = {}
+        # Local database: memory-mapped feature store (replaces the pickled {'faces': ...} dict)
+        # Own base next to database_path: FaceEmbedding keeps 512-dim embeddings under faces_db.*
+        store_path = self.config.get('store_path',
+                                     os.path.join(os.path.dirname(self.database_path), 'faces_gpu_db'))
+        self.store = EmbeddingStore(store_path, self.FEATURE_SIZE)
         self.face_detector = None
         self.use_gpu = False
         self.frame_count = 0
@@ -82,15 +91,22 @@ class GPUFaceRecognition:
     
     def _load_database(self):
         """Load registered faces from database or folder"""
-        if os.path.exists(self.database_path):
+        # Migrate a legacy pickle database into the feature store once
+        if not self.store.exists and os.path.exists(self.database_path):
             try:
                 with open(self.database_path, 'rb') as f:
                     data = pickle.load(f)
-                    self.registered_faces = data.get('faces', {})
-                logger.info(f"📂 Loaded {len(self.registered_faces)} faces from database")
-                return
+                self.store.rewrite(data.get('faces', {}))
             except Exception as e:
-                logger.warning(f"Could not load database: {e}")
+                logger.warning(f"Could not migrate database: {e}")
+        
+        # Load from feature store (rows are views into the memory map)
+        if len(self.store) > 0:
+            self.registered_faces = {
+                person_id: data['embeddings'] for person_id, data in self.store.to_dict().items()
+            }
+            logger.info(f"📂 Loaded {len(self.registered_faces)} faces from database")
+            return
         
         self._scan_faces_folder()
     
@@ -121,16 +137,11 @@ class GPUFaceRecognition:
         self._save_database()
     
     def _save_database(self):
-        """Save registered faces to pickle file"""
-        try:
-            db_dir = os.path.dirname(self.database_path)
-            if db_dir:
-                os.makedirs(db_dir, exist_ok=True)
-            with open(self.database_path, 'wb') as f:
-                pickle.dump({'faces': self.registered_faces}, f)
+        """Save all registered faces to the feature store (full snapshot)"""
+        if self.store.rewrite(self.registered_faces):
             logger.info(f"💾 Saved database with {len(self.registered_faces)} faces")
-        except Exception as e:
-            logger.error(f"Could not save database: {e}")
+        else:
+            logger.error("Could not save database")
     
     def _extract_face_feature(self, image: np.ndarray) -> Optional[np.ndarray]:
         """Extract face feature using histogram + texture analysis"""
@@ -296,7 +307,7 @@ class GPUFaceRecognition:
         """Delete a registered face"""
         if person_id in self.registered_faces:
             del self.registered_faces[person_id]
-            self._save_database()
+            self.store.remove(person_id)
             logger.info(f"🗑️ Deleted face for {person_id}")
             return True
         return False
@@ -313,7 +324,7 @@ class GPUFaceRecognition:
             self.registered_faces[person_id] = []
         
         self.registered_faces[person_id].append(feature)
-        self._save_database()
+        self.store.append(person_id, feature)
         logger.info(f"✅ Registered face for {person_id}")
         return True
     
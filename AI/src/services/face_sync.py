@@ -0,0 +1,175 @@
+# face_sync.py
+# Incremental (delta) sync of face embeddings from the Backend API
+#
+# Protocol (GET /api/face/embeddings):
+#   - no parameter                 -> full snapshot
+#   - ?updatedSince=<cursor>       -> only MAYTE records changed since the cursor
+#   - ?encoding=float32|float16    -> binary embeddings (see embedding_codec.py)
+# Response: {success, data: [{maYTe, tenBenhNhan, embeddings: [{vector} | {vectorB64}]}],
+#            deleted: [maYTe, ...], cursor: "<opaque>", encoding: "float16"}
+# A response without `cursor` is treated as a full snapshot, so backends that
+# do not support delta sync keep working (every sync is then a full reload).
+# Likewise a response without `encoding` carries plain float lists
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import requests
+
+from .embedding_codec import WIRE_DTYPES, decode_embeddings
+from .face_gallery import normalize_embeddings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncBatch:
+    """One response of /api/face/embeddings, parsed"""
+    persons: Dict[str, Tuple[str, np.ndarray]]  # MAYTE -> (name, (N, D) normalized embeddings)
+    deleted: List[str] = field(default_factory=list)
+    cursor: Optional[str] = None
+    full: bool = True  # Full snapshot (replace everything) or delta (patch)
+
+
+class EmbeddingSyncClient:
+    """HTTP client for full / delta embedding downloads
+
+    encoding: requested wire format ("float32", "float16" or "json").
+    binary_supported becomes True once the backend has answered with a
+    binary encoding, which also enables binary uploads.
+    """
+
+    def __init__(self, backend_url: str, dim: int = 512, timeout: float = 10,
+                 encoding: str = 'float32'):
+        self.url = f"{backend_url}/api/face/embeddings"
+        self.dim = dim
+        self.timeout = timeout
+        self.encoding = encoding if encoding in WIRE_DTYPES else None
+        self.binary_supported = False
+        self.session = requests.Session()  # Keep-alive between scheduled syncs
+
+    def fetch(self, cursor: Optional[str] = None) -> Optional[SyncBatch]:
+        """Download a full snapshot (cursor=None) or the changes since `cursor`
+
+        Returns:
+            SyncBatch, or None if the backend is unavailable / rejected the request
+        """
+        params = {}
+        if cursor:
+            params['updatedSince'] = cursor
+        if self.encoding:
+            params['encoding'] = self.encoding
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        if response.status_code != 200:
+            logger.warning(f"Embedding sync returned {response.status_code}")
+            return None
+
+        data = response.json()
+        if not data.get('success'):
+            return None
+
+        encoding = data.get('encoding')
+        self.binary_supported = encoding in WIRE_DTYPES
+
+        persons = {}
+        for item in data.get('data') or []:
+            parsed = self._parse_person(item, encoding)
+            if parsed is not None:
+                persons[parsed[0]] = parsed[1:]
+            elif item.get('maYTe'):
+                persons[item['maYTe']] = (item.get('tenBenhNhan') or item['maYTe'], None)
+
+        new_cursor = data.get('cursor')
+        full = cursor is None or new_cursor is None or bool(data.get('full'))
+        deleted = [] if full else list(data.get('deleted') or [])
+        # A changed person without usable embeddings is a deletion
+        deleted += [mayte for mayte, (_, rows) in persons.items() if rows is None]
+        persons = {mayte: p for mayte, p in persons.items() if p[1] is not None}
+        return SyncBatch(persons, deleted, new_cursor, full)
+
+    def _parse_person(self, item: Dict, encoding: Optional[str]) -> Optional[Tuple[str, str, np.ndarray]]:
+        mayte = item.get('maYTe')
+        if not mayte:
+            return None
+        embeddings = item.get('embeddings') or []
+        rows = []
+
+        blobs = [e['vectorB64'] for e in embeddings if e.get('vectorB64')]
+        if blobs and encoding in WIRE_DTYPES:
+            try:
+                rows.append(decode_embeddings(blobs, encoding, self.dim))
+            except ValueError as e:
+                logger.warning(f"Skipped embeddings of {mayte}: {e}")
+
+        vectors = [e.get('vector') for e in embeddings]
+        vectors = [v for v in vectors if v and len(v) == self.dim]
+        if vectors:
+            rows.append(np.array(vectors, dtype=np.float32))
+
+        if not rows:
+            return None
+        rows = normalize_embeddings(np.concatenate(rows))
+        return mayte, item.get('tenBenhNhan') or mayte, rows
+
+
+def apply_sync_batch(batch: SyncBatch, registered_faces: Dict, gallery, store) -> Tuple[Dict, int]:
+    """Apply a sync batch to registered_faces, the FaceGallery and the EmbeddingStore
+
+    A full batch rebuilds everything; a delta batch removes the deleted and
+    changed persons in one gallery compaction, then appends the new rows.
+
+    Returns:
+        (registered_faces, number of persons changed or deleted)
+    """
+    if batch.full:
+        faces = {
+            mayte: {'name': name, 'embeddings': list(rows)}
+            for mayte, (name, rows) in batch.persons.items()
+        }
+        gallery.rebuild(faces)
+        store.rewrite(faces)
+        return faces, len(faces)
+
+    changed = [m for m in batch.deleted if m in registered_faces] + list(batch.persons)
+    if not changed:
+        return registered_faces, 0
+
+    gallery.remove_many(changed)
+    for mayte in changed:
+        registered_faces.pop(mayte, None)
+    for mayte, (name, rows) in batch.persons.items():
+        registered_faces[mayte] = {'name': name, 'embeddings': list(rows)}
+        gallery.add(mayte, rows)
+
+    # Large deltas: one snapshot is cheaper than many log entries
+    if len(changed) > max(1000, len(registered_faces) // 4):
+        store.rewrite(registered_faces)
+    else:
+        for mayte in changed:
+            store.remove(mayte)
+        for mayte, (name, rows) in batch.persons.items():
+            store.append(mayte, rows, name)
+    return registered_faces, len(changed)
+
+
+def load_cursor(path: str) -> Optional[str]:
+    """Sync cursor saved next to the local cache (None = full sync needed)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('cursor')
+    except (OSError, ValueError):
+        return None
+
+
+def save_cursor(path: str, cursor: Optional[str]):
+    try:
+        if cursor is None:
+            Path(path).unlink(missing_ok=True)
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'cursor': cursor}, f)
+    except OSError as e:
+        logger.warning(f"Failed to save sync cursor: {e}")
@@ -0,0 +1,111 @@
+# facenet_engine.py
+# Preloaded Facenet512 inference engine
+# The model is loaded once and called directly on a preprocessed batch,
+# instead of going through DeepFace.represent (generic preprocessing and
+# model lookup on every call, temp JPEG fallback)
+#
+# Backends:
+#   - keras: DeepFace's Facenet512 Keras model (weights downloaded by DeepFace)
+#   - onnx:  ONNX Runtime CPU session over an exported model (no TensorFlow needed)
+#            export once with: python tools/benchmark_face_embedding.py --export-onnx models/facenet512.onnx
+
+import logging
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class FacenetEngine:
+    """
+    Facenet512 embeddings for BGR face crops.
+
+    Preprocessing matches DeepFace.represent with detector_backend='skip':
+    crops smaller than 160px are stretched to 160x160, larger ones are
+    resized keeping the aspect ratio and padded with black, pixels are BGR
+    scaled to [0, 1]. Output embeddings are L2-normalized.
+    """
+
+    INPUT_SIZE = 160
+    EMBEDDING_SIZE = 512
+    MIN_FACE_SIZE = 20
+
+    def __init__(self, backend: str = 'keras', onnx_path: Optional[str] = None, batch_size: int = 8):
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.model = None  # Keras model
+        self.session = None  # ONNX Runtime session
+        self._input_name = None
+
+        if backend == 'keras':
+            self._load_keras()
+        elif backend == 'onnx':
+            self._load_onnx(onnx_path)
+        else:
+            raise ValueError(f"Unknown Facenet backend: {backend}")
+
+    def _load_keras(self):
+        from deepface import DeepFace
+        client = DeepFace.build_model('Facenet512')
+        self.model = getattr(client, 'model', client)  # Newer DeepFace wraps the Keras model
+        logger.info("✅ Facenet512 engine loaded (Keras)")
+
+    def _load_onnx(self, onnx_path: Optional[str]):
+        import onnxruntime as ort
+        if not onnx_path or not Path(onnx_path).exists():
+            raise FileNotFoundError(f"ONNX model not found: {onnx_path}")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=['CPUExecutionProvider'])
+        self._input_name = self.session.get_inputs()[0].name
+        logger.info(f"✅ Facenet512 engine loaded (ONNX Runtime CPU: {onnx_path})")
+
+    def preprocess(self, face_imgs: List[np.ndarray]) -> np.ndarray:
+        """Face crops (BGR uint8) -> (N, 160, 160, 3) float32 model input"""
+        size = self.INPUT_SIZE
+        batch = np.zeros((len(face_imgs), size, size, 3), dtype=np.uint8)
+        for i, face_img in enumerate(face_imgs):
+            h, w = face_img.shape[:2]
+            if h < size or w < size:
+                batch[i] = cv2.resize(face_img, (size, size))
+                continue
+            factor = min(size / h, size / w)
+            rh, rw = max(1, int(h * factor)), max(1, int(w * factor))
+            top, left = (size - rh) // 2, (size - rw) // 2
+            batch[i, top:top + rh, left:left + rw] = cv2.resize(face_img, (rw, rh))
+        # One conversion + scale for the whole batch
+        return np.multiply(batch, np.float32(1.0 / 255.0), dtype=np.float32)
+
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        if self.session is not None:
+            return self.session.run(None, {self._input_name: batch})[0]
+        return np.asarray(self.model(batch, training=False))
+
+    def embed(self, face_imgs: List[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Embed face crops, batch_size per forward pass (None for crops that are too small)"""
+        embeddings: List[Optional[np.ndarray]] = [None] * len(face_imgs)
+        valid = [i for i, f in enumerate(face_imgs)
+                 if f.shape[0] >= self.MIN_FACE_SIZE and f.shape[1] >= self.MIN_FACE_SIZE]
+        for start in range(0, len(valid), self.batch_size):
+            chunk = valid[start:start + self.batch_size]
+            output = np.asarray(self._forward(self.preprocess([face_imgs[i] for i in chunk])), dtype=np.float32)
+            output /= np.linalg.norm(output, axis=1, keepdims=True) + 1e-6
+            for i, embedding in zip(chunk, output):
+                embeddings[i] = embedding
+        return embeddings
+
+    def embed_one(self, face_img: np.ndarray) -> Optional[np.ndarray]:
+        return self.embed([face_img])[0]
+
+    def export_onnx(self, path: str):
+        """Export the Keras model to ONNX (requires tf2onnx)"""
+        import tensorflow as tf
+        import tf2onnx
+        if self.model is None:
+            raise RuntimeError("ONNX export needs the Keras backend")
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        spec = [tf.TensorSpec((None, self.INPUT_SIZE, self.INPUT_SIZE, 3), tf.float32, name='input')]
+        tf2onnx.convert.from_keras(self.model, input_signature=spec, output_path=str(path))
+        logger.info(f"💾 Exported Facenet512 to ONNX: {path}")
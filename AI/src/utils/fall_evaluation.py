@@ -0,0 +1,102 @@
+"""
+Evaluation helpers for fall detection on labelled videos
+
+Labels file (JSON or YAML), paths relative to the labels file:
+
+    videos/fall_01.mp4:
+      falls: [12.4]        # Ground-truth fall times (s, video PTS)
+      lying: [15.0]        # Optional: times a lying alert is expected
+    videos/walk_02.mp4:
+      falls: []            # Negative video
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import yaml
+
+
+def load_labels(labels_path: str) -> Dict[str, Dict[str, List[float]]]:
+    """{absolute video path: {'falls': [...], 'lying': [...]}}"""
+    path = Path(labels_path)
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f) if path.suffix == '.json' else yaml.safe_load(f)
+    labels = {}
+    for video, entry in (raw or {}).items():
+        video_path = Path(video)
+        if not video_path.is_absolute():
+            video_path = path.parent / video_path
+        entry = entry or {}
+        labels[str(video_path)] = {
+            'falls': sorted(float(t) for t in entry.get('falls', [])),
+            'lying': sorted(float(t) for t in entry.get('lying', [])),
+        }
+    return labels
+
+
+@dataclass
+class EventMatch:
+    """Detections of one kind matched against ground truth"""
+    tp: int = 0
+    fp: int = 0
+    fn: int = 0
+    duplicates: int = 0  # Extra detections of an already detected event
+    latencies: List[float] = field(default_factory=list)  # detection - label (s), true positives only
+
+    def __iadd__(self, other: 'EventMatch') -> 'EventMatch':
+        self.tp += other.tp
+        self.fp += other.fp
+        self.fn += other.fn
+        self.duplicates += other.duplicates
+        self.latencies.extend(other.latencies)
+        return self
+
+
+def match_events(detections: List[float], labels: List[float],
+                 tolerance: float = 3.0, lead: float = 1.0) -> EventMatch:
+    """
+    Match detection times to label times.
+
+    A detection in [label - lead, label + tolerance] detects that label; the
+    first one counts as a true positive, later ones as duplicates. Detections
+    matching no label are false positives, undetected labels false negatives.
+    """
+    match = EventMatch()
+    detected = [False] * len(labels)
+    for t in sorted(detections):
+        candidates = [i for i, label in enumerate(labels) if label - lead <= t <= label + tolerance]
+        if not candidates:
+            match.fp += 1
+            continue
+        pending = [i for i in candidates if not detected[i]]
+        if not pending:
+            match.duplicates += 1
+            continue
+        i = pending[0]
+        detected[i] = True
+        match.tp += 1
+        match.latencies.append(t - labels[i])
+    match.fn = detected.count(False)
+    return match
+
+
+def summarize(match: EventMatch) -> Dict[str, float]:
+    """Precision / recall / F1 and detection latency statistics"""
+    precision = match.tp / (match.tp + match.fp) if match.tp + match.fp else 0.0
+    recall = match.tp / (match.tp + match.fn) if match.tp + match.fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    latencies = np.asarray(match.latencies, dtype=np.float64)
+    return {
+        'tp': match.tp,
+        'fp': match.fp,
+        'fn': match.fn,
+        'duplicates': match.duplicates,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'latency_mean': float(latencies.mean()) if len(latencies) else None,
+        'latency_p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+        'latency_p90': float(np.percentile(latencies, 90)) if len(latencies) else None,
+    }
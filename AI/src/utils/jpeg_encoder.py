@@ -0,0 +1,41 @@
+"""
+Background JPEG encoder pool for alert evidence frames
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class JPEGEncoderPool:
+    """
+    Encode frames to JPEG on worker threads.
+
+    submit() only hands the frame reference to the pool and returns a Future
+    of the JPEG bytes (None if encoding failed). The caller must not modify
+    the frame afterwards. Threads are started on the first submit, so a pool
+    that never receives a frame (e.g. cached-pose replays) costs nothing.
+    cv2.imencode releases the GIL, so encoding runs in parallel with the
+    detection thread.
+    """
+
+    def __init__(self, workers: int = 1, quality: int = 95):
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jpeg-encoder')
+
+    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            logger.warning("⚠️ JPEG encoding of evidence frame failed")
+            return None
+        return buffer.tobytes()
+
+    def submit(self, frame: np.ndarray) -> Future:
+        return self._executor.submit(self._encode, frame)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
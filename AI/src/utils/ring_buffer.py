@@ -0,0 +1,50 @@
+"""
+Fixed-capacity NumPy ring buffer for per-frame time series
+"""
+
+from typing import Optional
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated float64 history, oldest samples overwritten.
+
+    Every row is written twice (at i and i + capacity), so the n most recent
+    rows are always one contiguous slice: last(n) is a zero-copy view in
+    chronological order, ready for vectorized window statistics.
+    Missing values are stored as NaN.
+    """
+
+    def __init__(self, capacity: int, width: Optional[int] = None):
+        self.capacity = capacity
+        shape = (2 * capacity,) if width is None else (2 * capacity, width)
+        self._data = np.full(shape, np.nan, dtype=np.float64)
+        self._next = 0  # Slot of the next write, in [0, capacity)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._data[self._next + self.capacity] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def set_last(self, column: int, value: float):
+        """Overwrite one column of the most recent row"""
+        slot = (self._next - 1) % self.capacity
+        self._data[slot, column] = value
+        self._data[slot + self.capacity, column] = value
+
+    def last(self, n: Optional[int] = None) -> np.ndarray:
+        """The n most recent rows (all by default), oldest first - a view, do not modify"""
+        n = self._count if n is None else min(n, self._count)
+        end = self._next + self.capacity
+        return self._data[end - n:end]
+
+    def clear(self):
+        self._data.fill(np.nan)
+        self._next = 0
+        self._count = 0
@@ -127,8 +127,10 @@ def test_fall_detection(video_path, debug=False, save_output=False):
             
             frame_count += 1
             
-            # Process frame với fall detector
-            result = fall_detector.process_frame(frame)
+            # Process frame với fall detector - thời gian theo PTS của video, không theo đồng hồ
+            # (tốc độ / cooldown / thời gian nằm đúng như chạy realtime dù xử lý nhanh hay chậm)
+            pts = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 or (frame_count - 1) / fps
+            result = fall_detector.process_frame(frame, timestamp=pts)
             annotated_frame = result.get('annotated_frame', frame)
             state = result.get('state', 'unknown')
             
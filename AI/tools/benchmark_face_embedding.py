@@ -0,0 +1,114 @@
+"""
+Benchmark Face Embedding
+So sánh latency mỗi khuôn mặt: DeepFace.represent (cách cũ) vs FacenetEngine (Keras / ONNX Runtime)
+
+Sử dụng:
+  python tools/benchmark_face_embedding.py --faces 64 --batch 1 4 8
+  python tools/benchmark_face_embedding.py --export-onnx models/facenet512.onnx
+  python tools/benchmark_face_embedding.py --onnx models/facenet512.onnx
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.services.facenet_engine import FacenetEngine
+
+
+def make_faces(count: int, seed: int):
+    """Synthetic BGR face crops of mixed sizes (as cropped from a camera frame)"""
+    rng = np.random.default_rng(seed)
+    faces = []
+    for _ in range(count):
+        h, w = rng.integers(80, 240), rng.integers(70, 200)
+        faces.append(rng.integers(0, 255, (h, w, 3), dtype=np.uint8))
+    return faces
+
+
+def deepface_represent(face_img: np.ndarray) -> np.ndarray:
+    """Current path of FaceEmbedding._extract_embedding (one DeepFace.represent per face)"""
+    import cv2
+    from deepface import DeepFace
+    if face_img.shape[0] < 160 or face_img.shape[1] < 160:
+        face_img = cv2.resize(face_img, (160, 160))
+    result = DeepFace.represent(img_path=face_img, model_name='Facenet512',
+                                enforce_detection=False, detector_backend='skip')
+    embedding = np.array(result[0]['embedding'], dtype=np.float32)
+    return embedding / (np.linalg.norm(embedding) + 1e-6)
+
+
+def time_per_face(fn, faces, repeat: int):
+    """Median per-face latency (ms) over `repeat` runs, and the outputs of the last run"""
+    runs = []
+    outputs = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        outputs = fn(faces)
+        runs.append((time.perf_counter() - start) * 1000 / len(faces))
+    return float(np.median(runs)), outputs
+
+
+def report(name, latency, outputs, reference, baseline):
+    line = f"   {name:<24} {latency:8.2f} ms/face"
+    if baseline:
+        line += f"   speedup={baseline / latency:5.1f}x"
+    if reference is not None:
+        cos = [float(np.dot(a, b)) for a, b in zip(outputs, reference)]
+        line += f"   min cos vs DeepFace={min(cos):.4f}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Facenet512 per-face latency')
+    parser.add_argument('--faces', type=int, default=32, help='Số khuôn mặt giả lập')
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--onnx', type=str, default=None, help='Đường dẫn model ONNX (backend onnx)')
+    parser.add_argument('--export-onnx', type=str, default=None, help='Xuất model Keras sang ONNX rồi thoát')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        FacenetEngine('keras').export_onnx(args.export_onnx)
+        print(f"✅ Exported: {args.export_onnx}")
+        return
+
+    print("=" * 60)
+    print("Face Embedding Benchmark (Facenet512)")
+    print("=" * 60)
+    faces = make_faces(args.faces, args.seed)
+
+    reference, baseline = None, None
+    try:
+        deepface_represent(faces[0])  # Warm-up (model load)
+        baseline, reference = time_per_face(lambda fs: [deepface_represent(f) for f in fs], faces, args.repeat)
+        report("DeepFace.represent", baseline, reference, None, None)
+    except ImportError:
+        print("   DeepFace not installed - skipping current path")
+
+    backends = []
+    try:
+        backends.append(('keras', FacenetEngine('keras')))
+    except Exception as e:
+        print(f"   Keras engine unavailable: {e}")
+    if args.onnx:
+        try:
+            backends.append(('onnx', FacenetEngine('onnx', args.onnx)))
+        except Exception as e:
+            print(f"   ONNX engine unavailable: {e}")
+
+    for name, engine in backends:
+        engine.embed(faces[:1])  # Warm-up
+        for batch_size in args.batch:
+            engine.batch_size = batch_size
+            latency, outputs = time_per_face(engine.embed, faces, args.repeat)
+            report(f"{name} engine (batch={batch_size})", latency, outputs, reference, baseline)
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
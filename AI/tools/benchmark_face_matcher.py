@@ -0,0 +1,99 @@
+"""
+Benchmark Face Matcher
+So sánh recall và latency của IVF index với exact matcher trên dữ liệu giả lập
+
+Sử dụng:
+  python tools/benchmark_face_matcher.py --persons 50000 --per-person 3
+  python tools/benchmark_face_matcher.py --persons 100000 --nprobe 4 8 16
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.services.ann_index import IVFIndex
+from src.services.face_gallery import FaceGallery
+
+
+def make_gallery_data(persons: int, per_person: int, dim: int, noise: float, seed: int):
+    """Synthetic embeddings: one random center per person + noisy samples around it"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((persons, dim)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    samples = centers[:, None, :] + noise * rng.standard_normal((persons, per_person, dim)).astype(np.float32) / np.sqrt(dim)
+    return centers, samples
+
+
+def make_queries(centers: np.ndarray, count: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed + 1)
+    targets = rng.choice(len(centers), count, replace=False if count <= len(centers) else True)
+    dim = centers.shape[1]
+    queries = centers[targets] + noise * rng.standard_normal((count, dim)).astype(np.float32) / np.sqrt(dim)
+    return queries
+
+
+def time_matches(gallery: FaceGallery, queries: np.ndarray):
+    """Return (results, per-query latencies in ms)"""
+    results = []
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(gallery.match(q))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark IVF vs exact face matcher')
+    parser.add_argument('--persons', type=int, default=20000, help='Số bệnh nhân (MAYTE) giả lập')
+    parser.add_argument('--per-person', type=int, default=3, help='Số embedding mỗi người')
+    parser.add_argument('--queries', type=int, default=500, help='Số truy vấn')
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--noise', type=float, default=0.6, help='Độ nhiễu giữa các embedding cùng người')
+    parser.add_argument('--nlist', type=int, default=None, help='Số cụm IVF (mặc định ~sqrt(N))')
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Face Matcher Benchmark (exact vs IVF)")
+    print("=" * 60)
+
+    centers, samples = make_gallery_data(args.persons, args.per_person, args.dim, args.noise, args.seed)
+    queries = make_queries(centers, args.queries, args.noise, args.seed)
+
+    exact = FaceGallery(args.dim)
+    start = time.perf_counter()
+    for i in range(args.persons):
+        exact.add(f"BN{i:07d}", samples[i])
+    print(f"📦 Gallery: {args.persons} persons, {len(exact)} embeddings "
+          f"(build {time.perf_counter() - start:.2f}s)")
+
+    exact_results, exact_lat = time_matches(exact, queries)
+    print(f"\n🎯 Exact:  p50={np.percentile(exact_lat, 50):.3f}ms  p95={np.percentile(exact_lat, 95):.3f}ms")
+
+    index = IVFIndex(args.dim, nlist=args.nlist, min_train_size=0)
+    ivf = FaceGallery(args.dim, index=index)
+    for i in range(args.persons):
+        ivf.add(f"BN{i:07d}", samples[i])
+    start = time.perf_counter()
+    ivf.refresh_index()
+    print(f"🗂️ IVF train: {time.perf_counter() - start:.2f}s ({len(index.centroids)} lists)")
+
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        ivf_results, ivf_lat = time_matches(ivf, queries)
+        recall = np.mean([a[0] == b[0] for a, b in zip(ivf_results, exact_results)])
+        speedup = np.median(exact_lat) / max(np.median(ivf_lat), 1e-9)
+        print(f"   nprobe={nprobe:3d}: recall@1={recall * 100:.1f}%  "
+              f"p50={np.percentile(ivf_lat, 50):.3f}ms  p95={np.percentile(ivf_lat, 95):.3f}ms  "
+              f"speedup={speedup:.1f}x")
+
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark Face Sync
+Đo chi phí đồng bộ embeddings: full download vs delta sync (fake backend cục bộ)
+
+Sử dụng:
+  python tools/benchmark_face_sync.py --patients 100000 --changes 100
+  python tools/benchmark_face_sync.py --patients 100000 --encoding json float32 float16
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.services.embedding_store import EmbeddingStore
+from src.services.face_gallery import FaceGallery
+from src.services.face_sync import EmbeddingSyncClient, apply_sync_batch
+from tools.fake_backend import FakeFaceBackend, create_app
+
+
+def timed_sync(client, cursor, faces, gallery, store):
+    start = time.perf_counter()
+    batch = client.fetch(cursor)
+    fetched = time.perf_counter()
+    faces, changed = apply_sync_batch(batch, faces, gallery, store)
+    done = time.perf_counter()
+    return batch, faces, changed, (fetched - start) * 1000, (done - fetched) * 1000
+
+
+def payload_size(url: str, encoding: str) -> int:
+    """Bytes of one full snapshot response"""
+    params = {'encoding': encoding} if encoding != 'json' else None
+    return len(requests.get(url, params=params, timeout=600).content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark full vs delta face embedding sync')
+    parser.add_argument('--patients', type=int, default=100000, help='Số bệnh nhân giả lập')
+    parser.add_argument('--per-person', type=int, default=1)
+    parser.add_argument('--changes', type=int, default=100, help='Số bệnh nhân thay đổi mỗi vòng delta')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--encoding', nargs='+', default=['float16'],
+                        help='Định dạng embedding: json, float32, float16')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Face Sync Benchmark (full vs delta)")
+    print("=" * 60)
+
+    backend = FakeFaceBackend(args.patients, args.per_person, args.dim)
+    server = make_server('127.0.0.1', args.port, create_app(backend), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    for encoding in args.encoding:
+        size = payload_size(f"{base_url}/api/face/embeddings", encoding)
+        print(f"\n[{encoding}] full snapshot: {size / 1e6:.1f} MB")
+        client = EmbeddingSyncClient(base_url, args.dim, timeout=600, encoding=encoding)
+        with tempfile.TemporaryDirectory() as tmp:
+            store = EmbeddingStore(str(Path(tmp) / 'faces_db'), args.dim)
+            gallery = FaceGallery(args.dim)
+
+            batch, faces, changed, fetch_ms, apply_ms = timed_sync(client, None, {}, gallery, store)
+            print(f"📦 Full sync: {changed} patients  fetch={fetch_ms:.0f}ms  apply={apply_ms:.0f}ms")
+
+            cursor = batch.cursor
+            for i in range(args.rounds):
+                changes = args.changes
+                backend.mutate(update=changes - changes // 10, delete=changes // 10, add=changes // 10)
+                batch, faces, changed, fetch_ms, apply_ms = timed_sync(client, cursor, faces, gallery, store)
+                cursor = batch.cursor
+                print(f"🔄 Delta #{i + 1}: {changed} patients  fetch={fetch_ms:.1f}ms  apply={apply_ms:.1f}ms  "
+                      f"(gallery: {gallery.person_count} patients)")
+
+            assert gallery.person_count == len(backend.vectors), "gallery out of sync with backend"
+            print(f"✅ Gallery matches backend: {gallery.person_count} patients")
+
+    server.shutdown()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Evaluate Videos
+Đánh giá YOLOFallDetector trên thư mục video có nhãn - headless, song song nhiều process
+
+Mỗi worker process load một model YOLO riêng và xử lý trọn từng video (không
+imshow, không chờ phím, log ở mức WARNING). Kết quả là báo cáo JSON gồm fps
+từng video, phân vị độ trễ từng bước (decode / motion / pose / logic), các frame
+phát hiện té ngã và độ chính xác so với nhãn. Dùng làm cổng kiểm tra regression
+và hiệu năng trước khi triển khai model hoặc config mới.
+
+File nhãn mặc định: <thư_mục_video>/labels.yaml (định dạng như sweep_thresholds.py).
+Video không có nhãn vẫn được đo hiệu năng, nhưng không tính độ chính xác.
+
+Sử dụng:
+  python tools/evaluate_videos.py data/eval_videos
+  python tools/evaluate_videos.py data/eval_videos --workers 2 --output report.json
+  python tools/evaluate_videos.py data/eval_videos --min-f1 0.9 --min-fps 15   # exit 1 nếu không đạt
+  python tools/evaluate_videos.py data/eval_videos --roi on    # So sánh chế độ ROI (crop quanh người) với --roi off
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.core.yolo_fall_detector import YOLOFallDetector
+from src.core.video_replay import VideoReplay
+from src.utils.fall_evaluation import EventMatch, load_labels, match_events, summarize
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+STAGES = ('decode', 'motion', 'pose', 'logic', 'total')
+
+# Worker state: one detector (and YOLO model) per process
+_detector = None
+
+
+def _init_worker(config: dict):
+    global _detector
+    logging.disable(logging.WARNING)
+    _detector = YOLOFallDetector(config)
+
+
+def latency_stats(samples_ms: np.ndarray) -> dict:
+    """mean / p50 / p90 / p99 / max in milliseconds"""
+    if len(samples_ms) == 0:
+        return {'mean': None, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+    p50, p90, p99 = np.percentile(samples_ms, [50, 90, 99])
+    return {'mean': float(samples_ms.mean()), 'p50': float(p50), 'p90': float(p90),
+            'p99': float(p99), 'max': float(samples_ms.max())}
+
+
+def _evaluate_video(video_path: str, max_frames: int = None) -> dict:
+    """Run the detector stage by stage over one video, timing every stage"""
+    detector = _detector
+    if detector.model is None:
+        raise RuntimeError("YOLO model not available in worker (is ultralytics installed?)")
+    detector.reset()
+    if detector.roi is not None:
+        detector.roi.reset_stats()  # Per-video ROI counters
+
+    replay = VideoReplay(video_path, max_frames=max_frames)
+    frames = replay.frame_count if max_frames is None else min(replay.frame_count, max_frames)
+    timings = np.zeros((max(frames, 1), len(STAGES)), dtype=np.float32)
+    falls, lying = [], []
+
+    index = -1
+    start = time.perf_counter()
+    t0 = start
+    for index, frame, timestamp in replay:
+        if index >= len(timings):  # Container under-reported its frame count
+            timings = np.concatenate([timings, np.zeros_like(timings)])
+        t1 = time.perf_counter()
+        motion = detector._detect_motion_magnitude(frame) if detector.use_motion_fallback else 0.0
+        t2 = time.perf_counter()
+        boxes, keypoints = detector.detect(frame, timestamp)  # Crops around tracked persons in ROI mode
+        t3 = time.perf_counter()
+        result = detector.update(boxes, keypoints, timestamp, frame.shape[:2], motion, frame)
+        t4 = time.perf_counter()
+        timings[index] = (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t4 - t0)
+        t0 = t4
+
+        for kind, events in (('fall', result['fall_events']), ('lying', result['lying_events'])):
+            for event in events:
+                (falls if kind == 'fall' else lying).append({
+                    'frame': index,
+                    'timestamp': round(event.timestamp, 3),
+                    'track_id': event.track_id,
+                    'confidence': round(float(event.confidence), 3),
+                })
+    elapsed = time.perf_counter() - start
+    processed = index + 1
+    timings = timings[:processed] * 1000.0
+
+    return {
+        'video': video_path,
+        'frames': processed,
+        'resolution': [replay.width, replay.height],
+        'video_fps': replay.fps,
+        'seconds': round(elapsed, 3),
+        'fps': processed / elapsed if elapsed > 0 else 0.0,
+        'latency_ms': {stage: latency_stats(timings[:, i]) for i, stage in enumerate(STAGES)},
+        'falls': falls,
+        'lying': lying,
+        'roi': detector.roi.get_stats() if detector.roi is not None else None,
+        '_timings': timings,  # Pooled into the summary, dropped from the report
+    }
+
+
+def find_videos(video_dir: Path) -> list:
+    return sorted(str(p) for p in video_dir.rglob('*') if p.suffix.lower() in VIDEO_EXTENSIONS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless parallel fall detection evaluation')
+    parser.add_argument('video_dir', help='Thư mục video cần đánh giá')
+    parser.add_argument('--labels', type=str, default=None, help='File nhãn (mặc định <video_dir>/labels.yaml)')
+    parser.add_argument('--config', type=str, default=str(Path(__file__).parent.parent / 'config' / 'config.yaml'))
+    parser.add_argument('--workers', type=int, default=min(2, os.cpu_count() or 1),
+                        help='Số process (mỗi process một model YOLO)')
+    parser.add_argument('--max-frames', type=int, default=None, help='Giới hạn frame mỗi video')
+    parser.add_argument('--tolerance', type=float, default=3.0, help='Phát hiện chậm tối đa sau nhãn (giây)')
+    parser.add_argument('--lead', type=float, default=1.0, help='Phát hiện sớm tối đa trước nhãn (giây)')
+    parser.add_argument('--output', type=str, default='evaluation_report.json')
+    parser.add_argument('--min-f1', type=float, default=None, help='Exit 1 nếu F1 té ngã thấp hơn')
+    parser.add_argument('--min-fps', type=float, default=None, help='Exit 1 nếu fps trung bình thấp hơn')
+    parser.add_argument('--roi', choices=['on', 'off'], default=None,
+                        help='Bật / tắt chế độ ROI (mặc định theo config fall_detection.roi.enabled)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    video_dir = Path(args.video_dir)
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f).get('fall_detection', {})
+    if args.roi:
+        config['roi'] = {**config.get('roi', {}), 'enabled': args.roi == 'on'}
+
+    labels_path = Path(args.labels) if args.labels else video_dir / 'labels.yaml'
+    labels = load_labels(str(labels_path)) if labels_path.exists() else {}
+    labels = {str(Path(video).resolve()): entry for video, entry in labels.items()}
+    videos = find_videos(video_dir)
+    if not videos:
+        raise SystemExit(f"❌ No videos in {video_dir}")
+
+    print("=" * 60)
+    print(f"Fall Detection Evaluation: {len(videos)} videos, {len(labels)} labelled, {args.workers} workers")
+    print("=" * 60)
+
+    results, errors = [], []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(config,)) as executor:
+        futures = {executor.submit(_evaluate_video, video, args.max_frames): video for video in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                errors.append({'video': video, 'error': str(e)})
+                print(f"❌ {Path(video).name}: {e}")
+                continue
+            results.append(result)
+            print(f"🎞️ {Path(video).name}: {result['frames']} frames, {result['fps']:.1f} fps, "
+                  f"{len(result['falls'])} falls, {len(result['lying'])} lying")
+    wall = time.perf_counter() - start
+
+    # Accuracy against ground truth
+    fall_total, lying_total = EventMatch(), EventMatch()
+    for result in sorted(results, key=lambda r: r['video']):
+        truth = labels.get(str(Path(result['video']).resolve()))
+        if truth is None:
+            result['accuracy'] = None
+            continue
+        fall_match = match_events([e['timestamp'] for e in result['falls']], truth['falls'],
+                                  args.tolerance, args.lead)
+        lying_match = match_events([e['timestamp'] for e in result['lying']], truth['lying'],
+                                   args.tolerance, args.lead)
+        fall_total += fall_match
+        if truth['lying']:
+            lying_total += lying_match
+        result['accuracy'] = {'labels': truth, 'falls': summarize(fall_match), 'lying': summarize(lying_match)}
+
+    all_timings = np.concatenate([r.pop('_timings') for r in results]) if results else np.zeros((0, len(STAGES)))
+    frames = sum(r['frames'] for r in results)
+    summary = {
+        'videos': len(results),
+        'errors': len(errors),
+        'frames': frames,
+        'wall_seconds': round(wall, 3),
+        'throughput_fps': frames / wall if wall > 0 else 0.0,  # All workers together
+        'mean_video_fps': float(np.mean([r['fps'] for r in results])) if results else 0.0,
+        'latency_ms': {stage: latency_stats(all_timings[:, i]) for i, stage in enumerate(STAGES)},
+        'falls': summarize(fall_total) if labels else None,
+        'lying': summarize(lying_total) if labels else None,
+    }
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'config': str(args.config),
+        'inference': YOLOFallDetector(config, load_model=False).inference_settings(),
+        'roi': config.get('roi'),
+        'match': {'tolerance': args.tolerance, 'lead': args.lead},
+        'summary': summary,
+        'videos': sorted(results, key=lambda r: r['video']),
+        'errors': errors,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print("=" * 60)
+    pose = summary['latency_ms']['pose']
+    total = summary['latency_ms']['total']
+    print(f"Frames: {frames} in {wall:.1f}s ({summary['throughput_fps']:.1f} fps total, "
+          f"{summary['mean_video_fps']:.1f} fps per video)")
+    if total['p50'] is not None:
+        print(f"Latency: pose p50={pose['p50']:.1f}ms p90={pose['p90']:.1f}ms | "
+              f"frame p50={total['p50']:.1f}ms p99={total['p99']:.1f}ms")
+    if summary['falls']:
+        m = summary['falls']
+        print(f"Falls: precision={m['precision']:.2f} recall={m['recall']:.2f} f1={m['f1']:.2f} "
+              f"(TP={m['tp']} FP={m['fp']} FN={m['fn']})")
+    print(f"💾 Report: {args.output}")
+
+    failed = bool(errors)
+    if args.min_f1 is not None and (summary['falls'] is None or summary['falls']['f1'] < args.min_f1):
+        print(f"❌ F1 below {args.min_f1}")
+        failed = True
+    if args.min_fps is not None and summary['mean_video_fps'] < args.min_fps:
+        print(f"❌ fps below {args.min_fps}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Fake Backend (stand-in cho HospitalVision.API khi test / benchmark)
+Phục vụ /api/face/embeddings với dữ liệu giả lập (full + delta theo cursor,
+float list hoặc base64 float32/float16 theo tham số encoding)
+
+Sử dụng:
+  python tools/fake_backend.py --patients 100000 --port 5055
+  curl -X POST localhost:5055/fake/mutate -d '{"update": 100, "delete": 10, "add": 50}'
+"""
+
+import sys
+import json
+import argparse
+import threading
+from pathlib import Path
+import numpy as np
+from flask import Flask, Response, request, jsonify
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.services.embedding_codec import WIRE_DTYPES, decode_embedding, encode_embedding
+
+
+class FakeFaceBackend:
+    """In-memory patients with a version counter (cursor = version of the last change)"""
+
+    def __init__(self, patients: int = 1000, per_person: int = 1, dim: int = 512, seed: int = 0):
+        self.dim = dim
+        self.per_person = per_person
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.version = 0
+        self.next_id = 0
+        self.vectors = {}  # MAYTE -> (per_person, dim) float32
+        self.updated = {}  # MAYTE -> version of last change
+        self.deleted = {}  # MAYTE -> version of deletion
+        for _ in range(patients):
+            self._add_patient()
+
+    def _random_vectors(self) -> np.ndarray:
+        vectors = self.rng.standard_normal((self.per_person, self.dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def _add_patient(self):
+        mayte = f"BN{self.next_id:07d}"
+        self.next_id += 1
+        self.vectors[mayte] = self._random_vectors()
+        self.updated[mayte] = self.version
+        self.deleted.pop(mayte, None)
+
+    def mutate(self, update: int = 0, delete: int = 0, add: int = 0) -> int:
+        """Change random patients; returns the new version"""
+        with self.lock:
+            self.version += 1
+            ids = list(self.vectors)
+            picked = self.rng.choice(len(ids), min(update + delete, len(ids)), replace=False)
+            for i in picked[:update]:
+                self.vectors[ids[i]] = self._random_vectors()
+                self.updated[ids[i]] = self.version
+            for i in picked[update:]:
+                del self.vectors[ids[i]]
+                del self.updated[ids[i]]
+                self.deleted[ids[i]] = self.version
+            for _ in range(add):
+                self._add_patient()
+            return self.version
+
+    def save(self, mayte: str, vector: np.ndarray):
+        """Append one uploaded embedding (POST /api/face/embeddings)"""
+        with self.lock:
+            self.version += 1
+            vectors = self.vectors.get(mayte, np.zeros((0, self.dim), dtype=np.float32))
+            self.vectors[mayte] = np.vstack([vectors, vector[np.newaxis, :]])
+            self.updated[mayte] = self.version
+            self.deleted.pop(mayte, None)
+
+    def _person(self, mayte: str, encoding=None) -> dict:
+        if encoding:
+            embeddings = [{'vectorB64': encode_embedding(v, encoding)} for v in self.vectors[mayte]]
+        else:
+            embeddings = [{'vector': v.tolist()} for v in self.vectors[mayte]]
+        return {'maYTe': mayte, 'tenBenhNhan': f"Bệnh nhân {mayte}", 'embeddings': embeddings}
+
+    def embeddings(self, since=None, encoding=None) -> dict:
+        encoding = encoding if encoding in WIRE_DTYPES else None
+        with self.lock:
+            if since is None:
+                data = [self._person(m, encoding) for m in self.vectors]
+                deleted = []
+            else:
+                data = [self._person(m, encoding) for m, v in self.updated.items() if v > since]
+                deleted = [m for m, v in self.deleted.items() if v > since]
+            result = {'success': True, 'data': data, 'deleted': deleted, 'cursor': str(self.version)}
+            if encoding:
+                result['encoding'] = encoding
+            return result
+
+
+def create_app(backend: FakeFaceBackend) -> Flask:
+    app = Flask(__name__)
+
+    @app.route('/api/face/embeddings', methods=['GET'])
+    def get_embeddings():
+        since = request.args.get('updatedSince')
+        try:
+            since = int(since) if since is not None else None
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid cursor'}), 400
+        result = backend.embeddings(since, request.args.get('encoding'))
+        return Response(json.dumps(result), mimetype='application/json')
+
+    @app.route('/api/face/embeddings', methods=['POST'])
+    def save_embedding():
+        body = request.get_json(force=True, silent=True) or {}
+        if body.get('embeddingB64'):
+            vector = decode_embedding(body['embeddingB64'], body.get('embeddingEncoding', 'float32'))
+        else:
+            vector = np.array(body.get('embedding') or [], dtype=np.float32)
+        if not body.get('maYTe') or len(vector) != backend.dim:
+            return jsonify({'success': False, 'message': 'Invalid embedding'}), 400
+        backend.save(body['maYTe'], vector)
+        return jsonify({'success': True, 'message': 'Embedding saved successfully'})
+
+    @app.route('/api/face/detections/today/mayte-list', methods=['GET'])
+    def detections_today():
+        return jsonify({'success': True, 'data': []})
+
+    @app.route('/fake/mutate', methods=['POST'])
+    def mutate():
+        body = request.get_json(force=True, silent=True) or {}
+        version = backend.mutate(int(body.get('update', 0)), int(body.get('delete', 0)),
+                                 int(body.get('add', 0)))
+        return jsonify({'success': True, 'cursor': str(version), 'patients': len(backend.vectors)})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake HospitalVision backend for face sync tests')
+    parser.add_argument('--patients', type=int, default=100000, help='Số bệnh nhân giả lập')
+    parser.add_argument('--per-person', type=int, default=1, help='Số embedding mỗi người')
+    parser.add_argument('--dim', type=int, default=512)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"🧪 Generating {args.patients} synthetic patients...")
+    backend = FakeFaceBackend(args.patients, args.per_person, args.dim, args.seed)
+    print(f"🚀 Fake backend on http://localhost:{args.port}")
+    create_app(backend).run(host='0.0.0.0', port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
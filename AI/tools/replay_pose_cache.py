@@ -0,0 +1,101 @@
+"""
+Replay Pose Cache
+Chạy lại logic té ngã / nằm lâu trên pose đã cache - không cần YOLO, không cần decode video
+
+Lần đầu mỗi video được chạy qua YOLOv8-pose và lưu vào data/pose_cache/
+(keypoints, boxes, timestamp, motion). Các lần sau chỉ đọc cache, nên có thể
+thử ngưỡng mới trên cả ngày video trong vài giây.
+
+Sử dụng:
+  python tools/replay_pose_cache.py videos/*.mp4
+  python tools/replay_pose_cache.py videos/*.mp4 --vertical-speed 0.1 --cooldown 3
+  python tools/replay_pose_cache.py videos/*.mp4 --rebuild
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.core.yolo_fall_detector import YOLOFallDetector
+from src.core.pose_cache import PoseCache, replay_poses
+
+
+def load_fall_config(config_path: Path) -> dict:
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f).get('fall_detection', {})
+
+
+def apply_overrides(config: dict, args) -> dict:
+    config = dict(config)
+    config['fall_threshold'] = dict(config.get('fall_threshold', {}))
+    if args.vertical_speed is not None:
+        config['fall_threshold']['vertical_speed'] = args.vertical_speed
+    if args.cooldown is not None:
+        config['cooldown_seconds'] = args.cooldown
+    if args.lying_threshold is not None:
+        config['lying_alert_threshold'] = args.lying_threshold
+    if args.motion is not None:
+        config['use_motion_fallback'] = args.motion == 'on'
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay fall logic over cached YOLOv8-pose outputs')
+    parser.add_argument('videos', nargs='+', help='Video MP4 cần đánh giá')
+    parser.add_argument('--config', type=str, default=str(Path(__file__).parent.parent / 'config' / 'config.yaml'))
+    parser.add_argument('--cache-dir', type=str, default=str(Path(__file__).parent.parent / 'data' / 'pose_cache'))
+    parser.add_argument('--rebuild', action='store_true', help='Chạy lại YOLO dù đã có cache')
+    parser.add_argument('--vertical-speed', type=float, default=None)
+    parser.add_argument('--cooldown', type=float, default=None)
+    parser.add_argument('--lying-threshold', type=float, default=None)
+    parser.add_argument('--motion', choices=['on', 'off'], default=None, help='Bật/tắt motion fallback')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    config = apply_overrides(load_fall_config(Path(args.config)), args)
+    cache = PoseCache(args.cache_dir)
+    detector = YOLOFallDetector(config, load_model=False)  # Fall logic only
+    model_detector = None  # Loaded only if a video is not cached yet
+
+    print("=" * 60)
+    print("Pose Cache Replay")
+    print("=" * 60)
+
+    total_frames, total_seconds = 0, 0.0
+    for video in args.videos:
+        recording = None if args.rebuild else cache.load(video, detector.inference_settings())
+        if recording is None:
+            if model_detector is None:
+                model_detector = YOLOFallDetector(config)
+            print(f"📦 Building pose cache: {video}")
+            recording = cache.build(video, model_detector)
+
+        start = time.perf_counter()
+        events = []
+        for index, timestamp, result in replay_poses(detector, recording):
+            for event in result['fall_events']:
+                events.append(('FALL', event))
+            for event in result['lying_events']:
+                events.append(('LYING', event))
+        elapsed = time.perf_counter() - start
+        total_frames += len(recording)
+        total_seconds += elapsed
+
+        print(f"\n🎞️ {Path(video).name}: {len(recording)} frames, {recording.detections} detections, "
+              f"replayed in {elapsed:.2f}s ({len(recording) / max(elapsed, 1e-9):.0f} fps)")
+        for kind, event in events:
+            track = f"#{event.track_id}" if event.track_id is not None else "motion"
+            print(f"   🚨 {kind:<5} t={event.timestamp:8.2f}s  track={track:<7} conf={event.confidence:.2f}")
+        if not events:
+            print("   (no alerts)")
+
+    print("=" * 60)
+    print(f"Total: {total_frames} frames in {total_seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Sweep Thresholds
+Grid search ngưỡng té ngã trên bộ video có nhãn, chạy song song trên mọi CPU core
+
+Pose của từng video được lấy từ pose cache (tạo bằng YOLO nếu chưa có), mỗi tổ
+hợp tham số được chạy lại qua state machine té ngã (không cần model) và báo cáo
+precision, recall, độ trễ phát hiện.
+
+File nhãn (YAML/JSON, đường dẫn tương đối so với file nhãn):
+  videos/fall_01.mp4: {falls: [12.4], lying: [15.0]}
+  videos/walk_02.mp4: {falls: []}
+
+Sử dụng:
+  python tools/sweep_thresholds.py --labels data/labels.yaml --vertical-speed 0.05 0.08 0.12 --angle 60 70 80
+  python tools/sweep_thresholds.py --labels data/labels.yaml --motion-threshold 0 0.05 0.1 --workers 8
+  python tools/sweep_thresholds.py --labels data/labels.yaml --weights 0.3,0.25,0.2,0.15,0.1 0.4,0.3,0.1,0.1,0.1
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import logging
+import argparse
+import itertools
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.core.yolo_fall_detector import YOLOFallDetector
+from src.core.pose_cache import PoseCache, PoseRecording, replay_poses
+from src.utils.fall_evaluation import EventMatch, load_labels, match_events, summarize
+
+WEIGHT_KEYS = ('angle', 'speed', 'acceleration', 'instability', 'position')
+
+# Worker state (loaded once per process by _init_worker)
+_recordings = []
+_base_config = {}
+_match_args = {}
+
+
+def apply_params(config: dict, params: dict) -> dict:
+    """Fall detection config with one sweep setting applied"""
+    config = copy.deepcopy(config)
+    thresholds = config.setdefault('fall_threshold', {})
+    if 'vertical_speed' in params:
+        thresholds['vertical_speed'] = params['vertical_speed']
+    if 'angle_threshold' in params:
+        thresholds['angle_threshold'] = params['angle_threshold']
+    if 'weights' in params:
+        thresholds['weights'] = dict(zip(WEIGHT_KEYS, params['weights']))
+    if 'lying_alert_threshold' in params:
+        config['lying_alert_threshold'] = params['lying_alert_threshold']
+    if 'motion_threshold' in params:
+        # 0 = motion fallback off
+        config['use_motion_fallback'] = params['motion_threshold'] > 0
+        config['motion_threshold'] = params['motion_threshold']
+    return config
+
+
+def _init_worker(cache_files, labels, base_config, match_args):
+    global _recordings, _base_config, _match_args
+    logging.disable(logging.CRITICAL)
+    _recordings = [(PoseRecording.load(path), labels[video]) for video, path in cache_files]
+    _base_config = base_config
+    _match_args = match_args
+
+
+def _evaluate(params: dict) -> dict:
+    """Replay every labelled recording with one parameter setting"""
+    config = apply_params(_base_config, params)
+    falls, lying = EventMatch(), EventMatch()
+    for recording, labels in _recordings:
+        detector = YOLOFallDetector(config, load_model=False)
+        fall_times, lying_times = [], []
+        for _, _, result in replay_poses(detector, recording):
+            fall_times.extend(event.timestamp for event in result['fall_events'])
+            lying_times.extend(event.timestamp for event in result['lying_events'])
+        falls += match_events(fall_times, labels['falls'], **_match_args)
+        if labels['lying']:
+            lying += match_events(lying_times, labels['lying'], **_match_args)
+    return {'params': params, 'falls': summarize(falls), 'lying': summarize(lying)}
+
+
+def build_grid(args) -> list:
+    axes = {
+        'vertical_speed': args.vertical_speed,
+        'angle_threshold': args.angle,
+        'lying_alert_threshold': args.lying_threshold,
+        'motion_threshold': args.motion_threshold,
+        'weights': [tuple(float(w) for w in spec.split(',')) for spec in args.weights] if args.weights else None,
+    }
+    axes = {name: values for name, values in axes.items() if values}
+    for name, values in axes.items():
+        if name == 'weights' and any(len(w) != len(WEIGHT_KEYS) for w in values):
+            raise SystemExit(f"--weights needs {len(WEIGHT_KEYS)} values: {','.join(WEIGHT_KEYS)}")
+    names = list(axes)
+    return [dict(zip(names, combo)) for combo in itertools.product(*axes.values())]
+
+
+def ensure_caches(labels: dict, config: dict, cache: PoseCache) -> list:
+    """[(video, cache file)], running YOLO for videos not cached yet"""
+    settings = YOLOFallDetector(config, load_model=False).inference_settings()
+    model_detector = None
+    cache_files = []
+    for video in labels:
+        if cache.load(video, settings) is None:
+            if model_detector is None:
+                model_detector = YOLOFallDetector(config)
+            print(f"📦 Building pose cache: {video}")
+            cache.build(video, model_detector)
+        cache_files.append((video, str(cache.path_for(video, settings))))
+    return cache_files
+
+
+def format_latency(value) -> str:
+    return f"{value:6.2f}s" if value is not None else "     -"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel fall threshold sweep over cached poses')
+    parser.add_argument('--labels', required=True, help='File nhãn YAML/JSON')
+    parser.add_argument('--config', type=str, default=str(Path(__file__).parent.parent / 'config' / 'config.yaml'))
+    parser.add_argument('--cache-dir', type=str, default=str(Path(__file__).parent.parent / 'data' / 'pose_cache'))
+    parser.add_argument('--vertical-speed', type=float, nargs='+')
+    parser.add_argument('--angle', type=float, nargs='+', help='angle_threshold (độ)')
+    parser.add_argument('--lying-threshold', type=float, nargs='+', help='lying_alert_threshold (giây)')
+    parser.add_argument('--motion-threshold', type=float, nargs='+', help='0 = tắt motion fallback')
+    parser.add_argument('--weights', type=str, nargs='+', help=f"Trọng số fall confidence: {','.join(WEIGHT_KEYS)}")
+    parser.add_argument('--tolerance', type=float, default=3.0, help='Phát hiện chậm tối đa sau nhãn (giây)')
+    parser.add_argument('--lead', type=float, default=1.0, help='Phát hiện sớm tối đa trước nhãn (giây)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', type=str, default=None, help='Lưu toàn bộ kết quả ra JSON')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    with open(args.config, 'r', encoding='utf-8') as f:
+        base_config = yaml.safe_load(f).get('fall_detection', {})
+    labels = load_labels(args.labels)
+    grid = build_grid(args)
+    if not grid:
+        raise SystemExit("Nothing to sweep: give at least one of --vertical-speed/--angle/"
+                         "--lying-threshold/--motion-threshold/--weights")
+
+    print("=" * 78)
+    print(f"Threshold Sweep: {len(grid)} settings x {len(labels)} videos, {args.workers} workers")
+    print("=" * 78)
+
+    cache_files = ensure_caches(labels, base_config, PoseCache(args.cache_dir))
+    match_args = {'tolerance': args.tolerance, 'lead': args.lead}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(cache_files, labels, base_config, match_args)) as executor:
+        chunksize = max(1, len(grid) // (args.workers * 4))
+        results = list(executor.map(_evaluate, grid, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    results.sort(key=lambda r: (r['falls']['f1'], r['falls']['recall'],
+                                -(r['falls']['latency_mean'] or 0.0)), reverse=True)
+
+    print(f"\n{'#':>3}  {'F1':>5} {'Prec':>5} {'Rec':>5} {'TP':>4} {'FP':>4} {'FN':>4} "
+          f"{'lat.mean':>8} {'lat.p90':>8}  params")
+    for rank, r in enumerate(results[:args.top], 1):
+        m = r['falls']
+        params = ', '.join(f"{k}={v}" for k, v in r['params'].items())
+        print(f"{rank:>3}  {m['f1']:5.2f} {m['precision']:5.2f} {m['recall']:5.2f} {m['tp']:>4} {m['fp']:>4} "
+              f"{m['fn']:>4} {format_latency(m['latency_mean']):>8} {format_latency(m['latency_p90']):>8}  {params}")
+
+    print(f"\n✅ {len(grid)} settings in {elapsed:.1f}s ({elapsed / len(grid):.2f}s each)")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, default=list)
+        print(f"💾 Results: {args.output}")
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()